@@ -135,6 +135,24 @@ function ProjectPage({ user, onLogout }) {
     setTodos(applyOptimisticUpdate(todos));
 
     try {
+      // Expand/collapse is UI state: send it to the buffered endpoint and keep the optimistic tree
+      if (Object.keys(updates).length === 1 && 'collapsed' in updates) {
+        const response = await fetch(`${API_ENDPOINTS.TODOS}/${todoId}/ui-state`, {
+          method: 'PATCH',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          credentials: 'include',
+          body: JSON.stringify(updates)
+        });
+
+        if (!response.ok) {
+          const error = await response.json();
+          throw new Error(error.error || 'Failed to update todo');
+        }
+        return;
+      }
+
       const response = await fetch(`${API_ENDPOINTS.TODOS}/${todoId}`, {
         method: 'PUT',
         headers: {
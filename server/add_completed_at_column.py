@@ -0,0 +1,51 @@
+"""
+Migration script to add the completed_at column used by archiving.
+Run this script to update the database schema.
+
+Todos that are already completed get the migration time as their
+completion time, so they only become eligible for archiving
+ARCHIVE_AFTER_DAYS after the upgrade. The archived_todo_items table
+itself is created by the app on startup.
+"""
+
+import sqlite3
+import os
+
+db_path = os.path.join(os.path.dirname(__file__), 'instance', 'todos.db')
+
+def add_completed_at_column():
+    """Add completed_at to todo_items and backfill it for completed todos."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(todo_items)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'completed_at' not in columns:
+            print("Adding completed_at column to todo_items table...")
+            cursor.execute("""
+                ALTER TABLE todo_items
+                ADD COLUMN completed_at DATETIME
+            """)
+        else:
+            print("completed_at column already exists on todo_items.")
+
+        cursor.execute("""
+            UPDATE todo_items
+            SET completed_at = CURRENT_TIMESTAMP
+            WHERE completed = 1 AND completed_at IS NULL
+        """)
+        print(f"Backfilled completed_at for {cursor.rowcount} completed todo(s).")
+
+        conn.commit()
+        print("completed_at column added successfully!")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    add_completed_at_column()
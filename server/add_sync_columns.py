@@ -0,0 +1,47 @@
+"""
+Migration script to add change_seq columns used by delta sync.
+Run this script to update the database schema.
+"""
+
+import sqlite3
+import os
+
+db_path = os.path.join(os.path.dirname(__file__), 'instance', 'todos.db')
+
+TABLES = {
+    'todo_lists': 'ix_todo_lists_user_change_seq',
+    'todo_items': 'ix_todo_items_user_change_seq',
+}
+
+def add_sync_columns():
+    """Add change_seq columns and their indexes if they don't exist."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        for table, index_name in TABLES.items():
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [column[1] for column in cursor.fetchall()]
+
+            if 'change_seq' not in columns:
+                print(f"Adding change_seq column to {table} table...")
+                cursor.execute(f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN change_seq INTEGER DEFAULT 0 NOT NULL
+                """)
+            else:
+                print(f"change_seq column already exists on {table}.")
+
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} (user_id, change_seq)")
+
+        conn.commit()
+        print("Sync columns added successfully!")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    add_sync_columns()
@@ -0,0 +1,44 @@
+"""
+Migration script to add the composite indexes used by filtered todo views.
+Run this script to update the database schema.
+"""
+
+import sqlite3
+import os
+
+db_path = os.path.join(os.path.dirname(__file__), 'instance', 'todos.db')
+
+INDEXES = {
+    'ix_todo_items_list_parent_order': '(list_id, parent_id, order_index)',
+    'ix_todo_items_list_completed_priority': '(list_id, completed, priority)',
+}
+
+def add_todo_indexes():
+    """Create the composite todo_items indexes if they don't exist."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA index_list(todo_items)")
+        existing = {row[1] for row in cursor.fetchall()}
+
+        for name, columns in INDEXES.items():
+            if name not in existing:
+                print(f"Creating index {name}...")
+                cursor.execute(f"CREATE INDEX {name} ON todo_items {columns}")
+            else:
+                print(f"Index {name} already exists.")
+
+        conn.commit()
+        cursor.execute("ANALYZE todo_items")
+        conn.commit()
+        print("Todo indexes are up to date!")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    add_todo_indexes()
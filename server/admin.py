@@ -0,0 +1,52 @@
+"""
+Admin-only endpoints.
+
+Admins are the users whose usernames are listed in ADMIN_USERNAMES
+(empty by default, so the endpoints are closed until configured).
+"""
+from functools import wraps
+
+from flask import Blueprint, current_app, g, jsonify
+
+from auth import login_required
+from backup import BackupError, BackupInProgress, run_backup
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+def admin_required(f):
+    """Decorator: like login_required, but only for users in ADMIN_USERNAMES."""
+    @wraps(f)
+    @login_required
+    def decorated_function(*args, **kwargs):
+        if g.current_user['username'] not in current_app.config['ADMIN_USERNAMES']:
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@admin_bp.route('/backup', methods=['POST'])
+@admin_required
+def create_backup():
+    """
+    Take an online backup of the database(s) (see backup.py).
+
+    Returns:
+        201: {"backup": {"directory": ..., "files": [{"name", "path", "pages", "bytes", "seconds"}]}}
+        403: Not an admin
+        409: A backup is already running
+        500: The backup failed verification
+    """
+    try:
+        result = run_backup()
+    except BackupInProgress as exc:
+        return jsonify({'error': str(exc)}), 409
+    except BackupError as exc:
+        return jsonify({'error': str(exc)}), 500
+    return jsonify({'backup': result}), 201
+
+
+def init_admin(app):
+    """Register the admin blueprint; ADMIN_USERNAMES defaults to nobody."""
+    app.config.setdefault('ADMIN_USERNAMES', ())
+    app.register_blueprint(admin_bp)
@@ -1,16 +1,47 @@
-from flask import Flask
+from flask import Flask, current_app, has_app_context
 from flask_cors import CORS
 from models import db
-from auth import auth_bp
+from auth import auth_bp, init_user_cache
 from routes import api_bp
+from sync import compact_tombstones_command
+from cache import TreeCache
+from compression import init_compression
+from events import event_broker
+from ratelimit import init_rate_limiting
+from logconfig import get_logger, init_logging
+from passwords import init_password_hashing
+from sessions import init_sessions, sweep_sessions_command
+from dbrouting import init_read_routing, writer_engine_options
+from writepipeline import init_write_pipeline
+from uistate import init_ui_state_buffer
+from shards import init_sharding
+from invalidation import init_invalidation_bus
+from backup import init_backups
+from admin import init_admin
+from maintenance import init_maintenance
+from readiness import readiness
+from archive import init_archive
 import os
 from datetime import timedelta
 
 
-def create_app():
+def invalidate_tree_cache(project_id, event_type, payload):
+    """Broker listener: drop the current app's cached trees of a project."""
+    if has_app_context() and 'tree_cache' in current_app.extensions:
+        current_app.extensions['tree_cache'].invalidate(project_id)
+
+
+# Registered once: the broker is process-global, but each app has its own cache
+event_broker.add_listener(invalidate_tree_cache)
+
+def create_app(test_config=None):
     """
     Application factory function to create and configure the Flask app.
-    
+
+    Args:
+        test_config: Optional dict of config values applied before extensions
+            are initialised (e.g. a temporary SQLALCHEMY_DATABASE_URI for tests)
+
     Returns:
         Flask app instance
     """
@@ -22,7 +53,7 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     # Session configuration - Make sessions persistent across browser refreshes
-    app.config['SESSION_TYPE'] = 'filesystem'
+    app.config['SESSION_TYPE'] = 'sqlite'  # Server-side: 'sqlite', 'memory' or 'cookie'
     app.config['SESSION_PERMANENT'] = True  # Make sessions permanent (survive browser refresh)
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Sessions last 7 days
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
@@ -31,27 +62,85 @@ def create_app():
     app.config['SESSION_COOKIE_NAME'] = 'todo_session'
     app.config['SESSION_COOKIE_DOMAIN'] = None  # Allow cookies from localhost:5000 to work with localhost:3000
     app.config['SESSION_COOKIE_PATH'] = '/'
-    
-    # Initialize extensions
+
+    # API bearer tokens (POST /api/auth/token) are valid for a day
+    app.config['API_TOKEN_MAX_AGE'] = 24 * 60 * 60
+
+    # /ready answers 503 once a trivial query takes longer than this
+    app.config['READY_MAX_DB_LATENCY_MS'] = 250
+
+    if test_config:
+        app.config.update(test_config)
+
+    # JSON logs through a queue listener, tagged with X-Request-ID (LOG_LEVEL)
+    init_logging(app)
+
+    # Initialize extensions (the default engine is the small writer pool)
+    writer_engine_options(app)
     db.init_app(app)
+
+    # WAL mode plus a read-only pool for GET endpoints (READ_ROUTING_ENABLED)
+    init_read_routing(app, db)
+
+    # Optional per-user shard files for project/todo data (SHARDING_MODE)
+    init_sharding(app)
+
+    # Cookie holds only a session id; data lives in SESSION_TYPE's store
+    init_sessions(app)
+
+    # Rendered todo trees, dropped whenever one of the project's todos changes
+    tree_cache_size = app.config.get('TREE_CACHE_SIZE', 256)
+    if tree_cache_size:
+        app.extensions['tree_cache'] = TreeCache(tree_cache_size)
+
+    # Cached user records for login_required (USER_CACHE_SIZE, USER_CACHE_TTL)
+    init_user_cache(app)
+
+    # gzip/deflate/brotli for large responses (COMPRESS_MIN_SIZE, COMPRESS_LEVEL)
+    init_compression(app)
+
+    # Per-user token buckets (RATELIMITS) and load shedding (MAX_IN_FLIGHT)
+    init_rate_limiting(app)
+
+    # Password hashing on a bounded pool (PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS)
+    init_password_hashing(app)
     
     # Configure CORS to allow credentials (cookies/sessions)
     CORS(app,
          resources={r"/api/*": {
              "origins": ["http://localhost:3000"],
-             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-             "allow_headers": ["Content-Type"],
+             "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+             "allow_headers": ["Content-Type", "Authorization"],
              "supports_credentials": True
          }})
     
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp)  # PR-4: List management routes
+    init_admin(app)  # ADMIN_USERNAMES may use /api/admin/*
+
+    # CLI commands
+    app.cli.add_command(compact_tombstones_command)
+    app.cli.add_command(sweep_sessions_command)
+    init_backups(app)  # `flask backup` (BACKUP_DIRECTORY, BACKUP_PAGES_PER_STEP, BACKUP_MAX_RESTARTS)
+    init_archive(app)  # `flask archive-todos` (ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE)
     
     # Create database tables
     with app.app_context():
         db.create_all()
-        print("Database tables created successfully!")
+        get_logger('app').info('Database tables created')
+
+    # Optional group-commit writer thread for mutations (WRITE_PIPELINE_ENABLED)
+    init_write_pipeline(app)
+
+    # Buffered expand/collapse writes (UI_STATE_FLUSH_INTERVAL)
+    init_ui_state_buffer(app)
+
+    # Cache invalidations shared between worker processes (INVALIDATION_BUS_ENABLED)
+    init_invalidation_bus(app)
+
+    # `flask maintenance` and the optional timer (MAINTENANCE_INTERVAL, MAINTENANCE_BUDGET)
+    init_maintenance(app)
     
     # Health check endpoint
     @app.route('/')
@@ -61,6 +150,10 @@ def create_app():
     @app.route('/health')
     def health():
         return {'status': 'healthy'}, 200
+
+    @app.route('/ready')
+    def ready():
+        return readiness()
     
     return app
 
@@ -71,5 +164,5 @@ if __name__ == '__main__':
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True
+        debug=os.environ.get('FLASK_DEBUG') == '1'
     )
\ No newline at end of file
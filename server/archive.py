@@ -0,0 +1,251 @@
+"""
+Archiving of old completed todos.
+
+Completed todos never leave todo_items on their own, so every tree query
+and index lookup pays for years of finished work. archive_completed()
+moves whole top-level subtrees whose root was completed more than
+ARCHIVE_AFTER_DAYS ago (and whose subtasks are all completed) into
+archived_todo_items, ARCHIVE_BATCH_SIZE subtrees per transaction, so the
+write lock is held briefly and requests interleave between batches.
+Each batch writes delete tombstones with one change sequence number, so
+sync clients drop the archived todos like deleted ones, and publishes an
+'archived' event per project (which also drops its cached tree).
+
+restore_archived() puts a subtree back at the end of its project under
+new ids (the old ones may have been reused meanwhile) and restarts its
+archive clock. Run archiving per project through
+POST /api/projects/<id>/archive, or for everyone with
+`flask archive-todos`.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, literal, or_, select
+
+from authz import AccessError
+from events import event_broker
+from models import db, TodoItem, ArchivedTodoItem, Tombstone
+from shards import use_shard_user
+from sync import next_change_seq
+from writepipeline import run_write
+
+# Columns copied from todo_items into the archive
+COPIED_COLUMNS = ('title', 'description', 'priority', 'depth', 'order_index', 'parent_id',
+                  'list_id', 'user_id', 'created_at', 'completed_at')
+
+
+def archive_candidates(cutoff, after_id, limit, list_id=None):
+    """Ids of completed top-level todos finished before cutoff, in id order after after_id."""
+    query = (
+        select(TodoItem.id)
+        .where(TodoItem.parent_id.is_(None), TodoItem.completed.is_(True),
+               TodoItem.completed_at < cutoff, TodoItem.id > after_id)
+        .order_by(TodoItem.id)
+        .limit(limit)
+    )
+    if list_id is not None:
+        query = query.where(TodoItem.list_id == list_id)
+    return db.session.execute(query).scalars().all()
+
+
+def subtree_rows(session, root_ids):
+    """Every todo below (and including) root_ids, as rows with a root_todo_id column."""
+    tree = (
+        select(TodoItem.id, TodoItem.id.label('root_todo_id'))
+        .where(TodoItem.id.in_(root_ids))
+        .cte('tree', recursive=True)
+    )
+    tree = tree.union_all(
+        select(TodoItem.id, tree.c.root_todo_id).where(TodoItem.parent_id == tree.c.id)
+    )
+    columns = [getattr(TodoItem, name) for name in COPIED_COLUMNS]
+    return session.execute(
+        select(TodoItem.id, TodoItem.completed, tree.c.root_todo_id, *columns)
+        .join(tree, tree.c.id == TodoItem.id)
+        .order_by(TodoItem.depth, TodoItem.id)
+    ).all()
+
+
+def archive_batch(session, root_ids):
+    """
+    Move the fully completed subtrees among root_ids into the archive.
+
+    Returns:
+        {list_id: [archived root todo ids]}
+    """
+    rows = subtree_rows(session, root_ids)
+    open_roots = {row.root_todo_id for row in rows if not row.completed}
+    rows = [row for row in rows if row.root_todo_id not in open_roots]
+    if not rows:
+        return {}
+
+    now = datetime.utcnow()
+    roots = [row for row in rows if row.id == row.root_todo_id]
+    archive_ids = session.execute(
+        insert(ArchivedTodoItem).returning(ArchivedTodoItem.id, sort_by_parameter_order=True),
+        [{'todo_id': row.id, 'archived_at': now, **{name: getattr(row, name) for name in COPIED_COLUMNS}}
+         for row in roots],
+    ).scalars().all()
+    root_archive_id = {row.id: archive_id for row, archive_id in zip(roots, archive_ids)}
+
+    descendants = [row for row in rows if row.id != row.root_todo_id]
+    if descendants:
+        session.execute(insert(ArchivedTodoItem), [
+            {'todo_id': row.id, 'root_id': root_archive_id[row.root_todo_id], 'archived_at': now,
+             **{name: getattr(row, name) for name in COPIED_COLUMNS}}
+            for row in descendants
+        ])
+
+    seq = next_change_seq(session)
+    session.execute(insert(Tombstone), [
+        {'entity_type': 'todo', 'entity_id': row.id, 'user_id': row.user_id, 'list_id': row.list_id,
+         'change_seq': seq, 'deleted_at': now}
+        for row in rows
+    ])
+    session.execute(delete(TodoItem).where(TodoItem.id.in_([row.id for row in rows])))
+
+    archived = {}
+    for row in roots:
+        archived.setdefault(row.list_id, []).append(row.id)
+    return archived
+
+
+def archive_completed(older_than_days=None, batch_size=None, list_id=None):
+    """
+    Archive completed top-level subtrees in batches, each its own transaction.
+
+    Args:
+        older_than_days: Minimum age of the completion (default ARCHIVE_AFTER_DAYS)
+        batch_size: Subtrees per transaction (default ARCHIVE_BATCH_SIZE)
+        list_id: Only archive this project's todos
+
+    Returns:
+        Number of subtrees archived
+    """
+    config = current_app.config
+    days = config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    total = 0
+    after_id = 0
+    while True:
+        root_ids = archive_candidates(cutoff, after_id, batch_size, list_id)
+        if not root_ids:
+            return total
+        after_id = root_ids[-1]
+
+        archived = run_write(lambda session: archive_batch(session, root_ids))
+        for project_id, todo_ids in archived.items():
+            event_broker.publish(project_id, 'archived', {'todo_ids': todo_ids})
+            total += len(todo_ids)
+
+
+def load_archive_page(list_id, page, per_page):
+    """
+    One page of a project's archived subtrees, newest first.
+
+    Returns:
+        (list of root dicts with nested 'children', total number of roots)
+    """
+    roots_query = ArchivedTodoItem.query.filter(
+        ArchivedTodoItem.list_id == list_id, ArchivedTodoItem.root_id.is_(None)
+    )
+    total = roots_query.count()
+    roots = (roots_query.order_by(ArchivedTodoItem.archived_at.desc(), ArchivedTodoItem.id.desc())
+             .offset((page - 1) * per_page).limit(per_page).all())
+    if not roots:
+        return [], total
+
+    descendants = (ArchivedTodoItem.query
+                   .filter(ArchivedTodoItem.root_id.in_([root.id for root in roots]))
+                   .order_by(ArchivedTodoItem.depth, ArchivedTodoItem.order_index).all())
+
+    nodes = {}
+    result = []
+    for item in [*roots, *descendants]:
+        node = {**item.to_dict(), 'children': []}
+        nodes[(item.root_id or item.id, item.todo_id)] = node
+        if item.root_id is None:
+            result.append(node)
+        else:
+            parent = nodes.get((item.root_id, item.parent_id))
+            if parent is not None:
+                parent['children'].append(node)
+    return result, total
+
+
+def restore_archived(session, archive_id):
+    """
+    Put an archived subtree back into its project under new ids.
+
+    Args:
+        session: Session to write with (a run_write unit's session)
+        archive_id: Archive id of the subtree's root
+
+    Returns:
+        The restored root's to_dict(include_children=True)
+
+    Raises:
+        AccessError: 404 if the subtree is gone (e.g. restored by another
+            request since the caller checked it)
+    """
+    items = (session.query(ArchivedTodoItem)
+             .filter(or_(ArchivedTodoItem.id == archive_id, ArchivedTodoItem.root_id == archive_id))
+             .order_by(ArchivedTodoItem.depth, ArchivedTodoItem.order_index).all())
+    if not items:
+        raise AccessError(404, 'Archived todo not found')
+    root = items[0]
+    last_order = session.execute(
+        select(func.coalesce(func.max(TodoItem.order_index), literal(-1)))
+        .where(TodoItem.list_id == root.list_id, TodoItem.parent_id.is_(None))
+    ).scalar()
+
+    restored = {}
+    for item in items:
+        todo = TodoItem(
+            title=item.title,
+            description=item.description,
+            priority=item.priority,
+            depth=item.depth,
+            order_index=last_order + 1 if item is root else item.order_index,
+            list_id=item.list_id,
+            user_id=item.user_id,
+            created_at=item.created_at or datetime.utcnow(),
+            completed=True,
+        )
+        if item is not root:
+            todo.parent = restored[item.parent_id]
+        restored[item.todo_id] = todo
+        session.add(todo)
+
+    session.flush()
+    session.execute(delete(ArchivedTodoItem).where(ArchivedTodoItem.root_id == archive_id))
+    session.execute(delete(ArchivedTodoItem).where(ArchivedTodoItem.id == archive_id))
+    return restored[root.todo_id].to_dict(include_children=True)
+
+
+@click.command('archive-todos')
+@click.option('--days', type=int, default=None,
+              help='Archive subtrees completed more than this many days ago (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None,
+              help='Subtrees moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+@with_appcontext
+def archive_todos_command(days, batch_size):
+    """Move old completed top-level subtrees into the archive table."""
+    router = current_app.extensions.get('shard_router')
+    shard_users = [router.shard_user(name) for name in router.shard_names()] if router else [None]
+    total = 0
+    for shard_user in shard_users:
+        with use_shard_user(shard_user):
+            total += archive_completed(days, batch_size)
+    click.echo(f'Archived {total} completed subtree(s).')
+
+
+def init_archive(app):
+    """Archive defaults and the `flask archive-todos` command."""
+    app.config.setdefault('ARCHIVE_AFTER_DAYS', 30)
+    app.config.setdefault('ARCHIVE_BATCH_SIZE', 200)
+    app.cli.add_command(archive_todos_command)
@@ -1,14 +1,134 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, current_app, g, has_app_context, request, jsonify, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from models import db, User
+from cache import LRUCache
+from invalidation import publish_invalidation
+from logconfig import get_logger
+from sessions import regenerate_session
 from functools import wraps
+from itertools import chain
 
 # Create authentication blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+logger = get_logger('auth')
+
+TOKEN_SALT = 'api-token'
+
+
+def init_user_cache(app):
+    """
+    Create the app's user record cache (USER_CACHE_SIZE entries, USER_CACHE_TTL seconds).
+
+    A size of 0 disables caching.
+    """
+    app.config.setdefault('USER_CACHE_SIZE', 1024)
+    app.config.setdefault('USER_CACHE_TTL', 60)
+    if app.config['USER_CACHE_SIZE']:
+        app.extensions['user_cache'] = LRUCache(app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
+
+
+def load_user(user_id):
+    """
+    Get a user's public record, from the cache or with one query.
+
+    Args:
+        user_id: User primary key
+
+    Returns:
+        The User.to_dict() of the user (shared, do not modify), or None
+    """
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        record = cache.get(user_id)
+        if record is not None:
+            return record
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    record = user.to_dict()
+    if cache is not None:
+        cache.set(user_id, record)
+    return record
+
+
+def invalidate_user(user_id):
+    """Drop a user's cached record."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.pop(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changed_users(db_session, flush_context):
+    """Remember which users were updated or deleted in this transaction."""
+    changed = {obj.id for obj in chain(db_session.dirty, db_session.deleted) if isinstance(obj, User)}
+    if changed:
+        db_session.info.setdefault('changed_user_ids', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_changed_users(db_session):
+    """Drop cached records of users changed by the committed transaction, here and in other workers."""
+    user_ids = db_session.info.pop('changed_user_ids', None)
+    if user_ids and has_app_context():
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        publish_invalidation('user', user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changed_users(db_session):
+    """Nothing was written, so there is nothing to invalidate."""
+    db_session.info.pop('changed_user_ids', None)
+
+
+def token_serializer():
+    """Signer for API bearer tokens, keyed by SECRET_KEY."""
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def issue_token(user):
+    """Create a signed, timestamped bearer token for user."""
+    return token_serializer().dumps({'uid': user.id, 'u': user.username})
+
+
+def bearer_claims():
+    """
+    Verify the request's "Authorization: Bearer" token (once per request).
+
+    Only the HMAC signature and age are checked, so no database or shared
+    session state is needed.
+
+    Returns:
+        The token's claims dict, None if no bearer token was sent, or
+        False if the token is invalid or older than API_TOKEN_MAX_AGE
+    """
+    # Memoized on the request, not g: an app context can outlive a request
+    if not hasattr(request, 'bearer_claims'):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        claims = None
+        if scheme.lower() == 'bearer' and token.strip():
+            try:
+                claims = token_serializer().loads(token.strip(), max_age=current_app.config['API_TOKEN_MAX_AGE'])
+            except BadSignature:
+                claims = False
+        request.bearer_claims = claims
+    return request.bearer_claims
+
 
 def login_required(f):
     """
     Decorator to protect routes that require authentication.
+
+    Accepts either a session cookie or an API bearer token. Sets g.user_id
+    and g.current_user for the view: the cached User.to_dict() record for
+    sessions, or just id and username from the token, so hot endpoints
+    make no query just to authenticate.
     
     Usage:
         @auth_bp.route('/protected')
@@ -19,8 +139,25 @@ def login_required(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
+        claims = bearer_claims()
+        if claims is False:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+        if claims:
+            g.user_id = claims['uid']
+            g.current_user = {'id': claims['uid'], 'username': claims['u']}
+            return f(*args, **kwargs)
+
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
+
+        user = load_user(session['user_id'])
+        if user is None:
+            # User was deleted but session still exists
+            session.clear()
+            return jsonify({'error': 'Authentication required'}), 401
+
+        g.user_id = user['id']
+        g.current_user = user
         return f(*args, **kwargs)
     return decorated_function
 
@@ -64,14 +201,16 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email already registered'}), 400
     
-    try:
-        user = User(username=username, email=email)
-        user.set_password(password)
+    # Hash outside the try block so a full hash queue surfaces as 503
+    user = User(username=username, email=email)
+    user.set_password(password)
 
+    try:
         db.session.add(user)
         db.session.commit()
 
         # Log the user in immediately after registration
+        regenerate_session()
         session.permanent = True  # Make session persist across browser restarts
         session['user_id'] = user.id
         session['username'] = user.username
@@ -112,15 +251,25 @@ def login():
     user = User.query.filter_by(username=username).first()
     
     if not user or not user.check_password(password):
+        logger.info('Login failed', extra={'fields': {'username': username}})
         return jsonify({'error': 'Invalid username or password'}), 401
 
+    # Upgrade hashes made with an older method or cost while we have the password
+    if user.password_needs_rehash():
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except Exception:
+            # Login still succeeds; the upgrade is retried on the next login
+            db.session.rollback()
+            logger.warning('Password hash upgrade failed', exc_info=True, extra={'fields': {'user_id': user.id}})
+
+    regenerate_session()
     session.permanent = True  # Make session persist across browser restarts
     session['user_id'] = user.id
     session['username'] = user.username
 
-    print(f"[LOGIN] Session created for user {user.username}")
-    print(f"[LOGIN] Session data: {dict(session)}")
-    print(f"[LOGIN] Session permanent: {session.permanent}")
+    logger.info('Login succeeded', extra={'fields': {'user_id': user.id}})
 
     return jsonify({
         'message': 'Login successful',
@@ -128,6 +277,45 @@ def login():
     }), 200
 
 
+@auth_bp.route('/token', methods=['POST'])
+def create_token():
+    """
+    Issue an API bearer token.
+
+    Send the token as "Authorization: Bearer <token>". It expires after
+    API_TOKEN_MAX_AGE seconds and is verified without a database lookup,
+    so a deleted user's token stays valid until then.
+
+    Expected JSON body (not needed when already logged in with a session):
+        {
+            "username": "string",
+            "password": "string"
+        }
+
+    Returns:
+        200: Token issued
+        400: Missing credentials
+        401: Invalid credentials
+    """
+    user = db.session.get(User, session['user_id']) if 'user_id' in session else None
+
+    if user is None:
+        data = request.get_json(silent=True)
+        if not data or not data.get('username') or not data.get('password'):
+            return jsonify({'error': 'Username and password are required'}), 400
+
+        user = User.query.filter_by(username=data['username'].strip()).first()
+        if not user or not user.check_password(data['password']):
+            logger.info('Token request failed', extra={'fields': {'username': data['username'].strip()}})
+            return jsonify({'error': 'Invalid username or password'}), 401
+
+    return jsonify({
+        'token': issue_token(user),
+        'token_type': 'Bearer',
+        'expires_in': current_app.config['API_TOKEN_MAX_AGE'],
+    }), 200
+
+
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
 def logout():
@@ -150,24 +338,19 @@ def get_current_user():
         200: User data if logged in
         401: Not authenticated
     """
-    # Debug: Print session data
-    print(f"[AUTH CHECK] Session data: {dict(session)}")
-    print(f"[AUTH CHECK] Session permanent: {session.permanent}")
-
     if 'user_id' not in session:
-        print("[AUTH CHECK] No user_id in session - not authenticated")
+        logger.debug('Auth check without a session user')
         return jsonify({'error': 'Not authenticated'}), 401
 
-    user = User.query.get(session['user_id'])
+    user = load_user(session['user_id'])
 
     if not user:
         # User was deleted but session still exists
-        print(f"[AUTH CHECK] User {session['user_id']} not found in database")
+        logger.info('Session user no longer exists', extra={'fields': {'user_id': session['user_id']}})
         session.clear()
         return jsonify({'error': 'User not found'}), 401
 
-    print(f"[AUTH CHECK] User {user.username} authenticated successfully")
-    return jsonify({'user': user.to_dict()}), 200
+    return jsonify({'user': user}), 200
 
 
 @auth_bp.route('/change-password', methods=['POST'])
@@ -199,8 +382,8 @@ def change_password():
     if len(new_password) < 6:
         return jsonify({'error': 'New password must be at least 6 characters long'}), 400
 
-    # Get current user
-    user = User.query.get(session['user_id'])
+    # Get current user (the ORM row, since the password hash is needed)
+    user = db.session.get(User, g.user_id)
 
     if not user:
         return jsonify({'error': 'User not found'}), 401
@@ -210,8 +393,9 @@ def change_password():
         return jsonify({'error': 'Current password is incorrect'}), 401
 
     # Set new password
+    user.set_password(new_password)
+
     try:
-        user.set_password(new_password)
         db.session.commit()
 
         return jsonify({'message': 'Password changed successfully'}), 200
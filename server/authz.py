@@ -0,0 +1,83 @@
+"""
+Ownership checks for projects and todos.
+
+get_owned fetches a row together with an "owned by the current user"
+flag in one query and raises AccessError (404 or 403) otherwise. Results
+are memoized on the request, so a handler that checks the same row twice
+(e.g. a todo's project and then the project again) queries it once.
+"""
+from flask import g, request
+from sqlalchemy import select
+
+from models import db, TodoList, TodoItem, ArchivedTodoItem
+
+LABELS = {
+    TodoList: 'Project',
+    TodoItem: 'Todo',
+    ArchivedTodoItem: 'Archived todo',
+}
+
+
+class AccessError(Exception):
+    """Resource missing (404) or owned by someone else (403)."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def get_owned(model, object_id, label=None):
+    """
+    Fetch a project or todo owned by g.user_id.
+
+    Args:
+        model: TodoList, TodoItem or ArchivedTodoItem
+        object_id: Primary key
+        label: Name used in error messages (default "Project"/"Todo")
+
+    Returns:
+        The model instance
+
+    Raises:
+        AccessError: 404 if the row does not exist, 403 if it belongs to
+            another user
+    """
+    # Memoized on the request, not g: an app context can outlive a request
+    memo = getattr(request, 'owned_rows', None)
+    if memo is None:
+        memo = request.owned_rows = {}
+
+    key = (model, object_id)
+    if key not in memo:
+        memo[key] = db.session.execute(
+            select(model, model.user_id == g.user_id).where(model.id == object_id)
+        ).first()
+
+    label = label or LABELS[model]
+    row = memo[key]
+    if row is None:
+        raise AccessError(404, f'{label} not found')
+
+    obj, owned = row
+    if not owned:
+        raise AccessError(403, f'Not authorized to access this {label.lower()}')
+    return obj
+
+
+def get_existing(session, model, object_id):
+    """
+    Re-read a row inside a write unit.
+
+    The row may have been deleted since the request's get_owned() check, by
+    a write that committed in between. populate_existing makes the lookup
+    go to the database even when get_owned() already loaded the row into
+    this session.
+
+    Raises:
+        AccessError: 404 if the row no longer exists
+    """
+    obj = session.get(model, object_id, populate_existing=True)
+    if obj is None:
+        raise AccessError(404, f'{LABELS[model]} not found')
+    return obj
@@ -0,0 +1,184 @@
+"""
+Online backups through SQLite's backup API.
+
+Copying todos.db while the service runs can produce a torn copy (and
+misses whatever is still in the -wal file). backup_database() instead
+copies the database through sqlite3's backup API. By default the whole
+file is copied in one step: in WAL mode that step only holds a read
+snapshot, so writers are never blocked by it. With BACKUP_PAGES_PER_STEP
+set, the copy proceeds that many pages at a time, sleeping BACKUP_SLEEP
+seconds between steps; but SQLite restarts a stepwise copy whenever
+another connection writes to the source, so on a busy database it may
+never finish. The backup fails with BackupError after BACKUP_MAX_RESTARTS
+restarts.
+
+Every backup goes to a ".partial" file, is checked with
+PRAGMA integrity_check and only then renamed into place; a failed backup
+removes its partial file. run_backup() backs up the main database plus
+any shard files (see shards.py) into one timestamped directory under
+BACKUP_DIRECTORY. Use `flask backup` or POST /api/admin/backup.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from logconfig import get_logger
+from shards import database_files
+
+logger = get_logger('backup')
+
+# One backup at a time per process; a second request gets a 409
+backup_lock = threading.Lock()
+
+
+class BackupError(Exception):
+    """A backup could not be taken or failed verification."""
+
+
+class BackupInProgress(BackupError):
+    """Another backup is already running in this process."""
+
+
+def backup_database(source_path, dest_path, pages=-1, sleep=0.01, max_restarts=3, progress=None):
+    """
+    Copy a live SQLite database to dest_path and verify the copy.
+
+    Args:
+        source_path: Database file to back up
+        dest_path: File to create (must not exist yet)
+        pages: Pages copied per step (-1 copies everything in one step)
+        sleep: Seconds to pause between steps
+        max_restarts: Restarts of a stepwise copy (caused by writes to the
+            source) tolerated before giving up
+        progress: Optional callable(copied_pages, total_pages) run after each step
+
+    Returns:
+        Dict with the backup's path, pages, bytes and seconds taken
+
+    Raises:
+        BackupError: If dest_path exists, the copy keeps restarting or it
+            fails integrity_check
+    """
+    if os.path.exists(dest_path):
+        raise BackupError(f'{dest_path} already exists')
+    partial = f'{dest_path}.partial'
+    started = time.perf_counter()
+    restarts = 0
+    last_remaining = None
+
+    def report(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise BackupError(f'Backup of {source_path} restarted {restarts} times because of '
+                                  f'concurrent writes; retry later or copy in one step')
+        last_remaining = remaining
+        if progress is not None:
+            progress(total - remaining, total)
+
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(partial)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=report, sleep=sleep)
+            total_pages = target.execute('PRAGMA page_count').fetchone()[0]
+            # The copy has the source's WAL header bit; a standalone file reads better without it
+            target.execute('PRAGMA journal_mode=DELETE')
+            problems = [row[0] for row in target.execute('PRAGMA integrity_check')]
+        finally:
+            source.close()
+            target.close()
+        if problems != ['ok']:
+            raise BackupError(f'Backup of {source_path} failed integrity_check: {"; ".join(problems[:5])}')
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+
+    os.replace(partial, dest_path)
+    return {
+        'path': dest_path,
+        'pages': total_pages,
+        'bytes': os.path.getsize(dest_path),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def run_backup(destination=None, progress=None):
+    """
+    Back up the current app's databases into a new timestamped directory.
+
+    Args:
+        destination: Parent directory (defaults to BACKUP_DIRECTORY)
+        progress: Optional callable(name, copied_pages, total_pages)
+
+    Returns:
+        Dict with the backup directory and one result per database file
+
+    Raises:
+        BackupInProgress: If another backup is running
+        BackupError: If a copy keeps restarting or fails verification
+    """
+    app = current_app._get_current_object()
+    if not backup_lock.acquire(blocking=False):
+        raise BackupInProgress('A backup is already running')
+    try:
+        sources = database_files(app)
+        if not sources:
+            raise BackupError('Backups need a file-backed SQLite database')
+        directory = os.path.join(
+            destination or app.config['BACKUP_DIRECTORY'],
+            datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f'),
+        )
+        os.makedirs(os.path.join(directory, 'shards') if len(sources) > 1 else directory)
+
+        files = []
+        for name, path in sources:
+            step = (lambda copied, total, name=name: progress(name, copied, total)) if progress else None
+            result = backup_database(
+                path,
+                os.path.join(directory, name),
+                pages=app.config['BACKUP_PAGES_PER_STEP'],
+                sleep=app.config['BACKUP_SLEEP'],
+                max_restarts=app.config['BACKUP_MAX_RESTARTS'],
+                progress=step,
+            )
+            files.append({'name': name, **result})
+        logger.info('Backup written to %s (%d file(s))', directory, len(files))
+        return {'directory': directory, 'files': files}
+    finally:
+        backup_lock.release()
+
+
+@click.command('backup')
+@click.option('--dest', type=click.Path(file_okay=False), default=None,
+              help='Parent directory for the backup (default: BACKUP_DIRECTORY).')
+@with_appcontext
+def backup_command(dest):
+    """Take an online backup of the database(s) and verify it."""
+    def progress(name, copied, total):
+        click.echo(f'{name}: {copied}/{total} pages', err=True)
+
+    try:
+        result = run_backup(dest, progress=progress)
+    except BackupError as exc:
+        raise click.ClickException(str(exc))
+    for file in result['files']:
+        click.echo(f"{file['name']}: {file['pages']} pages, {file['bytes']} bytes in {file['seconds']}s, integrity ok")
+    click.echo(f"Backup written to {result['directory']}")
+
+
+def init_backups(app):
+    """Backup defaults and the `flask backup` command."""
+    app.config.setdefault('BACKUP_DIRECTORY', os.path.join(app.instance_path, 'backups'))
+    app.config.setdefault('BACKUP_PAGES_PER_STEP', -1)
+    app.config.setdefault('BACKUP_SLEEP', 0.01)
+    app.config.setdefault('BACKUP_MAX_RESTARTS', 3)
+    app.cli.add_command(backup_command)
@@ -0,0 +1,104 @@
+"""
+Benchmark: write latency while an online backup runs.
+
+Fills a fresh database with todos, then times single todo creations
+three ways: with no backup running, during a stepwise backup (see
+backup.py), and during a one-step backup of the whole file. Reports the
+median and worst write latency and the backup's duration ("gave up" when
+the writes kept restarting a stepwise copy).
+
+Usage:
+    cd server
+    python benchmarks/bench_backup.py [--todos 50000] [--writes 200]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from backup import BackupError, backup_database
+from models import db, TodoItem
+
+
+def setup(directory, todos):
+    """Client of an app on a fresh database holding `todos` todos; returns (client, project_id)."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(directory, "bench.db")}',
+        'SESSION_TYPE': 'memory',
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    client = app.test_client()
+    client.post('/api/auth/register', json={
+        'username': 'bench', 'email': 'bench@example.com', 'password': 'benchpass'
+    })
+    project = client.post('/api/projects', json={'name': 'Bench'}).get_json()['project']
+    with app.app_context():
+        db.session.bulk_save_objects([
+            TodoItem(title=f'Task {i}', description='x' * 200, list_id=project['id'], user_id=project['user_id'], order_index=i)
+            for i in range(todos)
+        ])
+        db.session.commit()
+    return client, project['id']
+
+
+def time_writes(client, project_id, writes, until=None):
+    """Latencies (ms) of `writes` creations, or of creations until `until` is set."""
+    latencies = []
+    while len(latencies) < writes if until is None else not until.is_set():
+        start = time.perf_counter()
+        client.post('/api/todos?return=minimal', json={'project_id': project_id, 'title': 'Write'})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--todos', type=int, default=50000)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        client, project_id = setup(directory, args.todos)
+        source = os.path.join(directory, 'bench.db')
+        print(f'{os.path.getsize(source) / 1e6:.1f} MB database')
+        print(f'{"mode":<22} {"backup s":>9} {"writes":>7} {"median ms":>10} {"max ms":>8}')
+
+        latencies = time_writes(client, project_id, args.writes)
+        print(f'{"no backup":<22} {"-":>9} {len(latencies):>7} {statistics.median(latencies):>10.2f} {max(latencies):>8.2f}')
+
+        for label, pages, sleep in (('stepwise (256, 10ms)', 256, 0.01), ('one step', -1, 0)):
+            done = threading.Event()
+            dest = os.path.join(directory, f'backup-{pages}.db')
+
+            def backup():
+                started = time.perf_counter()
+                try:
+                    backup_database(source, dest, pages=pages, sleep=sleep)
+                    backup.result = f'{time.perf_counter() - started:.2f}'
+                except BackupError:
+                    # Restarted by the concurrent writes more than max_restarts times
+                    backup.result = 'gave up'
+                finally:
+                    done.set()
+
+            thread = threading.Thread(target=backup)
+            thread.start()
+            latencies = time_writes(client, project_id, args.writes, until=done)
+            thread.join()
+            print(f'{label:<22} {backup.result:>9} {len(latencies):>7} '
+                  f'{statistics.median(latencies):>10.2f} {max(latencies):>8.2f}')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
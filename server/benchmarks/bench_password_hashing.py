@@ -0,0 +1,67 @@
+"""
+Benchmark: login throughput with the configured password hash method.
+
+Registers one user, then runs logins from several client threads against
+the app's bounded hasher and reports logins per second, per hash worker
+(one worker per core by default).
+
+Usage:
+    cd server
+    python benchmarks/bench_password_hashing.py [--method scrypt] [--logins 200] [--threads 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from passwords import DEFAULT_HASH_METHOD
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--method', default=DEFAULT_HASH_METHOD)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'PASSWORD_HASH_METHOD': args.method,
+            'PASSWORD_HASH_WORKERS': args.workers,
+            'RATELIMIT_ENABLED': False,
+        })
+        credentials = {'username': 'benchuser', 'password': 'benchpass123'}
+        app.test_client().post('/api/auth/register', json={**credentials, 'email': 'bench@example.com'})
+
+        def login(_):
+            return app.test_client().post('/api/auth/login', json=credentials).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            statuses = list(pool.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - start
+
+        hasher = app.extensions['password_hasher']
+        rate = args.logins / elapsed
+        print(f'method {hasher.method}, {hasher.workers} hash workers, {args.threads} client threads')
+        print(f'{args.logins} logins ({statuses.count(200)} ok) in {elapsed:.2f}s')
+        print(f'{rate:.1f} logins/s, {rate / hasher.workers:.1f} logins/s per core')
+        hasher.shutdown()
+        with app.app_context():
+            db.session.remove()
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
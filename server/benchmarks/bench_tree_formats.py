@@ -0,0 +1,63 @@
+"""
+Benchmark: payload size and encode time of the todo tree response formats.
+
+Reuses the seeded 10k-node project from bench_tree_serialization and encodes
+the same rows as nested JSON, columnar JSON and (if installed) MessagePack.
+
+Usage:
+    cd server
+    python benchmarks/bench_tree_formats.py [--nodes 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, TodoItem
+from serializers import build_todo_tree, columnar_todos, load_todo_rows, msgpack
+from bench_tree_serialization import seed
+
+
+def encoders():
+    """(name, encode function) pairs; each takes row tuples and returns bytes."""
+    yield 'json-tree', lambda rows: json.dumps({'todos': build_todo_tree(rows)}).encode()
+    yield 'columnar', lambda rows: json.dumps(columnar_todos(rows)).encode()
+    if msgpack is not None:
+        yield 'msgpack', lambda rows: msgpack.packb({'todos': build_todo_tree(rows)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+        with app.app_context():
+            project_id = seed(args.nodes)
+            rows = load_todo_rows(TodoItem.list_id == project_id, order_by=(TodoItem.created_at, TodoItem.id))
+
+            print(f'{args.nodes} nodes, best of {args.repeat}')
+            print(f'{"format":<10} {"bytes":>10} {"encode (ms)":>12}')
+            for name, encode in encoders():
+                best = float('inf')
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    payload = encode(rows)
+                    best = min(best, time.perf_counter() - start)
+                print(f'{name:<10} {len(payload):>10} {best * 1000:>12.1f}')
+            db.session.remove()
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: ORM vs row-tuple serialization of a 10k-node todo tree.
+
+Builds a throwaway SQLite database with one project holding --nodes todos
+(three levels deep) and reports wall time and peak Python memory for:
+
+    orm-lazy  - top-level query + to_dict(include_children=True) (the original get_todos)
+    orm-flat  - one ORM query for the project + in-memory tree
+    rows      - Core select() tuples + serializers.build_todo_tree (current get_todos)
+
+Usage:
+    cd server
+    python benchmarks/bench_tree_serialization.py [--nodes 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, User, TodoList, TodoItem
+from serializers import build_todo_tree, load_todo_rows
+
+
+def seed(nodes):
+    """Create a user and a project with a three-level tree of `nodes` todos."""
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    project = TodoList(name='Bench', user_id=user.id)
+    db.session.add(project)
+    db.session.flush()
+
+    created = 0
+    while created < nodes:
+        root = TodoItem(title=f'Task {created}', list_id=project.id, user_id=user.id, depth=0)
+        db.session.add(root)
+        db.session.flush()
+        created += 1
+        for i in range(3):
+            if created >= nodes:
+                break
+            child = TodoItem(title=f'Sub {created}', list_id=project.id, user_id=user.id,
+                             parent_id=root.id, depth=1, order_index=i)
+            db.session.add(child)
+            db.session.flush()
+            created += 1
+            if created < nodes:
+                db.session.add(TodoItem(title=f'Leaf {created}', list_id=project.id, user_id=user.id,
+                                        parent_id=child.id, depth=2))
+                created += 1
+    db.session.commit()
+    return project.id
+
+
+def orm_lazy(project_id):
+    todos = TodoItem.query.filter_by(list_id=project_id, parent_id=None).order_by(TodoItem.created_at).all()
+    return [todo.to_dict(include_children=True) for todo in todos]
+
+
+def orm_flat(project_id):
+    todos = TodoItem.query.filter_by(list_id=project_id).order_by(TodoItem.created_at, TodoItem.id).all()
+    nodes = {}
+    for todo in todos:
+        node = todo.to_dict()
+        node['children'] = []
+        nodes[todo.id] = node
+    roots = []
+    for todo in todos:
+        parent = nodes.get(todo.parent_id)
+        (parent['children'] if parent else roots).append(nodes[todo.id])
+    return roots
+
+
+def rows(project_id):
+    return build_todo_tree(load_todo_rows(TodoItem.list_id == project_id,
+                                          order_by=(TodoItem.created_at, TodoItem.id)))
+
+
+def measure(func, project_id, repeat):
+    """Return (best seconds, peak MiB) for func, starting each run with an empty session."""
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        func(project_id)
+        best = min(best, time.perf_counter() - start)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    func(project_id)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+        with app.app_context():
+            project_id = seed(args.nodes)
+            print(f'{args.nodes} nodes, best of {args.repeat}')
+            print(f'{"path":<10} {"time (ms)":>10} {"peak MiB":>10}')
+            for name, func in (('orm-lazy', orm_lazy), ('orm-flat', orm_flat), ('rows', rows)):
+                seconds, peak = measure(func, project_id, args.repeat)
+                print(f'{name:<10} {seconds * 1000:>10.1f} {peak:>10.1f}')
+            db.session.remove()
+    finally:
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: concurrent todo creation with and without the group-commit pipeline.
+
+Runs the same burst of POST /api/todos requests from several client
+threads against a fresh database twice, once committing per request and
+once through the write pipeline, and reports requests per second.
+
+Usage:
+    cd server
+    python benchmarks/bench_write_pipeline.py [--requests 2000] [--threads 16]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+
+
+def run(pipelined, requests, threads):
+    """Create `requests` todos from `threads` clients; returns (seconds, failures, stats)."""
+    directory = tempfile.mkdtemp()
+    db_path = os.path.join(directory, 'bench.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SESSION_TYPE': 'memory',
+        'RATELIMIT_ENABLED': False,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'WRITE_PIPELINE_ENABLED': pipelined,
+    })
+    setup = app.test_client()
+    setup.post('/api/auth/register', json={
+        'username': 'bench', 'email': 'bench@example.com', 'password': 'benchpass'
+    })
+    project_id = setup.post('/api/projects', json={'name': 'Bench'}).get_json()['project']['id']
+    cookie = setup.get_cookie('todo_session').value
+
+    def create(i):
+        client = app.test_client()
+        client.set_cookie('todo_session', cookie)
+        return client.post('/api/todos?return=minimal', json={'project_id': project_id, 'title': f'Task {i}'}).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(create, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    pipeline = app.extensions.get('write_pipeline')
+    stats = pipeline.stats() if pipeline else None
+    if pipeline:
+        pipeline.stop()
+    for name in os.listdir(directory):
+        os.unlink(os.path.join(directory, name))
+    os.rmdir(directory)
+    return elapsed, sum(status != 201 for status in statuses), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f'{args.requests} creates from {args.threads} threads')
+    print(f'{"mode":<12} {"req/s":>10} {"failed":>8} {"avg batch":>10}')
+    for pipelined in (False, True):
+        elapsed, failed, stats = run(pipelined, args.requests, args.threads)
+        batch = f'{stats["units"] / stats["batches"]:.1f}' if stats else '1'
+        print(f'{"pipeline" if pipelined else "per-request":<12} {args.requests / elapsed:>10.1f} {failed:>8} {batch:>10}')
+
+
+if __name__ == '__main__':
+    main()
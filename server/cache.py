@@ -0,0 +1,170 @@
+"""
+Small in-process caches.
+
+LRUCache is a thread-safe bounded mapping with optional TTL and hit/miss
+counters; TreeCache builds on it to hold rendered todo tree responses
+(plus their compressed encodings) per project.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with an optional time-to-live.
+
+    Args:
+        maxsize: Maximum number of entries kept
+        ttl: Seconds an entry stays valid (None for no expiry)
+        on_evict: Optional callable(key, value) run when an entry is dropped
+            to make room (not on explicit pop/clear)
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+                self.evictions += 1
+
+        if self.on_evict is not None:
+            for old_key, (old_value, _) in evicted:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        """Remove key and return its value (default if absent)."""
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        """Snapshot of (key, value) pairs, least recently used first."""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._data.items()]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self):
+        """Size and hit-rate counters, e.g. for the readiness endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class CachedPayload:
+    """A rendered response body plus lazily added compressed encodings of it."""
+
+    __slots__ = ('body', 'mimetype', 'encoded')
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.encoded = {}
+
+
+class TreeCache:
+    """
+    Rendered todo tree responses, keyed by project and request variant.
+
+    Each project has a generation number that invalidate() bumps. Entries are
+    stored under (project_id, generation, variant), so invalidating a project
+    makes all of its entries unreachable at once; they simply age out of the LRU.
+    A response rendered while a write was in flight is not stored, because its
+    generation no longer matches by the time it is put().
+
+    Only the max_projects most recently invalidated projects keep their own
+    generation; the rest share a floor generation. Forgetting a project raises
+    the floor above every number handed out so far, so none of its old
+    entries (nor those of other projects at the old floor) are served again.
+    """
+
+    def __init__(self, maxsize=256, max_projects=None):
+        self._entries = LRUCache(maxsize)
+        self._generations = OrderedDict()
+        self._max_projects = max_projects or maxsize * 4
+        self._floor = 0
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def generation(self, project_id):
+        """Current generation of a project; capture it before rendering."""
+        return self._generations.get(project_id, self._floor)
+
+    def get(self, project_id, variant):
+        """Cached CachedPayload for the project's current generation, or None."""
+        return self._entries.get((project_id, self.generation(project_id), variant))
+
+    def put(self, project_id, variant, generation, payload):
+        """Store payload if the project has not changed since generation was read."""
+        with self._lock:
+            if self.generation(project_id) != generation:
+                return False
+            self._entries.set((project_id, generation, variant), payload)
+        return True
+
+    def invalidate(self, project_id):
+        """Forget every cached response for a project."""
+        with self._lock:
+            self._counter += 1
+            self._generations[project_id] = self._counter
+            self._generations.move_to_end(project_id)
+            if len(self._generations) > self._max_projects:
+                self._generations.popitem(last=False)
+                self._counter += 1
+                self._floor = self._counter
+
+    def clear(self):
+        """Forget everything."""
+        with self._lock:
+            self._generations.clear()
+            self._entries.clear()
+
+    def stats(self):
+        """Hit-rate counters of the underlying LRU."""
+        return self._entries.stats()
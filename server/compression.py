@@ -0,0 +1,110 @@
+"""
+Response compression for large JSON payloads.
+
+Responses at least COMPRESS_MIN_SIZE bytes long are encoded with the best
+algorithm the client accepts (brotli if the package is installed, then gzip,
+then deflate). Streamed responses (SSE, NDJSON export) are left alone.
+
+When a view attaches a cache.CachedPayload as response.cache_entry, the
+compressed bytes are stored on that entry, so a cached tree is compressed
+once per encoding rather than on every request.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: br is only offered when the package is installed
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/x-msgpack')
+
+
+def compress(data, encoding, level):
+    """Compress data with the given content-coding."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zlib.compress(data, level)
+
+
+def available_encodings(app):
+    """Configured encodings in server preference order, minus unavailable ones."""
+    encodings = app.config.get('COMPRESS_ALGORITHMS', ('br', 'gzip', 'deflate'))
+    return [name for name in encodings if name != 'br' or brotli is not None]
+
+
+def choose_encoding(accept_encoding, encodings):
+    """
+    Pick the first of encodings that an Accept-Encoding header allows.
+
+    Honours q=0 exclusions and "*"; returns None for identity.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response):
+    """Whether a response is a buffered, uncompressed, compressible payload."""
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype.endswith('+json') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def init_compression(app):
+    """Register the compression after_request hook and its default settings."""
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_ALGORITHMS', ('br', 'gzip', 'deflate'))
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config['COMPRESS_ENABLED'] or not is_compressible(response):
+            return response
+
+        entry = getattr(response, 'cache_entry', None)
+        length = len(entry.body) if entry is not None else response.calculate_content_length()
+        if length is None or length < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), available_encodings(app))
+        if encoding is None:
+            return response
+
+        body = entry.encoded.get(encoding) if entry is not None else None
+        if body is None:
+            body = compress(response.get_data(), encoding, app.config['COMPRESS_LEVEL'])
+            if entry is not None:
+                entry.encoded[encoding] = body
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -18,12 +18,13 @@ def app():
     """Create and configure a test application instance."""
     db_fd, db_path = tempfile.mkstemp()
 
-    app = create_app()
-    app.config.update({
+    app = create_app({
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'SECRET_KEY': 'test-secret-key',
-        'SESSION_TYPE': 'filesystem',
+        'SESSION_TYPE': 'memory',
+        # Cheap hashes keep the suite fast; production uses scrypt
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
     })
 
     with app.app_context():
@@ -33,7 +34,9 @@ def app():
         db.drop_all()
 
     os.close(db_fd)
-    os.unlink(db_path)
+    for path in (db_path, f'{db_path}-wal', f'{db_path}-shm'):
+        if os.path.exists(path):
+            os.unlink(path)
 
 
 @pytest.fixture
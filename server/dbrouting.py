@@ -0,0 +1,195 @@
+"""
+Read/write connection routing for SQLite.
+
+In WAL mode readers never block the writer (and vice versa), but only if
+they are not queued behind it for the same few pooled connections. When
+routing is enabled, queries made by the read-only endpoints in
+READ_ENDPOINTS run on a separate engine opened with SQLite's mode=ro URI
+flag (READ_POOL_SIZE connections); everything else, and any flush, goes
+to the default engine, sized as a small writer pool (WRITE_POOL_SIZE).
+
+Each pool's checkouts are counted by PoolMetrics and kept in
+app.extensions['db_pools'].
+"""
+import contextlib
+import contextvars
+import threading
+import time
+
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+# Endpoints that only read; their queries may run on the read-only pool
+READ_ENDPOINTS = frozenset({
+    'api.get_projects',
+    'api.get_project',
+    'api.get_todos',
+    'api.get_archive',
+    # Streams for as long as the client reads; must not hold a writer connection
+    'api.export_data',
+    'auth.get_current_user',
+    # Only checks ownership in the request; the value is written later in a batch
+    'api.update_ui_state',
+})
+
+# Set by explicit_transactions(); read by begin_sqlite_transaction()
+_explicit_begin = contextvars.ContextVar('explicit_begin', default=False)
+
+
+class PoolMetrics:
+    """Checkout counters for one engine's connection pool."""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.total_hold_seconds = 0.0
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        if started is None:
+            return
+        with self._lock:
+            self.checked_out -= 1
+            self.total_hold_seconds += time.perf_counter() - started
+
+    def stats(self):
+        """Counters plus the pool's configured size."""
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                'pool_size': pool.size() if hasattr(pool, 'size') else None,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'avg_hold_ms': round(self.total_hold_seconds / self.checkouts * 1000, 3) if self.checkouts else None,
+            }
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends sharded tables to the current user's
+    shard (see shards.py) and read-only endpoints' queries to the reader engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            router = current_app.extensions.get('shard_router')
+            if router is not None:
+                engine = router.engine_for(mapper, clause)
+                if engine is not None:
+                    return engine
+            if not self._flushing and self._use_reader():
+                return current_app.extensions['read_engine']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @staticmethod
+    def _use_reader():
+        return (
+            has_request_context()
+            and request.endpoint in READ_ENDPOINTS
+            and 'read_engine' in current_app.extensions
+        )
+
+
+def sqlite_file_path(uri):
+    """Database file of a SQLite URI, or None for other backends and in-memory databases."""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL journal so readers and the writer proceed concurrently."""
+    cursor = dbapi_connection.cursor()
+    # Only takes effect for new files (or after a VACUUM); see maintenance.py
+    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+@contextlib.contextmanager
+def explicit_transactions():
+    """Within this block, SQLite transactions start with BEGIN IMMEDIATE (see begin_sqlite_transaction)."""
+    token = _explicit_begin.set(True)
+    try:
+        yield
+    finally:
+        _explicit_begin.reset(token)
+
+
+def begin_sqlite_transaction(conn):
+    """
+    'begin' listener for SQLite engines.
+
+    pysqlite only sends BEGIN before an INSERT, UPDATE or DELETE, so a
+    SAVEPOINT issued first runs outside any transaction and its RELEASE
+    commits right away. Inside explicit_transactions() (the write
+    pipeline's batches) the transaction is opened up front instead, so the
+    savepoints nest in it and only the final COMMIT syncs. IMMEDIATE takes
+    the write lock at once rather than failing to upgrade a read snapshot.
+    """
+    if _explicit_begin.get():
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def writer_engine_options(app):
+    """Engine options for the default (writer) engine; call before db.init_app."""
+    app.config.setdefault('READ_ROUTING_ENABLED', True)
+    app.config.setdefault('READ_POOL_SIZE', 8)
+    app.config.setdefault('WRITE_POOL_SIZE', 2)
+    app.config.setdefault('WRITE_POOL_OVERFLOW', 8)
+
+    if sqlite_file_path(app.config['SQLALCHEMY_DATABASE_URI']) is None:
+        return
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_size', app.config['WRITE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['WRITE_POOL_OVERFLOW'])
+
+
+def init_read_routing(app, db):
+    """Enable WAL, create the read-only engine and attach pool metrics; call after db.init_app."""
+    pools = app.extensions['db_pools'] = {}
+    with app.app_context():
+        writer = db.engine
+    pools['writer'] = PoolMetrics('writer', writer)
+
+    if sqlite_file_path(app.config['SQLALCHEMY_DATABASE_URI']) is None:
+        return
+    event.listen(writer, 'connect', set_sqlite_pragmas)
+    event.listen(writer, 'begin', begin_sqlite_transaction)
+
+    if not app.config['READ_ROUTING_ENABLED']:
+        return
+    # Flask-SQLAlchemy has already made a relative path absolute (under instance/)
+    reader = create_engine(
+        f'sqlite:///file:{writer.url.database}?mode=ro&uri=true',
+        pool_size=app.config['READ_POOL_SIZE'],
+        max_overflow=0,
+    )
+    app.extensions['read_engine'] = reader
+    pools['reader'] = PoolMetrics('reader', reader)
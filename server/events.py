@@ -0,0 +1,105 @@
+"""
+In-process publish/subscribe for per-project change events.
+
+Mutation handlers publish a small delta after they commit; the SSE endpoint
+subscribes to a project and forwards those deltas to connected clients so
+they can patch their local tree instead of re-downloading it.
+"""
+import itertools
+import queue
+import threading
+
+from logconfig import get_logger
+
+logger = get_logger('events')
+
+
+class Subscription:
+    """
+    A single client's view of one project's events.
+
+    Events are buffered in a bounded queue. If the client falls behind and the
+    queue fills up, further events are dropped and the subscription is marked
+    as overflowed; the stream then tells the client to resync and closes.
+    """
+
+    def __init__(self, project_id, maxsize):
+        self.project_id = project_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        """Enqueue an event without ever blocking the publisher."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Wait up to timeout seconds for the next event (raises queue.Empty)."""
+        return self.queue.get(timeout=timeout)
+
+
+class EventBroker:
+    """
+    Fan-out of project events to subscriptions and listeners.
+
+    Listeners are plain callables invoked as listener(project_id, event_type,
+    payload) for every published event, e.g. to invalidate caches. Events are
+    published after the write has committed, so a failing listener is logged
+    and the event is still delivered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._listeners = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, project_id, maxsize=256):
+        """Register and return a new Subscription for project_id."""
+        subscription = Subscription(project_id, maxsize)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription; safe to call more than once."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.project_id]
+
+    def add_listener(self, listener):
+        """Call listener(project_id, event_type, payload) on every publish."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def subscriber_count(self, project_id=None):
+        """Number of open subscriptions, overall or for one project."""
+        with self._lock:
+            if project_id is not None:
+                return len(self._subscribers.get(project_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, project_id, event_type, payload):
+        """Deliver an event to every subscriber of project_id."""
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(project_id, ()))
+            listeners = tuple(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(project_id, event_type, payload)
+            except Exception:
+                logger.exception('Event listener failed', extra={'fields': {'project_id': project_id}})
+
+        if subscribers:
+            event = (next(self._ids), event_type, payload)
+            for subscription in subscribers:
+                subscription.put(event)
+
+
+event_broker = EventBroker()
@@ -0,0 +1,142 @@
+"""
+Parsers for bulk-importing todos from Markdown checklists and CSV files.
+
+Both parsers return a flat list of dictionaries in parent-before-child order.
+Each entry refers to its parent by position in that list, so the caller can
+insert level by level and resolve real ids as it goes.
+"""
+import csv
+import io
+import re
+
+MAX_DEPTH = 2  # Levels 0, 1, 2 - same limit as the todo routes
+
+VALID_PRIORITIES = ('low', 'medium', 'high')
+
+CHECKLIST_LINE = re.compile(r'^(?P<indent>[ \t]*)[-*+][ \t]+(?:\[(?P<mark>[ xX])\][ \t]*)?(?P<title>.*?)\s*$')
+
+
+def make_item(title, line_number, parent_index=None, depth=0, description='',
+              completed=False, priority='medium'):
+    """Validate one parsed row and build the item dictionary."""
+    title = title.strip()
+    if not title:
+        raise ValueError(f'Line {line_number}: title cannot be empty')
+    if len(title) > 500:
+        raise ValueError(f'Line {line_number}: title must be 500 characters or less')
+    if depth > MAX_DEPTH:
+        raise ValueError(f'Line {line_number}: maximum nesting depth reached (3 levels max)')
+
+    priority = (priority or 'medium').strip().lower()
+    if priority not in VALID_PRIORITIES:
+        priority = 'medium'
+
+    return {
+        'title': title,
+        'description': (description or '').strip(),
+        'completed': completed,
+        'priority': priority,
+        'depth': depth,
+        'parent_index': parent_index,
+    }
+
+
+def parse_markdown_checklist(text):
+    """
+    Parse a nested Markdown checklist.
+
+    Supports "- [ ] task", "- [x] done task" and plain "- task" bullets
+    (with -, * or +). Indentation decides nesting; tabs count as four spaces.
+    Lines that are not list items (headings, blank lines, prose) are skipped.
+
+    Raises:
+        ValueError: If an item is nested deeper than 3 levels or has no title
+    """
+    items = []
+    stack = []  # (indent width, item index) for the current chain of ancestors
+
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        match = CHECKLIST_LINE.match(line)
+        if not match:
+            continue
+
+        indent = len(match.group('indent').expandtabs(4))
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+
+        parent_index = stack[-1][1] if stack else None
+        items.append(make_item(
+            match.group('title'),
+            line_number,
+            parent_index=parent_index,
+            depth=len(stack),
+            completed=(match.group('mark') or ' ').lower() == 'x',
+        ))
+        stack.append((indent, len(items) - 1))
+
+    return items
+
+
+def parse_csv(text):
+    """
+    Parse a CSV file with a header row.
+
+    Columns:
+        title (required), id, parent_id, description, completed, priority
+
+    "id" and "parent_id" are references local to the file; a parent row must
+    appear before its children.
+
+    Raises:
+        ValueError: If the header is missing, a parent reference is unknown,
+            or an item is nested deeper than 3 levels
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'title' not in [name.strip().lower() for name in reader.fieldnames]:
+        raise ValueError('CSV must have a header row with a "title" column')
+
+    items = []
+    index_by_ref = {}
+
+    try:
+        rows = list(reader)
+    except csv.Error as e:
+        raise ValueError(f'Line {reader.line_num}: {e}')
+
+    for line_number, row in enumerate(rows, start=2):
+        row = {(key or '').strip().lower(): value if isinstance(value, str) else ''
+               for key, value in row.items()}
+
+        if not any(value.strip() for value in row.values()):
+            continue
+
+        parent_index = None
+        depth = 0
+        parent_ref = row.get('parent_id', '').strip()
+        if parent_ref:
+            if parent_ref not in index_by_ref:
+                raise ValueError(f'Line {line_number}: parent "{parent_ref}" not found (parents must come first)')
+            parent_index = index_by_ref[parent_ref]
+            depth = items[parent_index]['depth'] + 1
+
+        items.append(make_item(
+            row.get('title', ''),
+            line_number,
+            parent_index=parent_index,
+            depth=depth,
+            description=row.get('description', ''),
+            completed=row.get('completed', '').strip().lower() in ('1', 'true', 'yes', 'x'),
+            priority=row.get('priority', ''),
+        ))
+
+        ref = row.get('id', '').strip()
+        if ref:
+            index_by_ref[ref] = len(items) - 1
+
+    return items
+
+
+PARSERS = {
+    'markdown': parse_markdown_checklist,
+    'csv': parse_csv,
+}
@@ -0,0 +1,224 @@
+"""
+Cross-process cache invalidation through the main SQLite database.
+
+The rendered-tree and user caches live inside each worker process, so with
+several workers a write handled by one leaves stale entries in the others.
+With INVALIDATION_BUS_ENABLED, every project event (see events.py) and every
+committed user change is also queued for cache_invalidations. Each worker
+runs a thread that, every INVALIDATION_POLL_INTERVAL seconds, writes the
+queued keys in one insert (so requests never wait on the main database's
+write lock for it, which matters most when todo data lives in shard files)
+and then checks PRAGMA data_version on its own read-only connection. The
+pragma only changes after another connection commits, so an idle poll reads
+no table. When it changes, the thread reads the new rows (skipping its own
+process's) and drops the matching cache entries. Rows older than
+INVALIDATION_RETENTION seconds are pruned as part of the inserts.
+
+The bus needs a file-backed SQLite database; an in-memory one cannot be
+shared between processes anyway.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, insert
+
+from dbrouting import sqlite_file_path
+from events import event_broker
+from logconfig import get_logger
+from models import db, CacheInvalidation
+
+logger = get_logger('invalidation')
+
+
+class InvalidationBus:
+    """Publishes cache invalidations and applies those of other processes."""
+
+    def __init__(self, engine, path, interval=0.05, retention=300):
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._handlers = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._version = None
+        self._last_id = 0
+        self._next_prune = 0.0
+        self.published = 0
+        self.applied = 0
+        self.polls = 0
+
+    def add_handler(self, kind, handler):
+        """Call handler(key) for every invalidation of kind published by another process."""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, kind, keys):
+        """
+        Queue the given keys of kind as changed; the bus thread writes them.
+
+        Args:
+            kind: 'project' or 'user'
+            keys: Iterable of project or user ids
+        """
+        with self._lock:
+            self._pending.update((kind, key) for key in keys)
+
+    def flush(self):
+        """
+        Write the queued invalidations in one transaction.
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        table = CacheInvalidation.__table__
+        now = datetime.utcnow()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(table), [
+                    {'kind': kind, 'key': key, 'origin': self.origin, 'created_at': now} for kind, key in pending
+                ])
+                if time.monotonic() >= self._next_prune:
+                    conn.execute(delete(table).where(table.c.created_at < now - timedelta(seconds=self.retention)))
+                    self._next_prune = time.monotonic() + self.retention
+        except Exception:
+            # Retried on the next tick
+            with self._lock:
+                self._pending |= pending
+            raise
+        with self._lock:
+            self.published += len(pending)
+        return len(pending)
+
+    def start(self):
+        """Open the polling connection and start the poll thread."""
+        self._conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+        # Only rows committed from now on matter; older ones predate our caches
+        self._version = self._data_version()
+        self._last_id = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM cache_invalidations').fetchone()[0]
+        self._thread = threading.Thread(target=self._run, name='invalidation-bus', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _data_version(self):
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Invalidation flush failed')
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Invalidation poll failed')
+
+    def poll(self):
+        """
+        Apply invalidations committed by other processes since the last poll.
+
+        Returns:
+            Number of invalidations applied
+        """
+        with self._lock:
+            self.polls += 1
+            version = self._data_version()
+            if version == self._version:
+                return 0
+            self._version = version
+            rows = self._conn.execute(
+                'SELECT id, kind, key, origin FROM cache_invalidations WHERE id > ? ORDER BY id',
+                (self._last_id,),
+            ).fetchall()
+            if rows:
+                self._last_id = rows[-1][0]
+
+        applied = 0
+        for _, kind, key, origin in rows:
+            if origin == self.origin:
+                continue
+            for handler in self._handlers.get(kind, ()):
+                handler(key)
+            applied += 1
+        with self._lock:
+            self.applied += applied
+        return applied
+
+    def stop(self):
+        """Stop the poll thread, write what is still queued and close the connection; safe to call more than once."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Invalidation flush failed')
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        """Counters for monitoring."""
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'published': self.published,
+                'applied': self.applied,
+                'polls': self.polls,
+            }
+
+
+def publish_invalidation(kind, keys):
+    """Publish through the current app's invalidation bus, if it has one."""
+    if not has_app_context():
+        return
+    bus = current_app.extensions.get('invalidation_bus')
+    if bus is not None:
+        bus.publish(kind, keys)
+
+
+# Every project event already means "this project's cached tree is stale"
+event_broker.add_listener(lambda project_id, event_type, payload: publish_invalidation('project', [project_id]))
+
+
+def init_invalidation_bus(app):
+    """Start the app's invalidation bus if INVALIDATION_BUS_ENABLED; call after create_all."""
+    app.config.setdefault('INVALIDATION_BUS_ENABLED', False)
+    app.config.setdefault('INVALIDATION_POLL_INTERVAL', 0.05)
+    app.config.setdefault('INVALIDATION_RETENTION', 300)
+
+    if not app.config['INVALIDATION_BUS_ENABLED']:
+        return
+    with app.app_context():
+        engine = db.engine
+    path = sqlite_file_path(str(engine.url))
+    if path is None:
+        logger.warning('Invalidation bus needs a file-backed SQLite database; not started')
+        return
+
+    bus = InvalidationBus(
+        engine,
+        path,
+        interval=app.config['INVALIDATION_POLL_INTERVAL'],
+        retention=app.config['INVALIDATION_RETENTION'],
+    )
+    if 'tree_cache' in app.extensions:
+        bus.add_handler('project', app.extensions['tree_cache'].invalidate)
+    if 'user_cache' in app.extensions:
+        bus.add_handler('user', app.extensions['user_cache'].pop)
+    app.extensions['invalidation_bus'] = bus
+    bus.start()
@@ -0,0 +1,145 @@
+"""
+Structured, non-blocking logging.
+
+Server modules log through children of the 'todo' logger. Records are
+handed to a QueueHandler, so a request thread only pays for a queue put;
+a single QueueListener thread formats them as JSON lines and writes them
+to stderr (or LOG_FILE). Every record carries the request's correlation
+id, taken from an incoming X-Request-ID header or generated, and echoed
+back in the response.
+
+LOG_LEVEL defaults to INFO, so debug output is off unless asked for.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+ROOT_LOGGER = 'todo'
+REQUEST_ID_HEADER = 'X-Request-ID'
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_listener = None
+_handler = None
+
+
+def current_request_id():
+    """The correlation id of the current request, or '-' outside one."""
+    if has_request_context():
+        return g.get('request_id', '-')
+    return '-'
+
+
+class JSONFormatter(logging.Formatter):
+    """Render a record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    QueueHandler that stamps the request id and never blocks.
+
+    The record is prepared on the calling thread (message interpolated,
+    traceback rendered) because the request context is gone by the time
+    the listener thread sees it. A full queue drops the record.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = current_request_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def get_logger(name):
+    """Logger for a server module, e.g. get_logger('auth') -> 'todo.auth'."""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def _start_listener(queue_size, log_file):
+    """Attach the queue handler to the 'todo' logger and start the writer thread."""
+    global _listener, _handler
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    output = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter())
+
+    _handler = RequestQueueHandler(log_queue)
+    root = logging.getLogger(ROOT_LOGGER)
+    root.addHandler(_handler)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def init_logging(app):
+    """
+    Configure logging for the process and register request-id hooks on app.
+
+    The queue and listener are process-wide and started once; LOG_LEVEL is
+    applied on every call.
+    """
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_FILE', None)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+
+    if _listener is None:
+        _start_listener(app.config['LOG_QUEUE_SIZE'], app.config['LOG_FILE'])
+    logging.getLogger(ROOT_LOGGER).setLevel(app.config['LOG_LEVEL'])
+
+    access_log = get_logger('access')
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        if access_log.isEnabledFor(logging.DEBUG) and 'request_started' in g:
+            access_log.debug('%s %s %s', request.method, request.path, response.status_code, extra={'fields': {
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.request_started) * 1000, 2),
+            }})
+        return response
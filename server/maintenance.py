@@ -0,0 +1,236 @@
+"""
+Routine SQLite maintenance within a time budget.
+
+Deletes and reparents leave free pages in todo_items and its indexes, and
+the planner's statistics drift as the data changes. run_maintenance()
+does three things to every database file (main and shards), all sharing
+MAINTENANCE_BUDGET seconds:
+
+    optimize      PRAGMA optimize (ANALYZE of tables whose stats are stale),
+                  or a full ANALYZE when asked; analysis_limit keeps it cheap
+    vacuum        PRAGMA incremental_vacuum in MAINTENANCE_VACUUM_PAGES steps,
+                  each its own short write transaction so requests interleave
+    quick_check   PRAGMA quick_check
+
+Steps are interrupted through a progress handler once the budget runs out
+and report 'timeout' rather than failing. New database files are created
+with auto_vacuum=INCREMENTAL (see dbrouting.set_sqlite_pragmas); older
+ones report auto_vacuum 'none' until converted once with
+`flask maintenance --full-vacuum`.
+
+Each run's durations and page counts are stored in maintenance_runs; the
+latest run is shown by /ready. Run it with `flask maintenance`, or set
+MAINTENANCE_INTERVAL to have every worker check on a timer (a worker
+skips the run if any process ran one within the interval).
+"""
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from logconfig import get_logger
+from models import db, MaintenanceRun
+from shards import database_files
+
+logger = get_logger('maintenance')
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def _run_step(conn, sql, deadline):
+    """
+    Run one statement, interrupting it at deadline.
+
+    Returns:
+        (result dict with status and seconds, fetched rows or None)
+    """
+    started = time.monotonic()
+    if started >= deadline:
+        return {'status': 'skipped', 'seconds': 0.0}, None
+    conn.set_progress_handler(lambda: time.monotonic() >= deadline, 1000)
+    try:
+        rows = conn.execute(sql).fetchall()
+        status = 'ok'
+    except sqlite3.OperationalError as exc:
+        if 'interrupted' not in str(exc):
+            raise
+        rows, status = None, 'timeout'
+    finally:
+        conn.set_progress_handler(None, 0)
+    return {'status': status, 'seconds': round(time.monotonic() - started, 3)}, rows
+
+
+def maintain_database(path, deadline, vacuum_pages=1000, analyze=False, full_vacuum=False):
+    """
+    Run the maintenance steps on one database file.
+
+    Args:
+        path: SQLite database file
+        deadline: time.monotonic() value by which to stop
+        vacuum_pages: Free pages released per incremental_vacuum step
+        analyze: Run a full ANALYZE instead of PRAGMA optimize
+        full_vacuum: Run VACUUM instead (rewrites the file, blocking writers;
+            needed once to turn on auto_vacuum for an existing file)
+
+    Returns:
+        Dict of page counts and one {status, seconds} entry per step
+    """
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    try:
+        def pragma(name):
+            return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+        report = {'page_count': pragma('page_count'), 'freelist_before': pragma('freelist_count')}
+
+        conn.execute('PRAGMA analysis_limit=1000')
+        report['optimize'], _ = _run_step(conn, 'ANALYZE' if analyze else 'PRAGMA optimize', deadline)
+
+        if full_vacuum:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            report['vacuum'], _ = _run_step(conn, 'VACUUM', deadline)
+        elif pragma('auto_vacuum') == 2 and time.monotonic() < deadline:
+            started = time.monotonic()
+            status = 'ok'
+            free = pragma('freelist_count')
+            while free:
+                step, _ = _run_step(conn, f'PRAGMA incremental_vacuum({vacuum_pages})', deadline)
+                if step['status'] != 'ok':
+                    status = step['status']
+                    break
+                free, before = pragma('freelist_count'), free
+                if free >= before:
+                    break
+            report['vacuum'] = {'status': status, 'seconds': round(time.monotonic() - started, 3)}
+        else:
+            report['vacuum'] = {'status': 'skipped', 'seconds': 0.0}
+        report['auto_vacuum'] = AUTO_VACUUM_MODES.get(pragma('auto_vacuum'), 'unknown')
+
+        report['quick_check'], rows = _run_step(conn, 'PRAGMA quick_check', deadline)
+        if rows is not None and rows != [('ok',)]:
+            report['quick_check'].update(status='failed', problems=[row[0] for row in rows[:5]])
+
+        report['freelist_after'] = pragma('freelist_count')
+        report['page_count_after'] = pragma('page_count')
+        return report
+    finally:
+        conn.close()
+
+
+def run_maintenance(budget=None, analyze=False, full_vacuum=False):
+    """
+    Maintain every database file of the current app and record the run.
+
+    Args:
+        budget: Seconds for the whole run (defaults to MAINTENANCE_BUDGET)
+        analyze: Full ANALYZE instead of PRAGMA optimize
+        full_vacuum: VACUUM instead of incremental_vacuum
+
+    Returns:
+        The stored MaintenanceRun.to_dict()
+    """
+    app = current_app._get_current_object()
+    started_at = datetime.utcnow()
+    started = time.monotonic()
+    deadline = started + (budget or app.config['MAINTENANCE_BUDGET'])
+
+    databases = {}
+    for name, path in database_files(app):
+        databases[name] = maintain_database(
+            path,
+            deadline,
+            vacuum_pages=app.config['MAINTENANCE_VACUUM_PAGES'],
+            analyze=analyze,
+            full_vacuum=full_vacuum,
+        )
+
+    run = MaintenanceRun(
+        started_at=started_at,
+        seconds=round(time.monotonic() - started, 3),
+        report=json.dumps(databases),
+    )
+    db.session.add(run)
+    db.session.commit()
+    logger.info('Maintenance of %d database(s) took %.3fs', len(databases), run.seconds)
+    return run.to_dict()
+
+
+def last_maintenance():
+    """The latest MaintenanceRun.to_dict(), or None if maintenance never ran."""
+    run = db.session.execute(
+        db.select(MaintenanceRun).order_by(MaintenanceRun.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    return run.to_dict() if run is not None else None
+
+
+class MaintenanceScheduler:
+    """Background thread running maintenance every `interval` seconds."""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='db-maintenance', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_if_due()
+            except Exception:
+                logger.exception('Scheduled maintenance failed')
+
+    def run_if_due(self):
+        """Run maintenance unless some process already did within the interval; returns the run or None."""
+        with self.app.app_context():
+            try:
+                last = db.session.execute(db.select(db.func.max(MaintenanceRun.started_at))).scalar()
+                if last is not None and last > datetime.utcnow() - timedelta(seconds=self.interval):
+                    return None
+                return run_maintenance()
+            finally:
+                db.session.remove()
+
+    def stop(self):
+        """Stop the timer thread; safe to call more than once."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+@click.command('maintenance')
+@click.option('--budget', type=float, default=None,
+              help='Seconds for the whole run (default: MAINTENANCE_BUDGET).')
+@click.option('--analyze', is_flag=True, help='Full ANALYZE instead of PRAGMA optimize.')
+@click.option('--full-vacuum', is_flag=True,
+              help='Rewrite each file with VACUUM (blocks writers; turns on incremental auto_vacuum).')
+@with_appcontext
+def maintenance_command(budget, analyze, full_vacuum):
+    """Optimize, vacuum and check the database(s) within a time budget."""
+    run = run_maintenance(budget, analyze=analyze, full_vacuum=full_vacuum)
+    for name, report in run['databases'].items():
+        steps = ', '.join(f"{step} {report[step]['status']} ({report[step]['seconds']}s)"
+                          for step in ('optimize', 'vacuum', 'quick_check'))
+        click.echo(f"{name}: {steps}; free pages {report['freelist_before']} -> {report['freelist_after']}")
+    click.echo(f"Done in {run['seconds']}s")
+
+
+def init_maintenance(app):
+    """Maintenance defaults, `flask maintenance`, and the optional timer (MAINTENANCE_INTERVAL)."""
+    app.config.setdefault('MAINTENANCE_BUDGET', 30.0)
+    app.config.setdefault('MAINTENANCE_VACUUM_PAGES', 1000)
+    app.config.setdefault('MAINTENANCE_INTERVAL', 0)
+    app.cli.add_command(maintenance_command)
+
+    if app.config['MAINTENANCE_INTERVAL']:
+        scheduler = MaintenanceScheduler(app, app.config['MAINTENANCE_INTERVAL'])
+        app.extensions['maintenance_scheduler'] = scheduler
+        scheduler.start()
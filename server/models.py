@@ -1,8 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from dbrouting import RoutingSession
+from passwords import hash_password, needs_rehash, verify_password
 from datetime import datetime
+import json
+from sqlalchemy.orm import validates
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def project_fields(obj, fields):
+    """
+    Build a dictionary with only the requested column attributes of obj.
+
+    Only the named columns are read, so no relationship is lazy-loaded.
+    """
+    result = {}
+    for name in fields:
+        value = getattr(obj, name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        result[name] = value
+    return result
 
 
 class User(db.Model):
@@ -31,11 +49,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Verify the password against the stored hash."""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check whether the stored hash uses an outdated method or cost."""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert user to dictionary (excluding sensitive data)."""
@@ -57,24 +79,41 @@ class TodoList(db.Model):
         user_id: Foreign key to the owner user
         todos: Relationship to todo items in this list
         created_at: Timestamp of creation
+        change_seq: Sync sequence number of the last write to this row
     """
     __tablename__ = 'todo_lists'
+    __table_args__ = (
+        db.Index('ix_todo_lists_user_change_seq', 'user_id', 'change_seq'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)
 
     # Relationships
     todos = db.relationship('TodoItem', backref='list', lazy=True, cascade='all, delete-orphan')
 
-    def to_dict(self):
-        """Convert list to dictionary."""
+    # Keys of to_dict(), in order; valid values for the fields= query parameter
+    FIELDS = ('id', 'name', 'user_id', 'created_at', 'change_seq')
+
+    def to_dict(self, fields=None):
+        """
+        Convert list to dictionary.
+
+        Args:
+            fields: Optional sequence of keys from FIELDS to include (default: all)
+        """
+        if fields is not None:
+            return project_fields(self, fields)
+
         return {
             'id': self.id,
             'name': self.name,
             'user_id': self.user_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'change_seq': self.change_seq
         }
 
 
@@ -87,6 +126,7 @@ class TodoItem(db.Model):
         title: Title of the todo item
         description: Optional detailed description
         completed: Whether the task is completed
+        completed_at: When the task was last marked completed (None while open)
         collapsed: Whether subtasks are collapsed in UI
         depth: Hierarchical depth (0=top-level, 1=subtask, 2=sub-subtask)
         parent_id: Foreign key to parent todo (null for top-level)
@@ -94,13 +134,23 @@ class TodoItem(db.Model):
         user_id: Foreign key to the owner user
         children: Relationship to child todos
         created_at: Timestamp of creation
+        change_seq: Sync sequence number of the last write to this row
     """
     __tablename__ = 'todo_items'
+    __table_args__ = (
+        # Tree assembly walks siblings in display order
+        db.Index('ix_todo_items_list_parent_order', 'list_id', 'parent_id', 'order_index'),
+        # Filtered views (completed / priority) on a single project
+        db.Index('ix_todo_items_list_completed_priority', 'list_id', 'completed', 'priority'),
+        # Delta sync: "what changed for this user since seq N"
+        db.Index('ix_todo_items_user_change_seq', 'user_id', 'change_seq'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
     completed = db.Column(db.Boolean, default=False, nullable=False)
+    completed_at = db.Column(db.DateTime)
     collapsed = db.Column(db.Boolean, default=False, nullable=False)
     depth = db.Column(db.Integer, default=0, nullable=False)
     priority = db.Column(db.String(10), default='medium', nullable=False)
@@ -112,6 +162,7 @@ class TodoItem(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)
 
     # Self-referential relationship for hierarchy
     children = db.relationship('TodoItem',
@@ -119,13 +170,37 @@ class TodoItem(db.Model):
                                lazy=True,
                                cascade='all, delete-orphan')
 
-    def to_dict(self, include_children=False):
+    # Keys of to_dict() (besides children), in order; valid values for the fields= query parameter
+    FIELDS = ('id', 'title', 'description', 'completed', 'collapsed', 'depth', 'priority',
+              'order_index', 'parent_id', 'list_id', 'user_id', 'created_at', 'change_seq')
+
+    @validates('completed')
+    def stamp_completed_at(self, key, completed):
+        """Start the archive clock when a todo is completed; clear it when reopened."""
+        if not completed:
+            self.completed_at = None
+        elif not self.completed or self.completed_at is None:
+            self.completed_at = datetime.utcnow()
+        return completed
+
+    def to_dict(self, include_children=False, fields=None):
         """
         Convert todo item to dictionary.
 
+        The children relationship is only touched when include_children is set,
+        so projecting a few columns never lazy-loads the subtree.
+
         Args:
             include_children: Whether to recursively include child todos
+            fields: Optional sequence of keys from FIELDS to include (default: all)
         """
+        if fields is not None:
+            result = project_fields(self, fields)
+            if include_children:
+                result['children'] = [child.to_dict(include_children=True, fields=fields)
+                                      for child in self.children]
+            return result
+
         result = {
             'id': self.id,
             'title': self.title,
@@ -138,10 +213,191 @@ class TodoItem(db.Model):
             'parent_id': self.parent_id,
             'list_id': self.list_id,
             'user_id': self.user_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'change_seq': self.change_seq
         }
 
         if include_children:
             result['children'] = [child.to_dict(include_children=True) for child in self.children]
 
-        return result
\ No newline at end of file
+        return result
+
+
+class Tombstone(db.Model):
+    """
+    Record of a deleted project or todo, kept so offline clients can sync deletes.
+
+    Attributes:
+        id: Primary key
+        entity_type: 'project' or 'todo'
+        entity_id: ID of the deleted row
+        user_id: Owner of the deleted row
+        list_id: Project the deleted row belonged to
+        change_seq: Sync sequence number of the delete
+        deleted_at: Timestamp of the delete
+    """
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('ix_tombstones_user_change_seq', 'user_id', 'change_seq'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    list_id = db.Column(db.Integer)
+    change_seq = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert tombstone to dictionary."""
+        return {
+            'type': self.entity_type,
+            'id': self.entity_id,
+            'list_id': self.list_id,
+            'change_seq': self.change_seq
+        }
+
+
+class SyncClient(db.Model):
+    """
+    Sync progress of one client device, used to decide which tombstones are safe to prune.
+
+    Attributes:
+        id: Primary key
+        user_id: Owner of the client
+        client_id: Identifier chosen by the client
+        last_seq: Highest sequence number the client has confirmed it holds
+        last_seen: Timestamp of the client's last sync
+    """
+    __tablename__ = 'sync_clients'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'client_id', name='uq_sync_clients_user_client'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    client_id = db.Column(db.String(64), nullable=False)
+    last_seq = db.Column(db.Integer, default=0, nullable=False)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SyncState(db.Model):
+    """
+    Named integer counters for delta sync.
+
+    Rows:
+        change_seq: Last sequence number handed out to a write
+        tombstones_pruned_through: Highest sequence number whose tombstones were pruned
+    """
+    __tablename__ = 'sync_state'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+class CacheInvalidation(db.Model):
+    """
+    A cached project or user that other worker processes must drop (see invalidation.py).
+
+    Attributes:
+        id: Primary key (AUTOINCREMENT, so ids are not reused after pruning)
+        kind: 'project' or 'user'
+        key: ID of the changed project or user
+        origin: Token of the publishing process, which skips its own rows
+        created_at: Timestamp, used to prune old rows
+    """
+    __tablename__ = 'cache_invalidations'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    key = db.Column(db.Integer, nullable=False)
+    origin = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class MaintenanceRun(db.Model):
+    """
+    Outcome of one database maintenance run (see maintenance.py).
+
+    Attributes:
+        id: Primary key
+        started_at: When the run started
+        seconds: Total duration
+        report: JSON object with one entry per database file
+    """
+    __tablename__ = 'maintenance_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    seconds = db.Column(db.Float, nullable=False)
+    report = db.Column(db.Text, nullable=False)
+
+    def to_dict(self):
+        """Convert run to dictionary."""
+        return {
+            'started_at': self.started_at.isoformat(),
+            'seconds': self.seconds,
+            'databases': json.loads(self.report),
+        }
+
+
+class ArchivedTodoItem(db.Model):
+    """
+    A todo moved out of todo_items by archiving (see archive.py).
+
+    Only whole completed top-level subtrees are archived. The subtree's root
+    row has root_id None; its descendants point at the root's archive row.
+    todo_id and parent_id are the ids the todos had before archiving.
+
+    Attributes:
+        id: Primary key
+        root_id: Archive id of the subtree's root (None on the root itself)
+        todo_id: ID of the todo before it was archived
+        parent_id: todo_id of the parent (None on the root)
+        list_id: Project the subtree belonged to
+        user_id: Owner
+        title, description, priority, depth, order_index: Copied todo fields
+        created_at: When the todo was created
+        completed_at: When the todo was completed
+        archived_at: When the subtree was archived
+    """
+    __tablename__ = 'archived_todo_items'
+    __table_args__ = (
+        # Archive listing: a project's subtree roots, newest first
+        db.Index('ix_archived_todo_items_list_root_archived', 'list_id', 'root_id', 'archived_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    root_id = db.Column(db.Integer, db.ForeignKey('archived_todo_items.id'), index=True)
+    todo_id = db.Column(db.Integer, nullable=False)
+    parent_id = db.Column(db.Integer)
+    list_id = db.Column(db.Integer, db.ForeignKey('todo_lists.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    title = db.Column(db.String(500), nullable=False)
+    description = db.Column(db.Text)
+    priority = db.Column(db.String(10), default='medium', nullable=False)
+    depth = db.Column(db.Integer, default=0, nullable=False)
+    order_index = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        """Convert archived todo to dictionary (without children)."""
+        return {
+            'id': self.id,
+            'todo_id': self.todo_id,
+            'parent_id': self.parent_id,
+            'list_id': self.list_id,
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority,
+            'depth': self.depth,
+            'order_index': self.order_index,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'archived_at': self.archived_at.isoformat(),
+        }
@@ -0,0 +1,168 @@
+"""
+Bounded password hashing.
+
+Hashes are computed on a small thread pool (hashlib releases the GIL while
+it runs scrypt/pbkdf2) instead of directly on request threads, and a
+semaphore caps how many hash jobs may be running or queued at once. When
+the queue is full, callers wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds
+and then get HasherBusy, which the app turns into 503 with Retry-After.
+
+The hash method is configurable (PASSWORD_HASH_METHOD, any method accepted
+by werkzeug.security.generate_password_hash). Stored hashes made with a
+different method or cost are reported by needs_rehash so login can upgrade
+them.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context, jsonify
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+SCRYPT_DEFAULTS = ['32768', '8', '1']
+
+
+class HasherBusy(Exception):
+    """Raised when the hash queue stays full for longer than the timeout."""
+
+
+def canonical_method(method):
+    """
+    Expand a hash method to the full prefix Werkzeug stores in the hash.
+
+    Args:
+        method: e.g. 'scrypt', 'scrypt:16384' or 'pbkdf2:sha256'
+
+    Returns:
+        e.g. 'scrypt:16384:8:1' or 'pbkdf2:sha256:1000000'
+    """
+    parts = method.split(':')
+    if parts[0] == 'scrypt':
+        parts += SCRYPT_DEFAULTS[len(parts) - 1:]
+    elif parts[0] == 'pbkdf2':
+        if len(parts) == 1:
+            parts.append('sha256')
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join(parts)
+
+
+class PasswordHasher:
+    """Thread pool plus semaphore that runs hash and verify jobs."""
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=None, max_queue=None, queue_timeout=5.0):
+        self.method = canonical_method(method)
+        self.workers = workers or os.cpu_count() or 1
+        max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy('Password hashing queue is full')
+        with self._lock:
+            self.queued += 1
+        try:
+            return self._executor.submit(self._job, fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _job(self, fn, *args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def hash(self, password):
+        """Hash password with the configured method."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check password against a stored hash of any supported method."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with a different method or cost."""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        """Queue depth and counters for monitoring."""
+        with self._lock:
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'queue_depth': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False)
+
+
+def get_hasher():
+    """The current app's hasher, or None outside an app context."""
+    if has_app_context():
+        return current_app.extensions.get('password_hasher')
+    return None
+
+
+def hash_password(password):
+    """Hash password on the app's hasher (or inline with the default method)."""
+    hasher = get_hasher()
+    if hasher is None:
+        return generate_password_hash(password, DEFAULT_HASH_METHOD)
+    return hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    """Verify password on the app's hasher (or inline)."""
+    hasher = get_hasher()
+    if hasher is None:
+        return check_password_hash(password_hash, password)
+    return hasher.verify(password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True if password_hash does not use the configured method and cost."""
+    hasher = get_hasher()
+    method = hasher.method if hasher else canonical_method(DEFAULT_HASH_METHOD)
+    return password_hash.split('$', 1)[0] != method
+
+
+def init_password_hashing(app):
+    """Create the app's hasher from config and map HasherBusy to 503."""
+    app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+    app.config.setdefault('PASSWORD_HASH_WORKERS', None)
+    app.config.setdefault('PASSWORD_HASH_MAX_QUEUE', None)
+    app.config.setdefault('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0)
+
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_queue=app.config['PASSWORD_HASH_MAX_QUEUE'],
+        queue_timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT'],
+    )
+
+    @app.errorhandler(HasherBusy)
+    def hasher_busy(error):
+        response = jsonify({'error': 'Server is busy, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
@@ -0,0 +1,193 @@
+"""
+Per-user token-bucket rate limiting and a global in-flight request limit.
+
+Every request to the API blueprints is classified as "read" (GET/HEAD),
+"write" (other methods) or "auth" (non-GET requests to /api/auth) and
+charged one token from the bucket of (caller, class). The caller is the
+user of the bearer token or session, or the client address for anonymous
+requests. Empty buckets get 429 with Retry-After.
+
+Independently, at most MAX_IN_FLIGHT API requests are processed at once;
+extra requests are shed immediately with 503 instead of queueing behind a
+saturated database writer.
+"""
+import math
+import threading
+import time
+
+from flask import g, jsonify, request, session
+
+from auth import bearer_claims
+
+# (tokens per second, burst size) for each route class
+DEFAULT_RATELIMITS = {
+    'read': (50.0, 200),
+    'write': (20.0, 100),
+    'auth': (1.0, 10),
+}
+
+LIMITED_BLUEPRINTS = ('api', 'auth')
+
+
+def concurrency_exempt(view):
+    """Mark a view (e.g. a long-lived stream) as not counting towards MAX_IN_FLIGHT."""
+    view.concurrency_exempt = True
+    return view
+
+
+class TokenBucket:
+    """Token count and last refill time of one (caller, route class) pair."""
+
+    __slots__ = ('tokens', 'updated', 'full_at')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+        self.full_at = updated
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by (identity, route class).
+
+    Buckets are guarded by a fixed array of striped locks rather than one
+    global lock, so unrelated callers rarely contend. Idle buckets (which
+    would be full anyway) are pruned periodically to bound memory.
+    """
+
+    def __init__(self, stripes=64, prune_every=10000):
+        self._buckets = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._prune_every = prune_every
+        self._calls = 0
+        self.rejected = 0
+
+    def acquire(self, key, rate, burst):
+        """
+        Take one token for key.
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        now = time.monotonic()
+        with self._locks[hash(key) % len(self._locks)]:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(burst, now)
+            else:
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (1 - bucket.tokens) / rate
+            bucket.full_at = now + (burst - bucket.tokens) / rate
+
+        self._calls += 1
+        if self._calls % self._prune_every == 0:
+            self.prune(now)
+        if not allowed:
+            self.rejected += 1
+        return allowed, retry_after
+
+    def prune(self, now=None):
+        """Drop buckets idle long enough to have refilled completely."""
+        now = time.monotonic() if now is None else now
+        for key, bucket in list(self._buckets.items()):
+            if now >= bucket.full_at:
+                self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """Counter of requests currently being processed, with a hard ceiling."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.shed = 0
+
+    def try_enter(self, limit):
+        """Count a request in; False (and nothing counted) if limit is reached."""
+        with self._lock:
+            if self.in_flight >= limit:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            return True
+
+    def leave(self):
+        """Count a request out."""
+        with self._lock:
+            self.in_flight -= 1
+
+
+def route_class():
+    """Classify the current request as read, write or auth."""
+    if request.method in ('GET', 'HEAD'):
+        return 'read'
+    if request.blueprint == 'auth':
+        return 'auth'
+    return 'write'
+
+
+def request_identity():
+    """Rate-limit key for the caller: the logged-in user, else the client address."""
+    claims = bearer_claims()
+    if claims:
+        return f'user:{claims["uid"]}'
+    user_id = session.get('user_id')
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f'ip:{request.remote_addr}'
+
+
+def too_busy(status, message, retry_after):
+    """JSON error response with a Retry-After header (whole seconds, at least 1)."""
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_rate_limiting(app):
+    """Register the rate-limit and load-shedding hooks and their default settings."""
+    app.config.setdefault('RATELIMIT_ENABLED', True)
+    app.config.setdefault('RATELIMITS', DEFAULT_RATELIMITS)
+    app.config.setdefault('MAX_IN_FLIGHT', 64)
+
+    limiter = RateLimiter()
+    concurrency = ConcurrencyLimiter()
+    app.extensions['rate_limiter'] = limiter
+    app.extensions['concurrency_limiter'] = concurrency
+
+    @app.before_request
+    def limit_request():
+        if not app.config['RATELIMIT_ENABLED'] or request.method == 'OPTIONS':
+            return None
+        if request.blueprint not in LIMITED_BLUEPRINTS:
+            return None
+
+        view = app.view_functions.get(request.endpoint)
+        if not getattr(view, 'concurrency_exempt', False):
+            if not concurrency.try_enter(app.config['MAX_IN_FLIGHT']):
+                return too_busy(503, 'Server is busy, please retry shortly', 1)
+            g.counted_in_flight = True
+
+        limit_class = route_class()
+        rate, burst = app.config['RATELIMITS'][limit_class]
+        allowed, retry_after = limiter.acquire((request_identity(), limit_class), rate, burst)
+        if not allowed:
+            return too_busy(429, 'Too many requests', retry_after)
+        return None
+
+    @app.teardown_request
+    def release_in_flight(exc):
+        if g.pop('counted_in_flight', False):
+            concurrency.leave()
@@ -0,0 +1,105 @@
+"""
+Readiness report for load balancers (GET /ready).
+
+/health only says the process is up. /ready times a trivial query on each
+database engine (including the wait for a pooled connection, which is
+where an overloaded node first shows) and reports it next to the
+numbers that explain it: pool checkouts, WAL file sizes, cache hit
+rates, in-flight requests, the depth of the background queues and the
+latest maintenance run (see maintenance.py). The
+response is 503 when a query fails or takes longer than
+READY_MAX_DB_LATENCY_MS, so a load balancer can take the node out of
+rotation until it recovers.
+"""
+import os
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+from maintenance import last_maintenance
+from models import db
+from shards import database_files
+
+# app.extensions entries with a stats() method, reported under "queues"
+QUEUE_EXTENSIONS = ('write_pipeline', 'ui_state_buffer', 'password_hasher', 'invalidation_bus')
+CACHE_EXTENSIONS = ('tree_cache', 'user_cache')
+
+
+def time_query(engine):
+    """
+    Milliseconds to check out a connection and run SELECT 1.
+
+    Returns:
+        (latency_ms, error message or None)
+    """
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1')).scalar()
+    except Exception as exc:
+        return round((time.perf_counter() - started) * 1000, 3), str(exc)
+    return round((time.perf_counter() - started) * 1000, 3), None
+
+
+def wal_sizes(app):
+    """Size in bytes of each database file's -wal file (0 when there is none)."""
+    sizes = {}
+    for name, path in database_files(app):
+        wal = f'{path}-wal'
+        sizes[name] = os.path.getsize(wal) if os.path.exists(wal) else 0
+    return sizes
+
+
+def readiness():
+    """
+    Build the readiness report for the current app.
+
+    Returns:
+        (report dict, HTTP status): 200 when every engine answered within
+        READY_MAX_DB_LATENCY_MS, else 503
+    """
+    app = current_app._get_current_object()
+    threshold = app.config['READY_MAX_DB_LATENCY_MS']
+
+    engines = {'writer': db.engine}
+    if 'read_engine' in app.extensions:
+        engines['reader'] = app.extensions['read_engine']
+
+    database = {}
+    ready = True
+    for name, engine in engines.items():
+        latency, error = time_query(engine)
+        database[name] = {'latency_ms': latency}
+        if error is not None:
+            database[name]['error'] = error
+        if error is not None or latency > threshold:
+            ready = False
+
+    try:
+        maintenance = last_maintenance()
+    except Exception:
+        # The latency checks above already report a broken database
+        db.session.rollback()
+        maintenance = None
+
+    concurrency = app.extensions.get('concurrency_limiter')
+    report = {
+        'status': 'ready' if ready else 'degraded',
+        'max_db_latency_ms': threshold,
+        'database': database,
+        'pools': {name: metrics.stats() for name, metrics in app.extensions.get('db_pools', {}).items()},
+        'wal_bytes': wal_sizes(app),
+        'caches': {name: app.extensions[name].stats() for name in CACHE_EXTENSIONS if name in app.extensions},
+        'queues': {name: app.extensions[name].stats() for name in QUEUE_EXTENSIONS if name in app.extensions},
+        'in_flight': None if concurrency is None else {
+            'current': concurrency.in_flight,
+            'peak': concurrency.peak,
+            'shed': concurrency.shed,
+            'limit': app.config['MAX_IN_FLIGHT'],
+        },
+        'maintenance': maintenance,
+    }
+    if 'shard_router' in app.extensions:
+        report['shard_engines'] = app.extensions['shard_router'].stats()
+    return report, 200 if ready else 503
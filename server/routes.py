@@ -1,24 +1,210 @@
-from flask import Blueprint, request, jsonify, session
-from models import db, TodoList, TodoItem, User
+import json
+import queue
+from datetime import datetime
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
+from sqlalchemy import case, delete, func, insert, inspect, select
+from cache import CachedPayload
+from models import db, TodoList, TodoItem, ArchivedTodoItem, Tombstone, User
 from auth import login_required
+from archive import archive_completed, load_archive_page, restore_archived
+from authz import AccessError, get_existing, get_owned
+from events import event_broker
+from importers import PARSERS
+from ratelimit import concurrency_exempt
+from writepipeline import run_write
+from serializers import (PROJECT_FIELDS, TODO_FIELDS, build_todo_tree, columnar_todos, completed_subtree_ids,
+                         load_project_rows, load_todo_rows, msgpack, row_serializer)
+from sync import CHANGE_SEQ, PRUNED_THROUGH, get_sync_value, next_change_seq, record_client_progress
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+VALID_PRIORITIES = ('low', 'medium', 'high')
+
+# Response formats for GET /api/todos/<project_id>, by ?format= name and media type
+TODO_FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.todo.columnar+json',
+    'msgpack': 'application/x-msgpack',
+}
+
+# Sort keys accepted by GET /api/todos/<project_id>; ties fall back to creation order
+TODO_SORT_COLUMNS = {
+    'created_at': (TodoItem.created_at, TodoItem.id),
+    'order_index': (TodoItem.order_index, TodoItem.created_at, TodoItem.id),
+    'priority': (
+        case({'high': 0, 'medium': 1, 'low': 2}, value=TodoItem.priority, else_=1),
+        TodoItem.order_index,
+        TodoItem.created_at,
+        TodoItem.id,
+    ),
+}
+
+
+@api_bp.errorhandler(AccessError)
+def access_error(error):
+    """Render a failed ownership check as a JSON 404/403."""
+    return jsonify({'error': error.message}), error.status
+
+
+def parse_bool_arg(name):
+    """
+    Read an optional boolean query parameter.
+
+    Returns:
+        True, False, or None when the parameter is absent
+
+    Raises:
+        ValueError: If the value is not a recognised boolean
+    """
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'{name} must be true or false')
+
+
+def publish_move(source_project_id, target_project_id, todo_data):
+    """Notify the old and the new project that a subtree moved."""
+    payload = {
+        'from_project_id': source_project_id,
+        'to_project_id': target_project_id,
+        'todo': todo_data,
+    }
+    event_broker.publish(source_project_id, 'moved', payload)
+    if target_project_id != source_project_id:
+        event_broker.publish(target_project_id, 'moved', payload)
+
+
+def negotiate_todo_format():
+    """
+    Pick the response format for the todo tree.
+
+    An explicit ?format= wins; otherwise the Accept header is matched, with
+    plain JSON preferred for */* and on ties.
+
+    Returns:
+        A key of TODO_FORMATS, or None if nothing acceptable can be produced
+    """
+    requested = request.args.get('format')
+    if requested:
+        return requested if requested in TODO_FORMATS else None
+
+    if not request.accept_mimetypes:
+        return 'json'
+    best = request.accept_mimetypes.best_match(list(TODO_FORMATS.values()))
+    for name, mimetype in TODO_FORMATS.items():
+        if mimetype == best:
+            return name
+    return None
+
+
+def parse_fields(allowed):
+    """
+    Read the optional comma-separated fields= query parameter.
+
+    Args:
+        allowed: Valid field names (a model's FIELDS)
+
+    Returns:
+        Tuple of field names (always including id), or None for all fields
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(dict.fromkeys(fields))
+
+
+def include_children(default):
+    """Whether include= asks for nested children (default when include= is absent)."""
+    if 'include' not in request.args:
+        return default
+    return 'children' in [name.strip() for name in request.args['include'].split(',')]
+
+
+def wants_minimal():
+    """Whether the client asked for return=minimal (query parameter or Prefer header)."""
+    if request.args.get('return') == 'minimal':
+        return True
+    preferences = request.headers.get('Prefer', '').replace(';', ',').split(',')
+    return 'return=minimal' in [preference.strip() for preference in preferences]
+
+
+def column_values(obj):
+    """Snapshot of obj's column values, to diff against with changed_columns()."""
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+def changed_columns(obj, before):
+    """
+    Names of the columns whose value differs from a column_values() snapshot.
+
+    Compares values rather than attribute history, because autoflushes
+    during the handler (e.g. lazy-loading children) reset the history.
+    """
+    return [key for key, value in before.items() if getattr(obj, key) != value]
+
+
+def minimal_fields(changed):
+    """Fields for a return=minimal body: the id, the changed columns and the sync sequence."""
+    return tuple(dict.fromkeys(('id', *changed, 'change_seq')))
+
+
+def mutation_response(body, status):
+    """jsonify a mutation result, acknowledging a return=minimal preference."""
+    response = jsonify(body)
+    if wants_minimal():
+        response.headers['Preference-Applied'] = 'return=minimal'
+    return response, status
+
+
+def todo_result(todo, fields, children, changed):
+    """Serialize a mutated todo according to return=, fields= and include=."""
+    if wants_minimal():
+        return todo.to_dict(fields=minimal_fields(changed))
+    return todo.to_dict(include_children=children, fields=fields)
+
+
 @api_bp.route('/projects', methods=['GET'])
 @login_required
 def get_projects():
     """
     Get all projects for the current user.
 
+    Query parameters:
+        fields: Optional comma-separated subset of project fields
+
     Returns:
         200: List of user's projects
+        400: Unknown field requested
         401: Not authenticated
     """
-    user_id = session.get('user_id')
-    projects = TodoList.query.filter_by(user_id=user_id).order_by(TodoList.created_at).all()
+    user_id = g.user_id
+
+    try:
+        fields = parse_fields(TodoList.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = load_project_rows(TodoList.user_id == user_id, order_by=(TodoList.created_at,))
+    serialize = row_serializer(PROJECT_FIELDS, fields)
 
     return jsonify({
-        'projects': [project.to_dict() for project in projects]
+        'projects': [serialize(row) for row in rows]
     }), 200
 
 
@@ -28,26 +214,28 @@ def get_project(project_id):
     """
     Get a specific project by ID.
 
+    Query parameters:
+        fields: Optional comma-separated subset of project fields
+
     Args:
         project_id: ID of the project to retrieve
 
     Returns:
         200: Project details
+        400: Unknown field requested
         401: Not authenticated
         403: User doesn't own this project
         404: Project not found
     """
-    user_id = session.get('user_id')
-    project = TodoList.query.get(project_id)
-
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
+    try:
+        fields = parse_fields(TodoList.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if project.user_id != user_id:
-        return jsonify({'error': 'Access denied'}), 403
+    project = get_owned(TodoList, project_id)
 
     return jsonify({
-        'project': project.to_dict()
+        'project': project.to_dict(fields=fields)
     }), 200
 
 
@@ -62,14 +250,23 @@ def create_project():
             "name": "string"
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of project fields to return
+        return=minimal (or "Prefer: return=minimal"): return only server-assigned fields
+
     Returns:
         201: Project created successfully
         400: Validation error
         401: Not authenticated
     """
-    user_id = session.get('user_id')
+    user_id = g.user_id
     data = request.get_json()
 
+    try:
+        fields = parse_fields(TodoList.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if not data or not data.get('name'):
         return jsonify({'error': 'Project name is required'}), 400
 
@@ -81,22 +278,24 @@ def create_project():
     if len(name) > 200:
         return jsonify({'error': 'Project name must be 200 characters or less'}), 400
 
+    def insert_project(session):
+        project = TodoList(name=name, user_id=user_id)
+        session.add(project)
+        session.flush()
+        return project.id
+
     try:
-        new_project = TodoList(
-            name=name,
-            user_id=user_id
-        )
+        new_project = db.session.get(TodoList, run_write(insert_project))
 
-        db.session.add(new_project)
-        db.session.commit()
+        if wants_minimal():
+            fields = minimal_fields(('created_at',))
 
-        return jsonify({
+        return mutation_response({
             'message': 'Project created successfully',
-            'project': new_project.to_dict()
-        }), 201
+            'project': new_project.to_dict(fields=fields)
+        }, 201)
 
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to create project: {str(e)}'}), 500
 
 
@@ -111,6 +310,10 @@ def update_project(project_id):
             "name": "string"
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of project fields to return
+        return=minimal (or "Prefer: return=minimal"): return only the changed fields
+
     Args:
         project_id: ID of the project to update
 
@@ -121,9 +324,13 @@ def update_project(project_id):
         403: Not authorized to update this project
         404: Project not found
     """
-    user_id = session.get('user_id')
     data = request.get_json()
 
+    try:
+        fields = parse_fields(TodoList.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     if not data or not data.get('name'):
         return jsonify({'error': 'Project name is required'}), 400
 
@@ -135,25 +342,29 @@ def update_project(project_id):
     if len(name) > 200:
         return jsonify({'error': 'Project name must be 200 characters or less'}), 400
 
-    project = TodoList.query.get(project_id)
+    project = get_owned(TodoList, project_id)
 
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
-
-    if project.user_id != user_id:
-        return jsonify({'error': 'Not authorized to update this project'}), 403
+    def rename_project(session):
+        target = get_existing(session, TodoList, project_id)
+        before = column_values(target)
+        target.name = name
+        return changed_columns(target, before)
 
     try:
-        project.name = name
-        db.session.commit()
+        changed = run_write(rename_project)
 
-        return jsonify({
+        if wants_minimal():
+            fields = minimal_fields(changed)
+
+        return mutation_response({
             'message': 'Project updated successfully',
-            'project': project.to_dict()
-        }), 200
+            'project': project.to_dict(fields=fields)
+        }, 200)
 
+    except AccessError:
+        # Deleted by another request after the ownership check
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to update project: {str(e)}'}), 500
 
 
@@ -172,28 +383,195 @@ def delete_project(project_id):
         403: Not authorized to delete this project
         404: Project not found
     """
-    user_id = session.get('user_id')
-    project = TodoList.query.get(project_id)
-
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
+    get_owned(TodoList, project_id)
 
-    if project.user_id != user_id:
-        return jsonify({'error': 'Not authorized to delete this project'}), 403
+    def remove_project(session):
+        session.execute(delete(ArchivedTodoItem).where(ArchivedTodoItem.list_id == project_id))
+        session.delete(get_existing(session, TodoList, project_id))
 
     try:
-        db.session.delete(project)
-        db.session.commit()
+        run_write(remove_project)
+
+        event_broker.publish(project_id, 'project_deleted', {'id': project_id})
 
         return jsonify({
             'message': 'Project deleted successfully'
         }), 200
 
+    except AccessError:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to delete project: {str(e)}'}), 500
 
 
+@api_bp.route('/projects/<int:project_id>/events', methods=['GET'])
+@concurrency_exempt
+@login_required
+def project_events(project_id):
+    """
+    Stream changes to a project's todos as Server-Sent Events.
+
+    Event types: created, updated, deleted, moved, imported, ui_state, archived,
+    project_deleted.
+    Each event's data is a JSON payload (todo dictionaries for created,
+    updated and moved). A comment line is sent as a heartbeat when the
+    project is idle. If the client falls too far behind, a "resync" event is
+    sent and the stream closes; the client should refetch the tree.
+
+    Args:
+        project_id: ID of the project to watch
+
+    Returns:
+        200: text/event-stream
+        401: Not authenticated
+        403: Not authorized to access this project
+        404: Project not found
+    """
+    get_owned(TodoList, project_id)
+
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    # Subscribe before returning so nothing committed after this request is missed
+    subscription = event_broker.subscribe(project_id, current_app.config.get('SSE_QUEUE_SIZE', 256))
+
+    def stream():
+        try:
+            yield f'retry: {int(heartbeat * 1000)}\n\n'
+            while True:
+                if subscription.overflowed:
+                    yield 'event: resync\ndata: {}\n\n'
+                    return
+                try:
+                    event_id, event_type, payload = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+                if event_type == 'project_deleted':
+                    return
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # A generator that never started never runs its finally block
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription))
+    return response
+
+
+# ============================================================================
+# ARCHIVE ROUTES
+# ============================================================================
+
+@api_bp.route('/projects/<int:project_id>/archive', methods=['GET'])
+@login_required
+def get_archive(project_id):
+    """
+    List a project's archived subtrees, most recently archived first.
+
+    Query parameters:
+        page: Page number, starting at 1 (default 1)
+        per_page: Subtrees per page, 1-100 (default 20)
+
+    Args:
+        project_id: ID of the project
+
+    Returns:
+        200: {"archived": [root with nested "children"], "page", "per_page", "total"}
+        400: Invalid page or per_page
+        401: Not authenticated
+        403: Not authorized to access this project
+        404: Project not found
+    """
+    get_owned(TodoList, project_id)
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    if page < 1 or not 1 <= per_page <= 100:
+        return jsonify({'error': 'page must be at least 1 and per_page between 1 and 100'}), 400
+
+    archived, total = load_archive_page(project_id, page, per_page)
+
+    return jsonify({
+        'archived': archived,
+        'page': page,
+        'per_page': per_page,
+        'total': total
+    }), 200
+
+
+@api_bp.route('/projects/<int:project_id>/archive', methods=['POST'])
+@login_required
+def archive_project_todos(project_id):
+    """
+    Archive the project's completed top-level subtrees.
+
+    Expected JSON body (optional):
+        {
+            "older_than_days": integer (default ARCHIVE_AFTER_DAYS; 0 archives every completed subtree)
+        }
+
+    Args:
+        project_id: ID of the project
+
+    Returns:
+        200: {"archived": number of subtrees moved}
+        400: Invalid older_than_days
+        401: Not authenticated
+        403: Not authorized to access this project
+        404: Project not found
+    """
+    get_owned(TodoList, project_id)
+
+    data = request.get_json(silent=True) or {}
+    days = data.get('older_than_days')
+    if days is not None and (not isinstance(days, int) or isinstance(days, bool) or days < 0):
+        return jsonify({'error': 'older_than_days must be a non-negative integer'}), 400
+
+    try:
+        archived = archive_completed(days, list_id=project_id)
+    except Exception as e:
+        return jsonify({'error': f'Failed to archive todos: {str(e)}'}), 500
+
+    return jsonify({'archived': archived}), 200
+
+
+@api_bp.route('/projects/<int:project_id>/archive/<int:archive_id>/restore', methods=['POST'])
+@login_required
+def restore_archived_todo(project_id, archive_id):
+    """
+    Move an archived subtree back to the end of its project (under new ids).
+
+    Args:
+        project_id: ID of the project
+        archive_id: Archive id of the subtree's root (the "id" in GET .../archive)
+
+    Returns:
+        201: {"todo": restored root with nested "children"}
+        401: Not authenticated
+        403: Not authorized to access this archived todo
+        404: Archived todo not found (or not a subtree root of this project)
+    """
+    item = get_owned(ArchivedTodoItem, archive_id)
+    if item.list_id != project_id or item.root_id is not None:
+        return jsonify({'error': 'Archived todo not found'}), 404
+
+    try:
+        todo = run_write(lambda session: restore_archived(session, archive_id))
+    except AccessError:
+        raise
+    except Exception as e:
+        return jsonify({'error': f'Failed to restore todo: {str(e)}'}), 500
+
+    event_broker.publish(project_id, 'created', todo)
+
+    return jsonify({
+        'message': 'Todo restored successfully',
+        'todo': todo
+    }), 201
+
+
 # ============================================================================
 # TODO ROUTES
 # ============================================================================
@@ -204,33 +582,114 @@ def get_todos(project_id):
     """
     Get all todos for a specific project (Returns hierarchical structure).
 
+    Query parameters (all optional):
+        completed: true/false - only todos with this completion state
+        priority: low|medium|high (comma-separated for several)
+        sort: created_at (default) | order_index | priority
+        hide_completed_subtrees: true - drop completed todos and their subtasks
+        fields: comma-separated subset of todo fields to return
+        include: "children" for the nested tree (default); empty for a flat sorted list
+        format: json (default) | columnar | msgpack - overrides the Accept header
+
+    Content negotiation (Accept header or format=):
+        application/json: nested tree (default)
+        application/vnd.todo.columnar+json: parallel column arrays with parent
+            indices, list_id/user_id sent once (see serializers.columnar_todos)
+        application/x-msgpack: the nested tree as MessagePack (needs the msgpack package)
+
+    When a filter excludes a todo's parent, the todo is returned at the top
+    level of the response (its depth field is unchanged).
+
     Args:
         project_id: ID of the project to get todos from
 
     Returns:
         200: Hierarchical list of todos (only top-level, with nested children)
+        400: Invalid filter or sort parameter
         401: Not authenticated
         403: Not authorized to access this project
         404: Project not found
+        406: Requested format not available
     """
-    user_id = session.get('user_id')
+    get_owned(TodoList, project_id)
 
-    project = TodoList.query.get(project_id)
+    try:
+        completed = parse_bool_arg('completed')
+        hide_completed_subtrees = parse_bool_arg('hide_completed_subtrees') or False
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
+    priorities = None
+    if request.args.get('priority'):
+        priorities = [p.strip().lower() for p in request.args['priority'].split(',') if p.strip()]
+        if not priorities or any(p not in VALID_PRIORITIES for p in priorities):
+            return jsonify({'error': 'priority must be one of low, medium, high'}), 400
 
-    if project.user_id != user_id:
-        return jsonify({'error': 'Not authorized to access this project'}), 403
+    sort = request.args.get('sort', 'created_at')
+    if sort not in TODO_SORT_COLUMNS:
+        return jsonify({'error': 'sort must be one of created_at, order_index, priority'}), 400
 
-    todos = TodoItem.query.filter_by(
-        list_id=project_id,
-        parent_id=None
-    ).order_by(TodoItem.created_at).all()
+    try:
+        fields = parse_fields(TodoItem.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response_format = negotiate_todo_format()
+    if response_format is None or (response_format == 'msgpack' and msgpack is None):
+        return jsonify({'error': f"Supported formats: {', '.join(TODO_FORMATS.values())}"}), 406
+
+    # Rendered trees are cached per project and query variant until a todo changes
+    tree_cache = current_app.extensions.get('tree_cache')
+    if tree_cache is not None:
+        variant = (response_format, tuple(sorted(request.args.items(multi=True))))
+        generation = tree_cache.generation(project_id)
+        entry = tree_cache.get(project_id, variant)
+        if entry is not None:
+            response = Response(entry.body, mimetype=entry.mimetype)
+            response.vary.add('Accept')
+            response.cache_entry = entry
+            return response, 200
+
+    # Load the whole (filtered) project in one query as plain row tuples and build
+    # the tree in memory, instead of lazy-loading ORM children node by node.
+    criteria = [TodoItem.list_id == project_id]
+    if completed is not None:
+        criteria.append(TodoItem.completed == completed)
+    if priorities is not None:
+        criteria.append(TodoItem.priority.in_(priorities))
+    rows = load_todo_rows(*criteria, order_by=TODO_SORT_COLUMNS[sort])
+
+    hidden_ids = frozenset()
+    if hide_completed_subtrees:
+        if len(criteria) == 1:
+            hidden_ids = completed_subtree_ids(rows)
+        else:
+            # Ancestors may have been filtered out; their completion still hides the subtree
+            hidden_ids = completed_subtree_ids(load_todo_rows(TodoItem.list_id == project_id))
+
+    if response_format == 'columnar':
+        response = jsonify(columnar_todos(rows, hidden_ids, fields))
+        response.mimetype = TODO_FORMATS['columnar']
+    else:
+        if not include_children(True):
+            serialize = row_serializer(TODO_FIELDS, fields)
+            body = {'todos': [serialize(row) for row in rows if row[0] not in hidden_ids]}
+        else:
+            body = {'todos': build_todo_tree(rows, hidden_ids, fields)}
 
-    return jsonify({
-        'todos': [todo.to_dict(include_children=True) for todo in todos]
-    }), 200
+        if response_format == 'msgpack':
+            response = Response(msgpack.packb(body), mimetype=TODO_FORMATS['msgpack'])
+        else:
+            response = jsonify(body)
+
+    response.vary.add('Accept')
+
+    if tree_cache is not None:
+        entry = CachedPayload(response.get_data(), response.mimetype)
+        tree_cache.put(project_id, variant, generation, entry)
+        response.cache_entry = entry
+
+    return response, 200
 
 
 @api_bp.route('/todos', methods=['POST'])
@@ -247,6 +706,11 @@ def create_todo():
             "parent_id": integer (optional, for subtasks)
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of todo fields to return
+        include: "children" to nest subtasks in the response (default), empty for none
+        return=minimal (or "Prefer: return=minimal"): return only the changed fields
+
     Returns:
         201: Todo created successfully
         400: Validation error (including depth limit)
@@ -254,12 +718,18 @@ def create_todo():
         403: Not authorized to add to this project
         404: Project or parent todo not found
     """
-    user_id = session.get('user_id')
+    user_id = g.user_id
     data = request.get_json()
 
     if not data or not data.get('project_id') or not data.get('title'):
         return jsonify({'error': 'project_id and title are required'}), 400
 
+    try:
+        fields = parse_fields(TodoItem.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    children = include_children(True)
+
     project_id = data['project_id']
     title = data['title'].strip()
     description = data.get('description', '').strip()
@@ -272,25 +742,12 @@ def create_todo():
     if len(title) > 500:
         return jsonify({'error': 'Title must be 500 characters or less'}), 400
 
-    project = TodoList.query.get(project_id)
-
-    if not project:
-        return jsonify({'error': 'Project not found'}), 404
-
-    if project.user_id != user_id:
-        return jsonify({'error': 'Not authorized to add to this project'}), 403
+    get_owned(TodoList, project_id)
 
     # Calculate depth based on parent
     depth = 0
     if parent_id:
-        parent_todo = TodoItem.query.get(parent_id)
-
-        if not parent_todo:
-            return jsonify({'error': 'Parent todo not found'}), 404
-
-        # Verify parent belongs to user and same project
-        if parent_todo.user_id != user_id:
-            return jsonify({'error': 'Not authorized to add subtask to this todo'}), 403
+        parent_todo = get_owned(TodoItem, parent_id, 'Parent todo')
 
         if parent_todo.list_id != project_id:
             return jsonify({'error': 'Parent todo must be in the same project'}), 400
@@ -304,8 +761,8 @@ def create_todo():
     if priority not in ['low', 'medium', 'high']:
         priority = 'medium'
 
-    try:
-        new_todo = TodoItem(
+    def insert_todo(session):
+        todo = TodoItem(
             title=title,
             description=description,
             priority=priority,
@@ -316,17 +773,26 @@ def create_todo():
             completed=False,
             collapsed=False
         )
+        session.add(todo)
+        session.flush()
+        return todo.id
 
-        db.session.add(new_todo)
-        db.session.commit()
+    try:
+        new_todo = db.session.get(TodoItem, run_write(insert_todo))
 
-        return jsonify({
+        # A new todo has no subtasks; avoid a lazy-load just to learn that
+        event_broker.publish(project_id, 'created', {**new_todo.to_dict(), 'children': []})
+
+        todo_data = todo_result(new_todo, fields, False, ('depth', 'order_index', 'created_at'))
+        if children and not wants_minimal():
+            todo_data['children'] = []  # Include children for hierarchical display
+
+        return mutation_response({
             'message': 'Todo created successfully',
-            'todo': new_todo.to_dict(include_children=True)  # Include children for hierarchical display
-        }), 201
+            'todo': todo_data
+        }, 201)
 
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to create todo: {str(e)}'}), 500
 
 
@@ -343,6 +809,11 @@ def update_todo(todo_id):
             "completed": boolean (optional)
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of todo fields to return
+        include: "children" to nest subtasks in the response (default), empty for none
+        return=minimal (or "Prefer: return=minimal"): return only the changed fields
+
     Args:
         todo_id: ID of the todo to update
 
@@ -353,28 +824,34 @@ def update_todo(todo_id):
         403: Not authorized to update this todo
         404: Todo not found
     """
-    user_id = session.get('user_id')
     data = request.get_json()
 
     if not data:
         return jsonify({'error': 'No data provided'}), 400
 
-    todo = TodoItem.query.get(todo_id)
-
-    if not todo:
-        return jsonify({'error': 'Todo not found'}), 404
-
-    if todo.user_id != user_id:
-        return jsonify({'error': 'Not authorized to update this todo'}), 403
-
     try:
+        fields = parse_fields(TodoItem.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    children = include_children(True)
+
+    get_owned(TodoItem, todo_id)
+
+    if 'title' in data:
+        title = data['title'].strip()
+        if len(title) < 1:
+            return jsonify({'error': 'Title cannot be empty'}), 400
+        if len(title) > 500:
+            return jsonify({'error': 'Title must be 500 characters or less'}), 400
+
+    def apply_update(session):
+        """Apply the changes; returns (changed columns, whether completion cascaded)."""
+        todo = get_existing(session, TodoItem, todo_id)
+        cascaded = False
+        before = column_values(todo)
+
         if 'title' in data:
-            title = data['title'].strip()
-            if len(title) < 1:
-                return jsonify({'error': 'Title cannot be empty'}), 400
-            if len(title) > 500:
-                return jsonify({'error': 'Title must be 500 characters or less'}), 400
-            todo.title = title
+            todo.title = data['title'].strip()
 
         if 'description' in data:
             todo.description = data['description'].strip()
@@ -384,7 +861,9 @@ def update_todo(todo_id):
             todo.completed = new_completed_state
 
             # If marking as complete, mark all children as complete too (cascade)
-            if new_completed_state:
+            if new_completed_state and todo.children:
+                cascaded = True
+
                 def mark_children_complete(parent_todo):
                     for child in parent_todo.children:
                         child.completed = True
@@ -394,24 +873,69 @@ def update_todo(todo_id):
 
         if 'collapsed' in data:
             todo.collapsed = bool(data['collapsed'])
+            # Or a buffered PATCH .../ui-state would put its older value back
+            current_app.extensions['ui_state_buffer'].discard(todo_id)
 
         if 'priority' in data:
             priority = data['priority']
             if priority in ['low', 'medium', 'high']:
                 todo.priority = priority
 
-        db.session.commit()
+        return changed_columns(todo, before), cascaded
 
-        return jsonify({
+    try:
+        changed, cascaded = run_write(apply_update)
+        todo = db.session.get(TodoItem, todo_id)
+
+        # Subtasks only changed if completion cascaded down to them
+        event_broker.publish(todo.list_id, 'updated', todo.to_dict(include_children=cascaded))
+
+        return mutation_response({
             'message': 'Todo updated successfully',
-            'todo': todo.to_dict(include_children=True)
-        }), 200
+            'todo': todo_result(todo, fields, children, changed)
+        }, 200)
 
+    except AccessError:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to update todo: {str(e)}'}), 500
 
 
+@api_bp.route('/todos/<int:todo_id>/ui-state', methods=['PATCH'])
+@login_required
+def update_ui_state(todo_id):
+    """
+    Record a todo's expanded/collapsed state without a synchronous write.
+
+    The value is buffered and written in a batch shortly afterwards (see
+    uistate.py); repeated toggles before then are coalesced.
+
+    Expected JSON body:
+        {
+            "collapsed": boolean
+        }
+
+    Args:
+        todo_id: ID of the todo
+
+    Returns:
+        202: State accepted
+        400: Validation error
+        401: Not authenticated
+        403: Not authorized to access this todo
+        404: Todo not found
+    """
+    data = request.get_json(silent=True)
+
+    if not data or not isinstance(data.get('collapsed'), bool):
+        return jsonify({'error': 'collapsed (boolean) is required'}), 400
+
+    get_owned(TodoItem, todo_id)
+    current_app.extensions['ui_state_buffer'].record(todo_id, data['collapsed'])
+
+    return jsonify({'id': todo_id, 'collapsed': data['collapsed']}), 202
+
+
 @api_bp.route('/todos/<int:todo_id>', methods=['DELETE'])
 @login_required
 def delete_todo(todo_id):
@@ -427,26 +951,25 @@ def delete_todo(todo_id):
         403: Not authorized to delete this todo
         404: Todo not found
     """
-    user_id = session.get('user_id')
+    todo = get_owned(TodoItem, todo_id)
 
-    todo = TodoItem.query.get(todo_id)
+    deleted = {'id': todo.id, 'list_id': todo.list_id, 'parent_id': todo.parent_id}
 
-    if not todo:
-        return jsonify({'error': 'Todo not found'}), 404
-
-    if todo.user_id != user_id:
-        return jsonify({'error': 'Not authorized to delete this todo'}), 403
+    def remove_todo(session):
+        session.delete(get_existing(session, TodoItem, todo_id))
 
     try:
-        db.session.delete(todo)
-        db.session.commit()
+        run_write(remove_todo)
+
+        event_broker.publish(deleted['list_id'], 'deleted', deleted)
 
         return jsonify({
             'message': 'Todo deleted successfully'
         }), 200
 
+    except AccessError:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to delete todo: {str(e)}'}), 500
 
 
@@ -461,6 +984,11 @@ def move_todo(todo_id):
             "target_project_id": integer
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of todo fields to return
+        include: "children" to nest subtasks in the response (default), empty for none
+        return=minimal (or "Prefer: return=minimal"): return only the changed fields
+
     Args:
         todo_id: ID of the todo to move
 
@@ -471,32 +999,23 @@ def move_todo(todo_id):
         403: Not authorized to move this todo
         404: Todo or target project not found
     """
-    user_id = session.get('user_id')
     data = request.get_json()
 
     if not data or not data.get('target_project_id'):
         return jsonify({'error': 'target_project_id is required'}), 400
 
-    target_project_id = data['target_project_id']
-
-    todo = TodoItem.query.get(todo_id)
+    try:
+        fields = parse_fields(TodoItem.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    children = include_children(True)
 
-    if not todo:
-        return jsonify({'error': 'Todo not found'}), 404
+    target_project_id = data['target_project_id']
 
-    # Check ownership of todo
-    if todo.user_id != user_id:
-        return jsonify({'error': 'Not authorized to move this todo'}), 403
+    todo = get_owned(TodoItem, todo_id)
 
     # Find the target project
-    target_project = TodoList.query.get(target_project_id)
-
-    if not target_project:
-        return jsonify({'error': 'Target project not found'}), 404
-
-    # Check ownership of target project
-    if target_project.user_id != user_id:
-        return jsonify({'error': 'Not authorized to move to this project'}), 403
+    get_owned(TodoList, target_project_id, 'Target project')
 
     if todo.list_id == target_project_id:
         return jsonify({'error': 'Todo is already in this project'}), 400
@@ -505,25 +1024,36 @@ def move_todo(todo_id):
     if todo.parent_id is not None:
         return jsonify({'error': 'Only top-level tasks can be moved between projects. Remove from parent first.'}), 400
 
-    try:
+    source_project_id = todo.list_id
+
+    def move_subtree(session):
+        """Move the todo and all its children; returns the changed columns."""
+        target = get_existing(session, TodoItem, todo_id)
+        before = column_values(target)
+
         # Recursive function to update list_id for todo and all children
         def update_list_id_recursive(todo_item, new_list_id):
             todo_item.list_id = new_list_id
             for child in todo_item.children:
                 update_list_id_recursive(child, new_list_id)
 
-        # Move the todo and all its children
-        update_list_id_recursive(todo, target_project_id)
+        update_list_id_recursive(target, target_project_id)
+        return changed_columns(target, before)
+
+    try:
+        changed = run_write(move_subtree)
+        todo = db.session.get(TodoItem, todo_id)
 
-        db.session.commit()
+        publish_move(source_project_id, target_project_id, todo.to_dict(include_children=True))
 
-        return jsonify({
+        return mutation_response({
             'message': 'Todo moved successfully',
-            'todo': todo.to_dict(include_children=True)
-        }), 200
+            'todo': todo_result(todo, fields, children, changed)
+        }, 200)
 
+    except AccessError:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to move todo: {str(e)}'}), 500
 
 
@@ -541,6 +1071,11 @@ def reparent_todo(todo_id):
             "new_order": int              # Position in new location
         }
 
+    Query parameters:
+        fields: Optional comma-separated subset of todo fields to return
+        include: "children" to nest subtasks in the response (default), empty for none
+        return=minimal (or "Prefer: return=minimal"): return only the changed fields
+
     Args:
         todo_id: ID of the todo to reparent
 
@@ -551,16 +1086,15 @@ def reparent_todo(todo_id):
         403: Not authorized
         404: Todo or parent not found
     """
-    user_id = session.get('user_id')
     data = request.get_json()
 
-    todo = TodoItem.query.get(todo_id)
-
-    if not todo:
-        return jsonify({'error': 'Todo not found'}), 404
+    try:
+        fields = parse_fields(TodoItem.FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    children = include_children(True)
 
-    if todo.user_id != user_id:
-        return jsonify({'error': 'Not authorized to modify this todo'}), 403
+    todo = get_owned(TodoItem, todo_id)
 
     new_parent_id = data.get('new_parent_id')
     new_project_id = data.get('new_project_id', todo.list_id)
@@ -568,13 +1102,7 @@ def reparent_todo(todo_id):
 
     # Validate new_parent if provided
     if new_parent_id is not None:
-        new_parent = TodoItem.query.get(new_parent_id)
-
-        if not new_parent:
-            return jsonify({'error': 'New parent not found'}), 404
-
-        if new_parent.user_id != user_id:
-            return jsonify({'error': 'Not authorized to access new parent'}), 403
+        new_parent = get_owned(TodoItem, new_parent_id, 'New parent')
 
         # Prevent circular dependencies
         def is_descendant(potential_ancestor, potential_descendant):
@@ -607,15 +1135,15 @@ def reparent_todo(todo_id):
 
     # Validate new_project if provided
     if new_project_id != todo.list_id:
-        new_project = TodoList.query.get(new_project_id)
+        get_owned(TodoList, new_project_id, 'New project')
 
-        if not new_project:
-            return jsonify({'error': 'New project not found'}), 404
+    source_project_id = todo.list_id
 
-        if new_project.user_id != user_id:
-            return jsonify({'error': 'Not authorized to access new project'}), 403
+    def reparent(session):
+        """Move the subtree under its new parent and make room; returns the changed columns."""
+        target = get_existing(session, TodoItem, todo_id)
+        before = column_values(target)
 
-    try:
         # Recursive function to update depth and list_id for todo and all children
         def update_hierarchy(todo_item, depth_delta, new_list_id):
             todo_item.depth += depth_delta
@@ -624,17 +1152,17 @@ def reparent_todo(todo_id):
                 update_hierarchy(child, depth_delta, new_list_id)
 
         # Calculate depth delta
-        depth_delta = new_depth - todo.depth
+        depth_delta = new_depth - target.depth
 
         # Update the todo's hierarchy
-        todo.parent_id = new_parent_id
-        update_hierarchy(todo, depth_delta, new_project_id)
+        target.parent_id = new_parent_id
+        update_hierarchy(target, depth_delta, new_project_id)
 
         # Update order
-        todo.order_index = new_order
+        target.order_index = new_order
 
         # Reorder siblings in the new location to make room
-        siblings = TodoItem.query.filter_by(
+        siblings = session.query(TodoItem).filter_by(
             list_id=new_project_id,
             parent_id=new_parent_id
         ).filter(
@@ -645,13 +1173,299 @@ def reparent_todo(todo_id):
             if sibling.order_index >= new_order:
                 sibling.order_index += 1
 
-        db.session.commit()
+        return changed_columns(target, before)
 
-        return jsonify({
+    try:
+        changed = run_write(reparent)
+        todo = db.session.get(TodoItem, todo_id)
+
+        publish_move(source_project_id, new_project_id, todo.to_dict(include_children=True))
+
+        return mutation_response({
             'message': 'Todo reparented successfully',
-            'todo': todo.to_dict(include_children=True)
-        }), 200
+            'todo': todo_result(todo, fields, children, changed)
+        }, 200)
 
+    except AccessError:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': f'Failed to reparent todo: {str(e)}'}), 500
+
+
+# ============================================================================
+# EXPORT ROUTES
+# ============================================================================
+
+def ndjson_line(record_type, data):
+    """Serialize one export record as a newline-terminated JSON line."""
+    return json.dumps({'type': record_type, **data}, separators=(',', ':')) + '\n'
+
+
+@api_bp.route('/export', methods=['GET'])
+@concurrency_exempt
+@login_required
+def export_data():
+    """
+    Stream all of the current user's projects and todos as NDJSON.
+
+    Each project line is followed by that project's todos, ordered by depth so
+    a parent always appears before its children. Rows are read through a
+    server-side cursor, so memory use does not grow with the number of todos.
+
+    Returns:
+        200: application/x-ndjson stream of {"type": "project" | "todo", ...} lines
+        401: Not authenticated
+    """
+    user_id = g.user_id
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+
+    def generate():
+        projects = db.session.execute(
+            select(TodoList)
+            .where(TodoList.user_id == user_id)
+            .order_by(TodoList.id)
+            .execution_options(yield_per=batch_size)
+        ).scalars()
+        todos = db.session.execute(
+            select(TodoItem)
+            .where(TodoItem.user_id == user_id)
+            .order_by(TodoItem.list_id, TodoItem.depth, TodoItem.id)
+            .execution_options(yield_per=batch_size)
+        ).scalars()
+
+        buffer = []
+        pending = next(todos, None)
+        for project in projects:
+            buffer.append(ndjson_line('project', project.to_dict()))
+            # Both cursors are ordered by project id, so merge them in one pass
+            while pending is not None and pending.list_id <= project.id:
+                buffer.append(ndjson_line('todo', pending.to_dict()))
+                pending = next(todos, None)
+                if len(buffer) >= batch_size:
+                    yield ''.join(buffer)
+                    buffer = []
+            if len(buffer) >= batch_size:
+                yield ''.join(buffer)
+                buffer = []
+
+        if buffer:
+            yield ''.join(buffer)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename="todos-export.ndjson"'}
+    )
+
+
+# ============================================================================
+# IMPORT ROUTES
+# ============================================================================
+
+@api_bp.route('/import', methods=['POST'])
+@login_required
+def import_todos():
+    """
+    Bulk-import todos into a project from a Markdown checklist or CSV.
+
+    Expected JSON body:
+        {
+            "project_id": integer,
+            "format": "markdown" | "csv",
+            "content": "string"
+        }
+
+    A multipart upload with project_id and format form fields and a "file"
+    part is accepted as well.
+
+    All rows are inserted level by level with chunked bulk inserts inside a
+    single transaction - either everything is imported or nothing is.
+
+    Returns:
+        201: Import summary with the created todo ids (in input order)
+        400: Validation or parse error
+        401: Not authenticated
+        403: Not authorized to add to this project
+        404: Project not found
+    """
+    user_id = g.user_id
+
+    if request.files.get('file'):
+        data = request.form
+        try:
+            content = request.files['file'].read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return jsonify({'error': 'Uploaded file must be UTF-8 text'}), 400
+    else:
+        data = request.get_json(silent=True) or {}
+        content = data.get('content')
+
+    project_id = data.get('project_id')
+    import_format = (data.get('format') or '').strip().lower()
+
+    if not project_id or not content:
+        return jsonify({'error': 'project_id and content are required'}), 400
+
+    if not isinstance(content, str):
+        return jsonify({'error': 'content must be a string'}), 400
+
+    if import_format not in PARSERS:
+        return jsonify({'error': 'format must be one of markdown, csv'}), 400
+
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'project_id must be an integer'}), 400
+
+    get_owned(TodoList, project_id)
+
+    try:
+        items = PARSERS[import_format](content)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    max_items = current_app.config.get('IMPORT_MAX_ITEMS', 100000)
+    if len(items) > max_items:
+        return jsonify({'error': f'Import is limited to {max_items} todos'}), 400
+
+    chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 1000)
+    now = datetime.utcnow()
+
+    def insert_items(session):
+        """Insert every parsed item level by level; returns the new ids in input order."""
+        # Bulk inserts bypass the ORM flush hooks, so stamp the sync sequence here
+        change_seq = next_change_seq(session)
+
+        # New top-level todos go after the existing ones
+        next_order = {None: (session.query(func.max(TodoItem.order_index)).filter(
+            TodoItem.list_id == project_id,
+            TodoItem.parent_id.is_(None)
+        ).scalar() or 0) + 1}
+        created_ids = [None] * len(items)
+
+        # Parents are always at a lower depth, so inserting depth by depth
+        # means every parent id is known before its children are written.
+        for depth in range(3):
+            level = [index for index, item in enumerate(items) if item['depth'] == depth]
+
+            for start in range(0, len(level), chunk_size):
+                chunk = level[start:start + chunk_size]
+                rows = []
+                for index in chunk:
+                    item = items[index]
+                    parent_id = None
+                    if item['parent_index'] is not None:
+                        parent_id = created_ids[item['parent_index']]
+                    order_index = next_order.get(parent_id, 0)
+                    next_order[parent_id] = order_index + 1
+
+                    rows.append({
+                        'title': item['title'],
+                        'description': item['description'],
+                        'completed': item['completed'],
+                        # Core inserts skip TodoItem's completed validator
+                        'completed_at': now if item['completed'] else None,
+                        'collapsed': False,
+                        'depth': depth,
+                        'priority': item['priority'],
+                        'order_index': order_index,
+                        'parent_id': parent_id,
+                        'list_id': project_id,
+                        'user_id': user_id,
+                        'created_at': now,
+                        'change_seq': change_seq,
+                    })
+
+                result = session.execute(
+                    insert(TodoItem).returning(TodoItem.id, sort_by_parameter_order=True),
+                    rows
+                )
+                for index, new_id in zip(chunk, result.scalars()):
+                    created_ids[index] = new_id
+
+        return created_ids
+
+    try:
+        created_ids = run_write(insert_items)
+
+        event_broker.publish(project_id, 'imported', {'count': len(created_ids), 'todo_ids': created_ids})
+
+        return jsonify({
+            'message': 'Import completed successfully',
+            'created': len(created_ids),
+            'todo_ids': created_ids
+        }), 201
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to import todos: {str(e)}'}), 500
+
+
+# ============================================================================
+# SYNC ROUTES
+# ============================================================================
+
+@api_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_changes():
+    """
+    Get every project and todo that changed since a sync sequence number.
+
+    Query parameters:
+        since: Sequence number from the previous sync response (0 or omitted for everything)
+        client_id: Optional stable identifier of the device; registered clients
+            keep delete tombstones from being pruned before they have seen them
+
+    If since is older than the last tombstone compaction, deletes may have been
+    lost, so the full data set is returned with "reset": true and the client
+    should replace its local copy.
+
+    Returns:
+        200: {"seq", "reset", "projects", "todos", "deleted"}
+        400: Invalid since parameter
+        401: Not authenticated
+    """
+    user_id = g.user_id
+
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+
+    if since < 0:
+        return jsonify({'error': 'since must be an integer'}), 400
+
+    client_id = (request.args.get('client_id') or '').strip()[:64]
+
+    seq = get_sync_value(db.session, CHANGE_SEQ)
+    reset = since > 0 and since < get_sync_value(db.session, PRUNED_THROUGH)
+    if reset:
+        since = 0
+
+    projects = TodoList.query.filter(TodoList.user_id == user_id)
+    todos = TodoItem.query.filter(TodoItem.user_id == user_id)
+    deleted = []
+    if since:
+        projects = projects.filter(TodoList.change_seq > since)
+        todos = todos.filter(TodoItem.change_seq > since)
+        deleted = Tombstone.query.filter(
+            Tombstone.user_id == user_id,
+            Tombstone.change_seq > since
+        ).order_by(Tombstone.change_seq).all()
+
+    response = {
+        'seq': seq,
+        'reset': reset,
+        'projects': [project.to_dict() for project in projects.order_by(TodoList.id)],
+        # Parents before children so clients can apply rows in order
+        'todos': [todo.to_dict() for todo in todos.order_by(TodoItem.depth, TodoItem.id)],
+        'deleted': [tombstone.to_dict() for tombstone in deleted],
+    }
+
+    if client_id:
+        try:
+            record_client_progress(user_id, client_id, since)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+    return jsonify(response), 200
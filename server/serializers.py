@@ -0,0 +1,183 @@
+"""
+ORM-free read path for the tree and project list endpoints.
+
+Rows are fetched with Core select() as plain tuples in FIELDS order, so no
+identity map, attribute instrumentation or datetime objects are involved.
+SQLite stores DateTime columns as "YYYY-MM-DD HH:MM:SS.ffffff" text; the
+select rewrites that into the isoformat() string to_dict() would produce,
+so timestamps never get parsed in Python at all.
+"""
+from sqlalchemy import String, func, select, type_coerce
+
+from models import db, TodoItem, TodoList
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for application/x-msgpack responses
+    msgpack = None
+
+TODO_FIELDS = TodoItem.FIELDS
+PROJECT_FIELDS = TodoList.FIELDS
+
+ID = TODO_FIELDS.index('id')
+PARENT_ID = TODO_FIELDS.index('parent_id')
+COMPLETED = TODO_FIELDS.index('completed')
+
+
+def iso_column(column):
+    """
+    Select a DateTime column as an ISO 8601 string, matching datetime.isoformat().
+
+    isoformat() drops a zero microsecond part, so the ".000000" suffix goes too.
+    """
+    text = type_coerce(column, String)
+    return func.replace(func.replace(text, '.000000', ''), ' ', 'T').label(column.key)
+
+
+def row_columns(model, fields):
+    """Core columns for fields of model, with timestamps pre-rendered as strings."""
+    table = model.__table__
+    return [iso_column(table.c[name]) if name == 'created_at' else table.c[name] for name in fields]
+
+
+TODO_COLUMNS = row_columns(TodoItem, TODO_FIELDS)
+PROJECT_COLUMNS = row_columns(TodoList, PROJECT_FIELDS)
+
+
+def load_todo_rows(*criteria, order_by=()):
+    """Fetch todo rows as plain tuples in TODO_FIELDS order."""
+    statement = select(*TODO_COLUMNS).where(*criteria).order_by(*order_by)
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+def load_project_rows(*criteria, order_by=()):
+    """Fetch project rows as plain tuples in PROJECT_FIELDS order."""
+    statement = select(*PROJECT_COLUMNS).where(*criteria).order_by(*order_by)
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+def row_serializer(all_fields, fields=None):
+    """
+    Return a function turning a row tuple into a dictionary.
+
+    Args:
+        all_fields: Field names in row order (TODO_FIELDS or PROJECT_FIELDS)
+        fields: Optional subset of all_fields to keep
+    """
+    if fields is None:
+        return lambda row: dict(zip(all_fields, row))
+    picks = [(name, all_fields.index(name)) for name in fields]
+    return lambda row: {name: row[index] for name, index in picks}
+
+
+def completed_subtree_ids(rows):
+    """
+    Collect the ids of completed todos and everything nested below them.
+
+    Args:
+        rows: Iterable of todo row tuples (or any tuples with id, parent_id and
+            completed at the TODO_FIELDS positions) for a whole project
+    """
+    children = {}
+    stack = []
+    for row in rows:
+        children.setdefault(row[PARENT_ID], []).append(row[ID])
+        if row[COMPLETED]:
+            stack.append(row[ID])
+
+    hidden = set()
+    while stack:
+        todo_id = stack.pop()
+        if todo_id in hidden:
+            continue
+        hidden.add(todo_id)
+        stack.extend(children.get(todo_id, ()))
+    return hidden
+
+
+def build_todo_tree(rows, hidden_ids=frozenset(), fields=None):
+    """
+    Assemble a flat, already-sorted list of todo rows into nested dictionaries.
+
+    Siblings keep the order of the input list. A todo whose parent is not in
+    the list (filtered out) is returned as a root so filtered views still show it.
+
+    Args:
+        rows: Todo row tuples for a single project
+        hidden_ids: Ids to leave out of the tree entirely
+        fields: Optional subset of TODO_FIELDS to serialize
+    """
+    serialize = row_serializer(TODO_FIELDS, fields)
+
+    nodes = {}
+    for row in rows:
+        if row[ID] in hidden_ids:
+            continue
+        node = serialize(row)
+        node['children'] = []
+        nodes[row[ID]] = node
+
+    roots = []
+    for row in rows:
+        node = nodes.get(row[ID])
+        if node is None:
+            continue
+        parent = nodes.get(row[PARENT_ID])
+        if parent is not None:
+            parent['children'].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+# Columns that are identical for every todo in a project response
+CONSTANT_TODO_FIELDS = ('list_id', 'user_id')
+
+
+def columnar_todos(rows, hidden_ids=frozenset(), fields=None):
+    """
+    Lay out a project's todos as parallel arrays instead of nested objects.
+
+    Todos are emitted in tree pre-order (every parent before its subtasks, the
+    same sibling order as build_todo_tree). "parent_index" gives the position
+    of each todo's parent in the arrays, or -1 for a root. list_id and user_id
+    are the same for every todo and are sent once at the top level.
+
+    Args:
+        rows: Todo row tuples for a single project
+        hidden_ids: Ids to leave out entirely
+        fields: Optional subset of TODO_FIELDS to include as columns
+    """
+    rows = [row for row in rows if row[ID] not in hidden_ids]
+    present = {row[ID] for row in rows}
+
+    children = {}
+    roots = []
+    for row in rows:
+        parent_id = row[PARENT_ID]
+        if parent_id in present:
+            children.setdefault(parent_id, []).append(row)
+        else:
+            roots.append(row)
+
+    ordered = []
+    parent_index = []
+    stack = [(row, -1) for row in reversed(roots)]
+    while stack:
+        row, parent_position = stack.pop()
+        position = len(ordered)
+        ordered.append(row)
+        parent_index.append(parent_position)
+        stack.extend((child, position) for child in reversed(children.get(row[ID], ())))
+
+    names = [name for name in (fields or TODO_FIELDS) if name not in CONSTANT_TODO_FIELDS]
+    columns = {name: [row[TODO_FIELDS.index(name)] for row in ordered] for name in names}
+    columns['parent_index'] = parent_index
+
+    result = {'format': 'columnar', 'count': len(ordered)}
+    if ordered:
+        for name in CONSTANT_TODO_FIELDS:
+            if fields is None or name in fields:
+                result[name] = ordered[0][TODO_FIELDS.index(name)]
+    result['columns'] = columns
+    return result
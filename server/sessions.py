@@ -0,0 +1,236 @@
+"""
+Server-side sessions.
+
+The session cookie carries only a random session id; the session data
+lives in a store:
+
+    SESSION_TYPE = 'memory'   in-process LRU (single worker, lost on restart)
+    SESSION_TYPE = 'sqlite'   a table in SESSION_SQLITE_PATH (WAL mode,
+                              shared by every worker on the host)
+    SESSION_TYPE = 'cookie'   Flask's default signed-cookie sessions
+
+Stored sessions expire after PERMANENT_SESSION_LIFETIME. Unmodified
+sessions are only rewritten once half their lifetime has passed, and
+expired rows are deleted in bulk every SESSION_SWEEP_INTERVAL seconds or
+by `flask sweep-sessions`.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+import click
+from flask import current_app, session
+from flask.cli import with_appcontext
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from cache import LRUCache
+
+VALID_SESSION_TYPES = ('memory', 'sqlite', 'cookie')
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionStore:
+    """Sessions in a bounded in-process LRU; the oldest are dropped when full."""
+
+    def __init__(self, maxsize=10000):
+        self._cache = LRUCache(maxsize)
+
+    def get(self, sid):
+        """Return (data, expires_at) or None."""
+        return self._cache.get(sid)
+
+    def set(self, sid, data, expires_at):
+        self._cache.set(sid, (data, expires_at))
+
+    def delete(self, sid):
+        self._cache.pop(sid)
+
+    def sweep(self, now=None):
+        """Delete expired sessions; returns how many were removed."""
+        now = time.time() if now is None else now
+        expired = [sid for sid, (_, expires_at) in self._cache.items() if expires_at <= now]
+        for sid in expired:
+            self._cache.pop(sid)
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in their own SQLite file, so session writes never take the
+    todos database's write lock. One connection per thread, WAL journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        """Return (data, expires_at) or None."""
+        return self._connect().execute(
+            'SELECT data, expires_at FROM sessions WHERE id = ?', (sid,)
+        ).fetchone()
+
+    def set(self, sid, data, expires_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at',
+                (sid, data, expires_at),
+            )
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+
+    def sweep(self, now=None, batch_size=1000):
+        """Delete expired sessions in batches; returns how many were removed."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        removed = 0
+        while True:
+            with conn:
+                deleted = conn.execute(
+                    'DELETE FROM sessions WHERE id IN '
+                    '(SELECT id FROM sessions WHERE expires_at <= ? LIMIT ?)',
+                    (now, batch_size),
+                ).rowcount
+            removed += deleted
+            if deleted < batch_size:
+                return removed
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Session interface that keeps data in a store and only the id in the cookie."""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, sweep_interval=300):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            stored = self.store.get(sid)
+            if stored is not None and stored[1] > time.time():
+                session = ServerSideSession(self.serializer.loads(stored[0]), sid=sid)
+                session.expires_at = stored[1]
+                return session
+        return ServerSideSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def regenerate(self, session):
+        """Move the session to a new id and delete the stored old one."""
+        if not session.new:
+            self.store.delete(session.sid)
+        session.sid = secrets.token_urlsafe(24)
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = now + lifetime / 2 > getattr(session, 'expires_at', 0)
+        if not (session.modified or session.new or stale):
+            return
+
+        self.store.set(session.sid, self.serializer.dumps(dict(session)), now + lifetime)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add('Cookie')
+
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.store.sweep(now)
+
+
+def regenerate_session():
+    """
+    Give the current session a fresh id before it is promoted to a login,
+    so an id planted or leaked beforehand cannot be used afterwards.
+    Signed-cookie sessions have no id and are left alone.
+    """
+    interface = current_app.session_interface
+    if isinstance(interface, ServerSideSessionInterface):
+        interface.regenerate(session)
+
+
+def init_sessions(app):
+    """Install the session interface selected by SESSION_TYPE."""
+    app.config.setdefault('SESSION_TYPE', 'sqlite')
+    app.config.setdefault('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.db'))
+    app.config.setdefault('SESSION_MEMORY_SIZE', 10000)
+    app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+
+    session_type = app.config['SESSION_TYPE']
+    if session_type not in VALID_SESSION_TYPES:
+        raise ValueError(f'SESSION_TYPE must be one of {", ".join(VALID_SESSION_TYPES)}')
+    if session_type == 'cookie':
+        return
+
+    if session_type == 'memory':
+        store = MemorySessionStore(app.config['SESSION_MEMORY_SIZE'])
+    else:
+        os.makedirs(os.path.dirname(app.config['SESSION_SQLITE_PATH']) or '.', exist_ok=True)
+        store = SQLiteSessionStore(app.config['SESSION_SQLITE_PATH'])
+    app.session_interface = ServerSideSessionInterface(store, app.config['SESSION_SWEEP_INTERVAL'])
+
+
+@click.command('sweep-sessions')
+@with_appcontext
+def sweep_sessions_command():
+    """Delete expired server-side sessions."""
+    interface = current_app.session_interface
+    if not isinstance(interface, ServerSideSessionInterface):
+        click.echo('Cookie sessions are in use; nothing to sweep.')
+        return
+    removed = interface.store.sweep()
+    click.echo(f'Removed {removed} expired session(s).')
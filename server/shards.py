@@ -0,0 +1,189 @@
+"""
+Optional per-user sharding of project and todo data.
+
+SQLite allows one writer per database file, so with every user in
+todos.db all writes queue on one lock. With SHARDING_MODE set, the tables
+in SHARDED_TABLES live in separate database files under SHARD_DIRECTORY:
+
+    SHARDING_MODE = 'user'   one file per user (user-<id>.db)
+    SHARDING_MODE = 'hash'   SHARD_COUNT files, picked by user id (shard-<n>.db)
+
+Users (and sessions) stay in the main database. The session's get_bind
+asks the ShardRouter for the engine of the current user's shard, where
+the current user is g.user_id, or the user set with use_shard_user() for
+work done outside a request (write pipeline, UI state flush, CLI).
+
+Shard engines are opened on first use and kept in a bounded LRU
+(SHARD_ENGINE_CACHE_SIZE); evicted engines are disposed. Every shard
+allocates ids from its own range (AUTOINCREMENT seeded through
+sqlite_sequence), so project and todo ids stay globally unique and the
+caches and event channels keyed by them need no shard awareness.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+
+from flask import g, has_app_context
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.sql.expression import Select, UpdateBase
+
+from cache import LRUCache
+from dbrouting import begin_sqlite_transaction, set_sqlite_pragmas, sqlite_file_path
+from models import db, User, TodoList, TodoItem, ArchivedTodoItem, Tombstone, SyncClient, SyncState
+
+SHARDED_TABLES = (TodoList.__table__, TodoItem.__table__, ArchivedTodoItem.__table__, Tombstone.__table__,
+                  SyncClient.__table__, SyncState.__table__)
+SHARDED_TABLE_NAMES = frozenset(table.name for table in SHARDED_TABLES)
+
+# Ids per shard: hash shards get 2**40 each, per-user shards 2**30 each.
+# Both keep ids below 2**53 so JavaScript clients read them exactly.
+HASH_SHARD_ID_SPAN = 2 ** 40
+USER_SHARD_ID_SPAN = 2 ** 30
+
+_shard_user = contextvars.ContextVar('shard_user', default=None)
+
+
+@contextlib.contextmanager
+def use_shard_user(user_id):
+    """Route sharded queries to user_id's shard inside the block."""
+    token = _shard_user.set(user_id)
+    try:
+        yield
+    finally:
+        _shard_user.reset(token)
+
+
+def current_shard_user():
+    """The user whose shard sharded queries go to, or None."""
+    user_id = _shard_user.get()
+    if user_id is None and has_app_context():
+        user_id = g.get('user_id')
+    return user_id
+
+
+def statement_tables(mapper, clause):
+    """Names of the tables a get_bind() call is about."""
+    if mapper is not None:
+        return {table.name for table in inspect(mapper).tables}
+    if isinstance(clause, UpdateBase):
+        return {clause.table.name}
+    if isinstance(clause, Select):
+        return {getattr(from_, 'name', None) for from_ in clause.get_final_froms()}
+    return set()
+
+
+class ShardRouter:
+    """Maps users to shard files and hands out (cached) shard engines."""
+
+    def __init__(self, mode, directory, shard_count=16, cache_size=64):
+        if mode not in ('user', 'hash'):
+            raise ValueError("SHARDING_MODE must be 'user' or 'hash'")
+        self.mode = mode
+        self.directory = directory
+        self.shard_count = shard_count
+        self._engines = LRUCache(cache_size, on_evict=lambda key, engine: engine.dispose())
+        self._open_lock = threading.Lock()
+        self._metadata = MetaData()
+        # Only there so foreign keys to users resolve; it stays empty
+        User.__table__.to_metadata(self._metadata)
+        for table in SHARDED_TABLES:
+            # Shard copies use AUTOINCREMENT so their id ranges can be seeded
+            table.to_metadata(self._metadata).dialect_kwargs['sqlite_autoincrement'] = True
+        os.makedirs(directory, exist_ok=True)
+
+    def shard_for(self, user_id):
+        """(shard name, first id) for a user."""
+        if self.mode == 'user':
+            return f'user-{user_id}', user_id * USER_SHARD_ID_SPAN
+        index = user_id % self.shard_count
+        return f'shard-{index:02d}', (index + 1) * HASH_SHARD_ID_SPAN
+
+    def shard_user(self, name):
+        """A user id that routes to the named shard (for per-shard maintenance)."""
+        return int(name.split('-', 1)[1])
+
+    def shard_names(self):
+        """Names of the shard files that exist on disk."""
+        return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith('.db'))
+
+    def engine(self, user_id):
+        """Engine for user_id's shard, opening (and creating) it if needed."""
+        name, id_base = self.shard_for(user_id)
+        engine = self._engines.get(name)
+        if engine is None:
+            with self._open_lock:
+                engine = self._engines.get(name)
+                if engine is None:
+                    engine = self._open(name, id_base)
+                    self._engines.set(name, engine)
+        return engine
+
+    def engine_for(self, mapper, clause):
+        """Shard engine for a statement on sharded tables, else None."""
+        if not statement_tables(mapper, clause) & SHARDED_TABLE_NAMES:
+            return None
+        user_id = current_shard_user()
+        if user_id is None:
+            raise RuntimeError('Sharded tables need a current user (g.user_id or use_shard_user())')
+        return self.engine(user_id)
+
+    def _open(self, name, id_base):
+        engine = create_engine(f'sqlite:///{os.path.join(self.directory, name)}.db')
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+        event.listen(engine, 'begin', begin_sqlite_transaction)
+        self._metadata.create_all(engine)
+        with engine.begin() as conn:
+            for table in SHARDED_TABLES:
+                conn.execute(
+                    text('INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq '
+                         'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)'),
+                    {'name': table.name, 'seq': id_base},
+                )
+        return engine
+
+    def stats(self):
+        """Engine cache counters."""
+        return self._engines.stats()
+
+    def close(self):
+        """Dispose every open shard engine."""
+        for name, engine in self._engines.items():
+            self._engines.pop(name)
+            engine.dispose()
+
+
+def database_files(app):
+    """
+    Every SQLite file holding the app's data, for per-file jobs like backups.
+
+    Returns:
+        List of (name, path): ('todos.db', main file) then ('shards/<name>.db', path)
+        per shard file; empty if the main database is not a SQLite file
+    """
+    path = sqlite_file_path(str(db.engine.url))
+    if path is None:
+        return []
+    files = [('todos.db', path)]
+    router = app.extensions.get('shard_router')
+    if router is not None:
+        for name in router.shard_names():
+            files.append((os.path.join('shards', f'{name}.db'), os.path.join(router.directory, f'{name}.db')))
+    return files
+
+
+def init_sharding(app):
+    """Create the app's ShardRouter if SHARDING_MODE is set."""
+    app.config.setdefault('SHARDING_MODE', None)
+    app.config.setdefault('SHARD_COUNT', 16)
+    app.config.setdefault('SHARD_DIRECTORY', os.path.join(app.instance_path, 'shards'))
+    app.config.setdefault('SHARD_ENGINE_CACHE_SIZE', 64)
+
+    if not app.config['SHARDING_MODE']:
+        return
+    app.extensions['shard_router'] = ShardRouter(
+        app.config['SHARDING_MODE'],
+        app.config['SHARD_DIRECTORY'],
+        shard_count=app.config['SHARD_COUNT'],
+        cache_size=app.config['SHARD_ENGINE_CACHE_SIZE'],
+    )
@@ -0,0 +1,140 @@
+"""
+Change sequence bookkeeping for incremental (delta) sync.
+
+Every flush that writes a TodoList or TodoItem takes the next value of a
+global counter and stamps it on the rows it touches; deletes leave a
+Tombstone with the same number. Clients then ask for everything with a
+sequence number above the last one they saw.
+"""
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, insert, update
+from sqlalchemy.orm import Session
+
+from models import db, TodoList, TodoItem, Tombstone, SyncClient, SyncState
+from shards import use_shard_user
+
+CHANGE_SEQ = 'change_seq'
+PRUNED_THROUGH = 'tombstones_pruned_through'
+
+sync_state = SyncState.__table__
+
+
+def next_change_seq(session):
+    """
+    Allocate the next change sequence number inside the session's transaction.
+
+    The UPDATE takes SQLite's write lock, so numbers are handed out in commit
+    order and a reader never sees a gap fill in later.
+    """
+    value = session.execute(
+        update(sync_state)
+        .where(sync_state.c.name == CHANGE_SEQ)
+        .values(value=sync_state.c.value + 1)
+        .returning(sync_state.c.value)
+    ).scalar()
+    if value is None:
+        value = 1
+        session.execute(insert(sync_state).values(name=CHANGE_SEQ, value=value))
+    return value
+
+
+def get_sync_value(session, name):
+    """Read one SyncState counter (0 if it was never written)."""
+    return session.query(SyncState.value).filter(SyncState.name == name).scalar() or 0
+
+
+def todo_tombstones(todo, seq, seen):
+    """Yield tombstones for a deleted todo and every subtask below it."""
+    if todo.id in seen:
+        return
+    seen.add(todo.id)
+    yield Tombstone(entity_type='todo', entity_id=todo.id, user_id=todo.user_id,
+                    list_id=todo.list_id, change_seq=seq)
+    for child in todo.children:
+        yield from todo_tombstones(child, seq, seen)
+
+
+@event.listens_for(Session, 'before_flush')
+def stamp_change_seq(session, flush_context, instances):
+    """Stamp written projects/todos with a new sequence number and tombstone deletes."""
+    synced = (TodoList, TodoItem)
+    written = [obj for obj in session.new if isinstance(obj, synced)]
+    written += [obj for obj in session.dirty
+                if isinstance(obj, synced) and session.is_modified(obj, include_collections=False)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, synced)]
+
+    if not written and not deleted:
+        return
+
+    seq = next_change_seq(session)
+    for obj in written:
+        obj.change_seq = seq
+
+    seen = set()
+    for obj in deleted:
+        if isinstance(obj, TodoList):
+            # Clients drop a deleted project's todos along with it
+            session.add(Tombstone(entity_type='project', entity_id=obj.id, user_id=obj.user_id,
+                                  list_id=obj.id, change_seq=seq))
+        else:
+            session.add_all(todo_tombstones(obj, seq, seen))
+
+
+def record_client_progress(user_id, client_id, last_seq):
+    """Remember how far a client has synced (it confirmed holding last_seq)."""
+    client = SyncClient.query.filter_by(user_id=user_id, client_id=client_id).first()
+    if client is None:
+        client = SyncClient(user_id=user_id, client_id=client_id)
+        db.session.add(client)
+    client.last_seq = max(client.last_seq or 0, last_seq)
+    client.last_seen = datetime.utcnow()
+
+
+def compact_tombstones(max_client_age=timedelta(days=30)):
+    """
+    Delete tombstones every active client has already synced past.
+
+    Clients that have not synced within max_client_age are forgotten; if they
+    come back, their sequence number is below the pruned watermark and the
+    sync endpoint tells them to reload from scratch.
+
+    Returns:
+        Tuple of (tombstones deleted, stale clients removed, new watermark)
+    """
+    cutoff = datetime.utcnow() - max_client_age
+    stale = SyncClient.query.filter(SyncClient.last_seen < cutoff).delete(synchronize_session=False)
+
+    watermark = db.session.query(func.min(SyncClient.last_seq)).scalar()
+    if watermark is None:
+        # No active clients: anyone who syncs next starts from a full reload
+        watermark = get_sync_value(db.session, CHANGE_SEQ)
+
+    deleted = Tombstone.query.filter(Tombstone.change_seq <= watermark).delete(synchronize_session=False)
+
+    if watermark > get_sync_value(db.session, PRUNED_THROUGH):
+        updated = db.session.execute(
+            update(sync_state).where(sync_state.c.name == PRUNED_THROUGH).values(value=watermark)
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(sync_state).values(name=PRUNED_THROUGH, value=watermark))
+
+    db.session.commit()
+    return deleted, stale, watermark
+
+
+@click.command('compact-tombstones')
+@click.option('--max-client-age-days', default=30, show_default=True,
+              help='Forget sync clients that have not synced for this many days.')
+@with_appcontext
+def compact_tombstones_command(max_client_age_days):
+    """Prune delete tombstones that every sync client has already seen."""
+    router = current_app.extensions.get('shard_router')
+    shard_users = [router.shard_user(name) for name in router.shard_names()] if router else [None]
+    for shard_user in shard_users:
+        with use_shard_user(shard_user):
+            deleted, stale, watermark = compact_tombstones(timedelta(days=max_client_age_days))
+        click.echo(f'Pruned {deleted} tombstone(s) through seq {watermark}; forgot {stale} stale client(s).')
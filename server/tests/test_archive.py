@@ -0,0 +1,237 @@
+"""
+Tests for archiving completed todos.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from archive import restore_archived
+from models import db, TodoItem, ArchivedTodoItem
+
+
+def create_project(auth_client, name='P'):
+    """Create a project and return its id."""
+    return auth_client.post('/api/projects', json={'name': name}).get_json()['project']['id']
+
+
+def create_todo(auth_client, project_id, title, parent_id=None):
+    """Create a todo and return its id."""
+    body = {'project_id': project_id, 'title': title}
+    if parent_id is not None:
+        body['parent_id'] = parent_id
+    return auth_client.post('/api/todos', json=body).get_json()['todo']['id']
+
+
+def complete(auth_client, todo_id, days_ago=60):
+    """Mark a todo (and its subtasks) completed, backdated by days_ago."""
+    auth_client.put(f'/api/todos/{todo_id}', json={'completed': True})
+    db.session.execute(
+        update(TodoItem).where(TodoItem.completed.is_(True))
+        .where(TodoItem.completed_at > datetime.utcnow() - timedelta(minutes=1))
+        .values(completed_at=datetime.utcnow() - timedelta(days=days_ago))
+    )
+    db.session.commit()
+
+
+def tree_titles(auth_client, project_id):
+    """Top-level todo titles of a project."""
+    return [todo['title'] for todo in auth_client.get(f'/api/todos/{project_id}').get_json()['todos']]
+
+
+class TestCompletedAt:
+    """Test the completion timestamp that starts the archive clock."""
+
+    def test_set_on_complete_and_cleared_on_reopen(self, auth_client):
+        """Test that completing stamps completed_at and reopening clears it."""
+        todo_id = create_todo(auth_client, create_project(auth_client), 'T')
+
+        auth_client.put(f'/api/todos/{todo_id}', json={'completed': True})
+        assert db.session.get(TodoItem, todo_id).completed_at is not None
+
+        auth_client.put(f'/api/todos/{todo_id}', json={'completed': False})
+        db.session.expire_all()
+        assert db.session.get(TodoItem, todo_id).completed_at is None
+
+    def test_set_for_imported_completed_todos(self, auth_client):
+        """Test that todos imported as done can be archived like any other."""
+        project_id = create_project(auth_client)
+        auth_client.post('/api/import', json={
+            'project_id': project_id, 'format': 'markdown', 'content': '- [x] done task\n- [ ] open task\n',
+        })
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive', json={'older_than_days': 0})
+
+        assert response.get_json()['archived'] == 1
+        assert tree_titles(auth_client, project_id) == ['open task']
+
+
+class TestArchive:
+    """Test POST/GET /api/projects/<id>/archive."""
+
+    def test_archives_old_completed_subtrees(self, auth_client):
+        """Test that old completed subtrees move out and everything else stays."""
+        project_id = create_project(auth_client)
+        old = create_todo(auth_client, project_id, 'Old')
+        create_todo(auth_client, project_id, 'Old child', parent_id=old)
+        complete(auth_client, old)
+        recent = create_todo(auth_client, project_id, 'Recent')
+        complete(auth_client, recent, days_ago=1)
+        create_todo(auth_client, project_id, 'Open')
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive', json={'older_than_days': 30})
+
+        assert response.status_code == 200
+        assert response.get_json() == {'archived': 1}
+        assert tree_titles(auth_client, project_id) == ['Recent', 'Open']
+        assert db.session.query(ArchivedTodoItem).count() == 2
+
+    def test_subtree_with_open_subtask_stays(self, auth_client):
+        """Test that a completed root with an unfinished subtask is not archived."""
+        project_id = create_project(auth_client)
+        root = create_todo(auth_client, project_id, 'Root')
+        complete(auth_client, root)
+        create_todo(auth_client, project_id, 'Added later', parent_id=root)
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive', json={'older_than_days': 30})
+
+        assert response.get_json() == {'archived': 0}
+        assert tree_titles(auth_client, project_id) == ['Root']
+
+    def test_small_batches_cover_everything(self, app, auth_client):
+        """Test that archiving one subtree per transaction still archives all of them."""
+        app.config['ARCHIVE_BATCH_SIZE'] = 1
+        project_id = create_project(auth_client)
+        for i in range(3):
+            complete(auth_client, create_todo(auth_client, project_id, f'T{i}'))
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive')
+
+        assert response.get_json() == {'archived': 3}
+        assert tree_titles(auth_client, project_id) == []
+
+    def test_archived_todos_sync_as_deletes(self, auth_client):
+        """Test that sync clients are told to drop archived todos."""
+        project_id = create_project(auth_client)
+        root = create_todo(auth_client, project_id, 'Root')
+        child = create_todo(auth_client, project_id, 'Child', parent_id=root)
+        complete(auth_client, root)
+        seq = auth_client.get('/api/sync').get_json()['seq']
+
+        auth_client.post(f'/api/projects/{project_id}/archive')
+
+        deleted = auth_client.get(f'/api/sync?since={seq}').get_json()['deleted']
+        assert {(d['type'], d['id']) for d in deleted} == {('todo', root), ('todo', child)}
+
+    def test_list_is_paginated_and_nested(self, auth_client):
+        """Test that the archive lists subtree roots with their subtasks, a page at a time."""
+        project_id = create_project(auth_client)
+        first = create_todo(auth_client, project_id, 'First')
+        create_todo(auth_client, project_id, 'First child', parent_id=first)
+        second = create_todo(auth_client, project_id, 'Second')
+        complete(auth_client, first)
+        complete(auth_client, second)
+        auth_client.post(f'/api/projects/{project_id}/archive')
+
+        data = auth_client.get(f'/api/projects/{project_id}/archive?per_page=1&page=2').get_json()
+
+        assert data['total'] == 2
+        assert data['page'] == 2 and data['per_page'] == 1
+        [entry] = data['archived']
+        assert entry['title'] == 'First'
+        assert [child['title'] for child in entry['children']] == ['First child']
+
+    def test_invalid_parameters(self, auth_client):
+        """Test that bad pagination and age values are rejected."""
+        project_id = create_project(auth_client)
+
+        assert auth_client.get(f'/api/projects/{project_id}/archive?per_page=500').status_code == 400
+        assert auth_client.post(f'/api/projects/{project_id}/archive',
+                                json={'older_than_days': -1}).status_code == 400
+        assert auth_client.get('/api/projects/9999/archive').status_code == 404
+
+    def test_cli_archives_all_projects(self, app, auth_client, runner):
+        """Test that `flask archive-todos` archives across projects."""
+        for name in ('A', 'B'):
+            project_id = create_project(auth_client, name)
+            complete(auth_client, create_todo(auth_client, project_id, 'Done'))
+
+        result = runner.invoke(args=['archive-todos', '--days', '30'])
+
+        assert result.exit_code == 0
+        assert 'Archived 2 completed subtree(s).' in result.output
+
+    def test_project_delete_drops_archive(self, auth_client):
+        """Test that deleting a project also deletes its archived todos."""
+        project_id = create_project(auth_client)
+        complete(auth_client, create_todo(auth_client, project_id, 'Done'))
+        auth_client.post(f'/api/projects/{project_id}/archive')
+
+        auth_client.delete(f'/api/projects/{project_id}')
+
+        assert db.session.query(ArchivedTodoItem).count() == 0
+
+
+class TestRestore:
+    """Test POST /api/projects/<id>/archive/<archive_id>/restore."""
+
+    def archive_one(self, auth_client):
+        """Archive a root with one subtask; returns (project_id, archive_id)."""
+        project_id = create_project(auth_client)
+        create_todo(auth_client, project_id, 'Open')
+        root = create_todo(auth_client, project_id, 'Root')
+        create_todo(auth_client, project_id, 'Child', parent_id=root)
+        complete(auth_client, root)
+        auth_client.post(f'/api/projects/{project_id}/archive')
+        archive_id = auth_client.get(f'/api/projects/{project_id}/archive').get_json()['archived'][0]['id']
+        return project_id, archive_id
+
+    def test_restore_puts_subtree_back(self, auth_client):
+        """Test that a restored subtree returns at the end of the project with its subtasks."""
+        project_id, archive_id = self.archive_one(auth_client)
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive/{archive_id}/restore')
+
+        assert response.status_code == 201
+        todo = response.get_json()['todo']
+        assert todo['title'] == 'Root' and todo['completed'] is True
+        assert [child['title'] for child in todo['children']] == ['Child']
+        assert tree_titles(auth_client, project_id) == ['Open', 'Root']
+        assert auth_client.get(f'/api/projects/{project_id}/archive').get_json()['total'] == 0
+
+    def test_restored_subtree_is_not_rearchived_at_once(self, auth_client):
+        """Test that restoring restarts the archive clock."""
+        project_id, archive_id = self.archive_one(auth_client)
+        auth_client.post(f'/api/projects/{project_id}/archive/{archive_id}/restore')
+
+        response = auth_client.post(f'/api/projects/{project_id}/archive', json={'older_than_days': 30})
+
+        assert response.get_json() == {'archived': 0}
+
+    def test_restore_twice_at_once(self, auth_client, monkeypatch):
+        """Test that restoring a subtree that was restored meanwhile is a 404, not a 500."""
+        import routes
+        project_id, archive_id = self.archive_one(auth_client)
+        get_owned = routes.get_owned
+
+        def get_owned_then_restore(model, object_id, label=None):
+            item = get_owned(model, object_id, label)
+            restore_archived(db.session, archive_id)
+            db.session.commit()
+            return item
+
+        monkeypatch.setattr(routes, 'get_owned', get_owned_then_restore)
+        response = auth_client.post(f'/api/projects/{project_id}/archive/{archive_id}/restore')
+
+        monkeypatch.undo()
+        assert response.status_code == 404
+        assert tree_titles(auth_client, project_id) == ['Open', 'Root']
+
+    def test_restore_checks_project_and_root(self, auth_client):
+        """Test that only a subtree root of the given project can be restored."""
+        project_id, archive_id = self.archive_one(auth_client)
+        other_project = create_project(auth_client, 'Other')
+        child_id = archive_id + 1
+
+        assert auth_client.post(f'/api/projects/{other_project}/archive/{archive_id}/restore').status_code == 404
+        assert auth_client.post(f'/api/projects/{project_id}/archive/{child_id}/restore').status_code == 404
+        assert auth_client.post(f'/api/projects/{project_id}/archive/9999/restore').status_code == 404
@@ -251,3 +251,112 @@ class TestChangePassword:
         })
 
         assert response.status_code == 401
+
+
+class TestUserCache:
+    """Test the cached user records behind login_required."""
+
+    def test_authenticated_requests_hit_cache(self, app, auth_client):
+        """Test that repeated auth checks are served from the cache."""
+        cache = app.extensions['user_cache']
+        auth_client.get('/api/projects')
+        hits = cache.stats()['hits']
+
+        auth_client.get('/api/projects')
+        auth_client.get('/api/auth/current')
+
+        assert cache.stats()['hits'] == hits + 2
+
+    def test_change_password_invalidates(self, app, auth_client):
+        """Test that changing the password drops the cached record."""
+        auth_client.get('/api/projects')
+        user_id = auth_client.get('/api/auth/current').get_json()['user']['id']
+        assert user_id in app.extensions['user_cache']
+
+        auth_client.post('/api/auth/change-password', json={
+            'current_password': 'testpass123',
+            'new_password': 'newpassword123'
+        })
+
+        assert user_id not in app.extensions['user_cache']
+
+    def test_account_change_invalidates(self, app, auth_client):
+        """Test that any committed change to a user drops the cached record."""
+        user_id = auth_client.get('/api/auth/current').get_json()['user']['id']
+        user = db.session.get(User, user_id)
+        user.email = 'changed@example.com'
+        db.session.commit()
+
+        assert auth_client.get('/api/auth/current').get_json()['user']['email'] == 'changed@example.com'
+
+    def test_deleted_user_rejected(self, app, auth_client):
+        """Test that a session for a deleted user is rejected."""
+        user_id = auth_client.get('/api/auth/current').get_json()['user']['id']
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+        assert auth_client.get('/api/projects').status_code == 401
+
+
+class TestApiTokens:
+    """Test bearer token issuance and authentication."""
+
+    def get_token(self, client):
+        """Register a user, drop the session and return a fresh token."""
+        client.post('/api/auth/register', json={
+            'username': 'tokenuser', 'email': 'token@example.com', 'password': 'password123'
+        })
+        client.post('/api/auth/logout')
+        response = client.post('/api/auth/token', json={'username': 'tokenuser', 'password': 'password123'})
+        assert response.status_code == 200
+        return response.get_json()['token']
+
+    def test_token_authenticates(self, client):
+        """Test that a bearer token works without a session cookie."""
+        token = self.get_token(client)
+        client.delete_cookie('todo_session')
+
+        response = client.post('/api/projects', json={'name': 'Scripted'},
+                               headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 201
+
+    def test_token_from_session(self, auth_client):
+        """Test that a logged-in session can mint a token without credentials."""
+        response = auth_client.post('/api/auth/token')
+
+        assert response.status_code == 200
+        assert response.get_json()['token_type'] == 'Bearer'
+
+    def test_token_wrong_password(self, client):
+        """Test that bad credentials are rejected."""
+        self.get_token(client)
+        response = client.post('/api/auth/token', json={'username': 'tokenuser', 'password': 'wrong'})
+
+        assert response.status_code == 401
+
+    def test_tampered_token_rejected(self, client):
+        """Test that a modified token fails signature verification."""
+        token = self.get_token(client)
+
+        response = client.get('/api/projects', headers={'Authorization': f'Bearer {token[:-2]}xx'})
+
+        assert response.status_code == 401
+        assert 'token' in response.get_json()['error'].lower()
+
+    def test_expired_token_rejected(self, app, client):
+        """Test that tokens older than API_TOKEN_MAX_AGE are rejected."""
+        token = self.get_token(client)
+        app.config['API_TOKEN_MAX_AGE'] = -1
+
+        assert client.get('/api/projects', headers={'Authorization': f'Bearer {token}'}).status_code == 401
+
+    def test_token_auth_skips_database(self, app, client):
+        """Test that token authentication does not consult the user cache or database."""
+        token = self.get_token(client)
+        app.extensions['user_cache'].clear()
+        misses = app.extensions['user_cache'].stats()['misses']
+
+        client.get('/api/projects', headers={'Authorization': f'Bearer {token}'})
+
+        assert app.extensions['user_cache'].stats()['misses'] == misses
@@ -0,0 +1,110 @@
+"""
+Tests for the ownership checks shared by the API routes.
+"""
+import sqlite3
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+import routes
+from authz import AccessError, get_owned
+from dbrouting import sqlite_file_path
+from models import db, TodoList, TodoItem
+
+
+def other_users_project(client):
+    """Create a project owned by a second user and return its id; the client ends up logged out."""
+    client.post('/api/auth/register', json={
+        'username': 'otheruser', 'email': 'other@example.com', 'password': 'password123'
+    })
+    project_id = client.post('/api/projects', json={'name': 'Private'}).get_json()['project']['id']
+    client.post('/api/auth/logout')
+    return project_id
+
+
+class TestOwnershipRoutes:
+    """Test 404/403 responses through the API."""
+
+    def test_missing_project(self, auth_client):
+        """Test that a missing project is a 404."""
+        response = auth_client.get('/api/projects/9999')
+
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Project not found'
+
+    def test_foreign_project(self, client):
+        """Test that another user's project is a 403 on every route."""
+        project_id = other_users_project(client)
+        client.post('/api/auth/register', json={
+            'username': 'testuser', 'email': 'test@example.com', 'password': 'testpass123'
+        })
+
+        responses = [
+            client.get(f'/api/projects/{project_id}'),
+            client.put(f'/api/projects/{project_id}', json={'name': 'Mine'}),
+            client.get(f'/api/todos/{project_id}'),
+            client.post('/api/todos', json={'title': 'X', 'project_id': project_id}),
+        ]
+
+        assert [r.status_code for r in responses] == [403] * 4
+        assert {r.get_json()['error'] for r in responses} == {'Not authorized to access this project'}
+
+    def test_missing_parent_label(self, auth_client):
+        """Test that secondary lookups name the resource in the message."""
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+
+        response = auth_client.post('/api/todos', json={'title': 'X', 'project_id': project_id, 'parent_id': 9999})
+
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Parent todo not found'
+
+    def test_deleted_after_ownership_check(self, app, auth_client, monkeypatch):
+        """Test that a todo deleted between the check and the write is a 404, not a 500."""
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        todo_id = auth_client.post('/api/todos', json={'title': 'X', 'project_id': project_id}).get_json()['todo']['id']
+        path = sqlite_file_path(app.config['SQLALCHEMY_DATABASE_URI'])
+
+        def get_owned_then_delete(model, object_id, label=None):
+            obj = get_owned(model, object_id, label)
+            with sqlite3.connect(path) as other_request:
+                other_request.execute('DELETE FROM todo_items WHERE id = ?', (todo_id,))
+            return obj
+
+        monkeypatch.setattr(routes, 'get_owned', get_owned_then_delete)
+        response = auth_client.put(f'/api/todos/{todo_id}', json={'title': 'Y'})
+
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Todo not found'
+
+
+class TestGetOwned:
+    """Test get_owned directly."""
+
+    def test_one_query_and_memoized(self, app, sample_project, sample_user):
+        """Test that a check is one query and repeated checks are free."""
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.test_request_context():
+            g.user_id = sample_user
+            event.listen(db.engine, 'before_cursor_execute', count)
+            try:
+                first = get_owned(TodoList, sample_project)
+                second = get_owned(TodoList, sample_project)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert first is second
+        assert len(statements) == 1
+
+    def test_forbidden(self, app, sample_todo, sample_user):
+        """Test that another user's row raises a 403 AccessError."""
+        with app.test_request_context():
+            g.user_id = sample_user + 1
+            with pytest.raises(AccessError) as excinfo:
+                get_owned(TodoItem, sample_todo)
+
+        assert excinfo.value.status == 403
@@ -0,0 +1,130 @@
+"""
+Tests for online backups.
+"""
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from backup import BackupError, backup_database, backup_lock
+from dbrouting import sqlite_file_path
+from models import db
+
+
+def project_names(path):
+    """Project names stored in a backup file."""
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute('SELECT name FROM todo_lists ORDER BY id')]
+
+
+@pytest.fixture
+def source_path(app):
+    """Path of the test app's database file."""
+    return sqlite_file_path(str(db.engine.url))
+
+
+class TestBackupDatabase:
+    """Test the backup function itself."""
+
+    def test_copy_reports_progress_and_verifies(self, auth_client, source_path, tmp_path):
+        """Test that a stepwise backup copies committed data and reports each step."""
+        auth_client.post('/api/projects', json={'name': 'Kept'})
+        steps = []
+
+        result = backup_database(source_path, str(tmp_path / 'copy.db'), pages=1, sleep=0,
+                                 progress=lambda copied, total: steps.append((copied, total)))
+
+        assert project_names(result['path']) == ['Kept']
+        assert len(steps) > 1
+        assert steps[-1][0] == steps[-1][1] == result['pages']
+        assert not os.path.exists(f"{result['path']}.partial")
+
+    def test_refuses_to_overwrite(self, source_path, tmp_path):
+        """Test that an existing destination is left alone."""
+        dest = tmp_path / 'copy.db'
+        dest.write_text('old')
+
+        with pytest.raises(BackupError):
+            backup_database(source_path, str(dest))
+        assert dest.read_text() == 'old'
+
+    def test_gives_up_after_max_restarts(self, source_path, tmp_path):
+        """Test that a stepwise copy restarted by writes fails cleanly instead of looping."""
+        dest = tmp_path / 'copy.db'
+
+        def write_between_steps(copied, total):
+            with sqlite3.connect(source_path) as writer:
+                writer.execute('CREATE TABLE IF NOT EXISTS scratch (x)')
+                writer.execute('INSERT INTO scratch VALUES (1)')
+
+        with pytest.raises(BackupError, match='restarted'):
+            backup_database(source_path, str(dest), pages=1, sleep=0, max_restarts=2,
+                            progress=write_between_steps)
+        assert not os.path.exists(dest)
+        assert not os.path.exists(f'{dest}.partial')
+
+    def test_writes_continue_during_backup(self, auth_client, source_path, tmp_path):
+        """Test that writers keep committing while a slow backup runs."""
+        for i in range(20):
+            auth_client.post('/api/projects', json={'name': f'P{i}'})
+        thread = threading.Thread(target=backup_database,
+                                  args=(source_path, str(tmp_path / 'copy.db')),
+                                  kwargs={'pages': 1, 'sleep': 0.005, 'max_restarts': 100})
+        thread.start()
+
+        statuses = [auth_client.post('/api/projects', json={'name': 'During'}).status_code for _ in range(5)]
+
+        thread.join()
+        assert statuses == [201] * 5
+        assert len(project_names(tmp_path / 'copy.db')) >= 20
+
+
+class TestBackupCommand:
+    """Test `flask backup`."""
+
+    def test_cli_writes_verified_backup(self, auth_client, runner, tmp_path):
+        """Test that the command reports integrity and writes a timestamped directory."""
+        auth_client.post('/api/projects', json={'name': 'Kept'})
+
+        result = runner.invoke(args=['backup', '--dest', str(tmp_path)])
+
+        assert result.exit_code == 0
+        assert 'integrity ok' in result.output
+        [directory] = os.listdir(tmp_path)
+        assert project_names(tmp_path / directory / 'todos.db') == ['Kept']
+
+
+class TestBackupEndpoint:
+    """Test POST /api/admin/backup."""
+
+    def test_requires_admin(self, app, auth_client):
+        """Test that users not in ADMIN_USERNAMES get a 403."""
+        response = auth_client.post('/api/admin/backup')
+
+        assert response.status_code == 403
+        assert response.get_json()['error'] == 'Admin access required'
+
+    def test_requires_login(self, client):
+        """Test that anonymous requests get a 401."""
+        assert client.post('/api/admin/backup').status_code == 401
+
+    def test_admin_backup(self, app, auth_client, tmp_path):
+        """Test that an admin can take a backup."""
+        app.config.update(ADMIN_USERNAMES=('testuser',), BACKUP_DIRECTORY=str(tmp_path))
+
+        response = auth_client.post('/api/admin/backup')
+
+        assert response.status_code == 201
+        [file] = response.get_json()['backup']['files']
+        assert file['name'] == 'todos.db'
+        assert os.path.exists(file['path'])
+
+    def test_one_backup_at_a_time(self, app, auth_client, tmp_path):
+        """Test that a second concurrent backup gets a 409."""
+        app.config.update(ADMIN_USERNAMES=('testuser',), BACKUP_DIRECTORY=str(tmp_path))
+
+        with backup_lock:
+            response = auth_client.post('/api/admin/backup')
+
+        assert response.status_code == 409
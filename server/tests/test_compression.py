@@ -0,0 +1,152 @@
+"""
+Tests for response compression and the rendered tree cache.
+"""
+import gzip
+import json
+import zlib
+
+from app import create_app
+from cache import CachedPayload, LRUCache, TreeCache
+from compression import choose_encoding
+from events import event_broker
+
+
+def create_large_project(auth_client, count=40):
+    """Create a project whose tree response is comfortably above the size threshold."""
+    project_id = auth_client.post('/api/projects', json={'name': 'Big'}).get_json()['project']['id']
+    content = '\n'.join(f'- [ ] Task number {i} with a reasonably long title' for i in range(count))
+    auth_client.post('/api/import', json={'project_id': project_id, 'format': 'markdown', 'content': content})
+    return project_id
+
+
+class TestCaches:
+    """Test the LRU and tree caches."""
+
+    def test_lru_eviction_and_stats(self):
+        """Test that the least recently used entry is evicted."""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'b' not in cache
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats()['evictions'] == 1
+        assert cache.stats()['hits'] == 2
+
+    def test_lru_ttl(self):
+        """Test that expired entries are not returned."""
+        cache = LRUCache(maxsize=2, ttl=-1)
+        cache.set('a', 1)
+
+        assert cache.get('a') is None
+
+    def test_tree_cache_invalidation(self):
+        """Test that invalidating a project hides its entries."""
+        cache = TreeCache()
+        generation = cache.generation(1)
+        cache.put(1, 'v', generation, CachedPayload(b'{}', 'application/json'))
+
+        assert cache.get(1, 'v') is not None
+        cache.invalidate(1)
+        assert cache.get(1, 'v') is None
+
+    def test_tree_cache_rejects_stale_put(self):
+        """Test that a payload rendered before an invalidation is not stored."""
+        cache = TreeCache()
+        generation = cache.generation(1)
+        cache.invalidate(1)
+
+        assert cache.put(1, 'v', generation, CachedPayload(b'{}', 'application/json')) is False
+        assert cache.get(1, 'v') is None
+
+    def test_tree_cache_generations_are_bounded(self):
+        """Test that forgotten projects keep none of their stale entries reachable."""
+        cache = TreeCache(max_projects=2)
+        cache.invalidate(1)
+        cache.put(1, 'v', cache.generation(1), CachedPayload(b'{}', 'application/json'))
+        cache.invalidate(2)
+        cache.invalidate(3)
+
+        assert len(cache._generations) == 2
+        assert cache.get(1, 'v') is None
+
+    def test_apps_share_one_broker_listener(self):
+        """Test that creating apps does not pile listeners onto the global broker."""
+        listeners = len(event_broker._listeners)
+        create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'SESSION_TYPE': 'memory'})
+
+        assert len(event_broker._listeners) == listeners
+
+
+class TestChooseEncoding:
+    """Test Accept-Encoding negotiation."""
+
+    def test_server_preference_order(self):
+        """Test that the first acceptable server encoding wins."""
+        assert choose_encoding('deflate, gzip', ['gzip', 'deflate']) == 'gzip'
+
+    def test_q_zero_excludes(self):
+        """Test that q=0 disables an encoding."""
+        assert choose_encoding('gzip;q=0, deflate', ['gzip', 'deflate']) == 'deflate'
+
+    def test_identity_only(self):
+        """Test that no acceptable encoding means no compression."""
+        assert choose_encoding('identity', ['gzip', 'deflate']) is None
+
+
+class TestResponseCompression:
+    """Test compression of API responses."""
+
+    def test_gzip_large_tree(self, auth_client):
+        """Test that a large tree is gzip-compressed when accepted."""
+        project_id = create_large_project(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        data = json.loads(gzip.decompress(response.data))
+        assert len(data['todos']) == 40
+
+    def test_deflate(self, app, auth_client):
+        """Test deflate when gzip is not offered."""
+        app.config['COMPRESS_ALGORITHMS'] = ('gzip', 'deflate')
+        project_id = create_large_project(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}', headers={'Accept-Encoding': 'deflate'})
+
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert len(json.loads(zlib.decompress(response.data))['todos']) == 40
+
+    def test_small_response_not_compressed(self, auth_client):
+        """Test that responses under the threshold are sent as-is."""
+        response = auth_client.get('/api/projects', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in response.headers
+
+    def test_compressed_bytes_cached_with_tree(self, app, auth_client):
+        """Test that a cached tree keeps its compressed encoding."""
+        project_id = create_large_project(auth_client)
+        headers = {'Accept-Encoding': 'gzip'}
+
+        first = auth_client.get(f'/api/todos/{project_id}', headers=headers)
+        second = auth_client.get(f'/api/todos/{project_id}', headers=headers)
+
+        tree_cache = app.extensions['tree_cache']
+        assert tree_cache.stats()['hits'] >= 1
+        assert first.data == second.data
+        (_, entry), = tree_cache._entries.items()
+        assert entry.encoded['gzip'] == second.data
+
+    def test_cache_invalidated_by_mutation(self, auth_client):
+        """Test that a write to the project is visible on the next read."""
+        project_id = create_large_project(auth_client, count=2)
+        auth_client.get(f'/api/todos/{project_id}')
+
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Fresh'})
+
+        titles = [todo['title'] for todo in auth_client.get(f'/api/todos/{project_id}').get_json()['todos']]
+        assert 'Fresh' in titles
@@ -0,0 +1,79 @@
+"""
+Tests for read/write connection routing.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+class TestReadRouting:
+    """Test that read-only endpoints use the read-only pool."""
+
+    def test_get_endpoints_use_reader(self, app, auth_client):
+        """Test that listed GET endpoints check out reader connections."""
+        reader = app.extensions['db_pools']['reader']
+        before = reader.checkouts
+
+        auth_client.get('/api/projects')
+        auth_client.get('/api/auth/current')
+
+        assert reader.checkouts > before
+
+    def test_mutations_use_writer(self, app, auth_client):
+        """Test that mutations never touch the reader pool."""
+        reader = app.extensions['db_pools']['reader']
+        writer = app.extensions['db_pools']['writer']
+        reads, writes = reader.checkouts, writer.checkouts
+
+        assert auth_client.post('/api/projects', json={'name': 'P'}).status_code == 201
+
+        assert reader.checkouts == reads
+        assert writer.checkouts > writes
+
+    def test_export_streams_from_reader(self, app, auth_client):
+        """Test that a streaming export holds no writer connection while it is read."""
+        app.config['EXPORT_BATCH_SIZE'] = 1
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        for i in range(5):
+            auth_client.post('/api/todos', json={'project_id': project_id, 'title': f'T{i}'})
+        writer = app.extensions['db_pools']['writer'].engine
+        # The fixture's app context holds one; requests would share its session
+        held = writer.pool.checkedout()
+
+        with app.app_context():
+            response = auth_client.get('/api/export', buffered=False)
+            chunks = iter(response.response)
+            next(chunks)
+
+            assert writer.pool.checkedout() == held
+            assert b'"title":"T4"' in b''.join(chunks)
+            response.close()
+
+    def test_reads_see_committed_writes(self, auth_client):
+        """Test that the reader sees data committed through the writer."""
+        auth_client.post('/api/projects', json={'name': 'Fresh'})
+
+        names = [p['name'] for p in auth_client.get('/api/projects').get_json()['projects']]
+
+        assert 'Fresh' in names
+
+    def test_reader_is_read_only(self, app):
+        """Test that the reader engine refuses writes."""
+        with app.extensions['read_engine'].connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("INSERT INTO sync_state (name, value) VALUES ('x', 1)"))
+
+    def test_wal_enabled(self, app):
+        """Test that the writer runs the database in WAL mode."""
+        assert db.session.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+    def test_pool_stats(self, app, auth_client):
+        """Test that both pools report their own metrics."""
+        auth_client.get('/api/projects')
+        pools = app.extensions['db_pools']
+
+        assert pools['writer'].stats()['pool_size'] == app.config['WRITE_POOL_SIZE']
+        assert pools['reader'].stats()['pool_size'] == app.config['READ_POOL_SIZE']
+        assert pools['reader'].stats()['checkouts'] >= 1
@@ -0,0 +1,123 @@
+"""
+Tests for the per-project Server-Sent Events change stream.
+"""
+import json
+
+from werkzeug.test import EnvironBuilder
+
+from events import EventBroker, event_broker
+
+
+def read_event(chunks):
+    """Return (event_type, data) for the next non-heartbeat SSE message."""
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith(':') or text.startswith('retry:'):
+            continue
+        fields = dict(line.split(': ', 1) for line in text.strip().splitlines())
+        return fields['event'], json.loads(fields['data'])
+    raise AssertionError('Stream ended without an event')
+
+
+class TestEventBroker:
+    """Test the in-process broker."""
+
+    def test_publish_reaches_subscribers_of_project(self):
+        """Test that events only go to subscribers of the same project."""
+        broker = EventBroker()
+        mine = broker.subscribe(1)
+        other = broker.subscribe(2)
+
+        broker.publish(1, 'created', {'id': 10})
+
+        assert mine.get(timeout=0)[1:] == ('created', {'id': 10})
+        assert other.queue.empty()
+
+    def test_full_queue_marks_overflow(self):
+        """Test that a slow subscriber is marked as overflowed instead of blocking."""
+        broker = EventBroker()
+        subscription = broker.subscribe(1, maxsize=1)
+
+        broker.publish(1, 'created', {'id': 1})
+        broker.publish(1, 'created', {'id': 2})
+
+        assert subscription.overflowed
+        assert subscription.queue.qsize() == 1
+
+    def test_unsubscribe(self):
+        """Test that unsubscribing removes the subscription."""
+        broker = EventBroker()
+        subscription = broker.subscribe(1)
+        broker.unsubscribe(subscription)
+
+        assert broker.subscriber_count() == 0
+
+    def test_failing_listener_does_not_stop_delivery(self):
+        """Test that a listener error is logged and subscribers still get the event."""
+        broker = EventBroker()
+        subscription = broker.subscribe(1)
+        seen = []
+
+        def broken(project_id, event_type, payload):
+            raise RuntimeError('listener failed')
+
+        broker.add_listener(broken)
+        broker.add_listener(lambda project_id, event_type, payload: seen.append(event_type))
+        broker.publish(1, 'created', {'id': 10})
+
+        assert seen == ['created']
+        assert subscription.get(timeout=0)[1] == 'created'
+
+
+class TestProjectEvents:
+    """Test GET /api/projects/<id>/events."""
+
+    def test_stream_receives_mutations(self, app, auth_client):
+        """Test that created, updated and deleted todos are streamed."""
+        app.config['SSE_HEARTBEAT_SECONDS'] = 0.05
+        project_id = auth_client.post('/api/projects', json={'name': 'Live'}).get_json()['project']['id']
+
+        response = auth_client.get(f'/api/projects/{project_id}/events', buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+
+        todo = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Streamed'}).get_json()['todo']
+        assert read_event(chunks) == ('created', todo)
+
+        auth_client.put(f'/api/todos/{todo["id"]}', json={'title': 'Renamed'})
+        event_type, data = read_event(chunks)
+        assert event_type == 'updated'
+        assert data['title'] == 'Renamed'
+
+        auth_client.delete(f'/api/todos/{todo["id"]}')
+        assert read_event(chunks) == ('deleted', {'id': todo['id'], 'list_id': project_id, 'parent_id': None})
+
+        response.close()
+
+    def test_unread_stream_unsubscribes_on_close(self, app, auth_client):
+        """Test that closing a stream that was never iterated drops its subscription."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Live'}).get_json()['project']['id']
+        before = event_broker.subscriber_count()
+        # Call the WSGI app directly: the test client would start the generator itself
+        environ = EnvironBuilder(
+            path=f'/api/projects/{project_id}/events',
+            headers={'Cookie': f"todo_session={auth_client.get_cookie('todo_session').value}"},
+        ).get_environ()
+
+        body = app.wsgi_app(environ, lambda status, headers: None)
+        assert event_broker.subscriber_count() == before + 1
+
+        body.close()
+        assert event_broker.subscriber_count() == before
+
+    def test_stream_forbidden_for_other_user(self, client):
+        """Test that another user's project cannot be watched."""
+        client.post('/api/auth/register', json={'username': 'owner', 'email': 'owner@example.com', 'password': 'password123'})
+        project_id = client.post('/api/projects', json={'name': 'Private'}).get_json()['project']['id']
+        client.post('/api/auth/logout')
+        client.post('/api/auth/register', json={'username': 'other', 'email': 'other@example.com', 'password': 'password123'})
+
+        response = client.get(f'/api/projects/{project_id}/events')
+
+        assert response.status_code == 403
@@ -0,0 +1,49 @@
+"""
+Tests for the NDJSON data export endpoint.
+"""
+import json
+
+
+class TestExport:
+    """Test streaming export of a user's projects and todos."""
+
+    def test_export_parent_before_child(self, auth_client):
+        """Test that every project and todo is exported with parents first."""
+        project1 = auth_client.post('/api/projects', json={'name': 'Project 1'}).get_json()['project']
+        project2 = auth_client.post('/api/projects', json={'name': 'Project 2'}).get_json()['project']
+
+        parent = auth_client.post('/api/todos', json={'project_id': project1['id'], 'title': 'Parent'}).get_json()['todo']
+        child = auth_client.post('/api/todos', json={'project_id': project1['id'], 'title': 'Child', 'parent_id': parent['id']}).get_json()['todo']
+        other = auth_client.post('/api/todos', json={'project_id': project2['id'], 'title': 'Other'}).get_json()['todo']
+
+        # Move the parent under a todo created later to make id order differ from depth order
+        grandparent = auth_client.post('/api/todos', json={'project_id': project1['id'], 'title': 'Later root'}).get_json()['todo']
+        auth_client.post(f'/api/todos/{parent["id"]}/reparent', json={'new_parent_id': grandparent['id'], 'new_order': 0})
+
+        response = auth_client.get('/api/export')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        keys = [(record['type'], record['id']) for record in records]
+        assert keys[0] == ('project', project1['id'])
+        assert keys.index(('todo', grandparent['id'])) < keys.index(('todo', parent['id'])) < keys.index(('todo', child['id']))
+        assert keys.index(('project', project2['id'])) < keys.index(('todo', other['id']))
+        assert len(records) == 6
+
+    def test_export_only_own_data(self, client):
+        """Test that another user's data is not exported."""
+        client.post('/api/auth/register', json={'username': 'owner', 'email': 'owner@example.com', 'password': 'password123'})
+        client.post('/api/projects', json={'name': 'Private'})
+        client.post('/api/auth/logout')
+
+        client.post('/api/auth/register', json={'username': 'other', 'email': 'other@example.com', 'password': 'password123'})
+        response = client.get('/api/export')
+
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == ''
+
+    def test_export_unauthenticated(self, client):
+        """Test export when not authenticated."""
+        response = client.get('/api/export')
+        assert response.status_code == 401
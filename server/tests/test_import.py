@@ -0,0 +1,138 @@
+"""
+Tests for bulk import of Markdown checklists and CSV files.
+"""
+import io
+
+from importers import parse_csv, parse_markdown_checklist
+
+
+MARKDOWN = """# Launch plan
+
+- [ ] Write docs
+  - [x] API reference
+  - [ ] Tutorial
+    - [ ] Screenshots
+- [x] Ship it
+"""
+
+
+class TestParsers:
+    """Test the import parsers directly."""
+
+    def test_markdown_nesting(self):
+        """Test that indentation maps to depth and parent."""
+        items = parse_markdown_checklist(MARKDOWN)
+
+        assert [item['title'] for item in items] == ['Write docs', 'API reference', 'Tutorial', 'Screenshots', 'Ship it']
+        assert [item['depth'] for item in items] == [0, 1, 1, 2, 0]
+        assert [item['parent_index'] for item in items] == [None, 0, 0, 2, None]
+        assert items[1]['completed'] is True
+        assert items[4]['completed'] is True
+
+    def test_markdown_depth_limit(self):
+        """Test that a fourth nesting level is rejected."""
+        text = "- a\n  - b\n    - c\n      - d\n"
+
+        try:
+            parse_markdown_checklist(text)
+            assert False, 'Expected ValueError'
+        except ValueError as e:
+            assert 'Line 4' in str(e)
+
+    def test_csv_parent_references(self):
+        """Test that CSV parent_id columns resolve to earlier rows."""
+        text = "id,parent_id,title,priority,completed\n1,,Root,high,\n2,1,Child,low,yes\n3,2,Grandchild,,\n"
+
+        items = parse_csv(text)
+
+        assert [item['depth'] for item in items] == [0, 1, 2]
+        assert [item['parent_index'] for item in items] == [None, 0, 1]
+        assert items[0]['priority'] == 'high'
+        assert items[1]['completed'] is True
+
+    def test_csv_unknown_parent(self):
+        """Test that a reference to a missing parent is rejected."""
+        try:
+            parse_csv("id,parent_id,title\n1,9,Orphan\n")
+            assert False, 'Expected ValueError'
+        except ValueError as e:
+            assert 'not found' in str(e)
+
+
+class TestImportEndpoint:
+    """Test POST /api/import."""
+
+    def test_import_markdown(self, auth_client):
+        """Test importing a nested checklist into a project."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Import Project'}).get_json()['project']['id']
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Existing'})
+
+        response = auth_client.post('/api/import', json={
+            'project_id': project_id,
+            'format': 'markdown',
+            'content': MARKDOWN
+        })
+
+        assert response.status_code == 201
+        data = response.get_json()
+        assert data['created'] == 5
+        assert len(data['todo_ids']) == 5
+
+        todos = auth_client.get(f'/api/todos/{project_id}?sort=order_index').get_json()['todos']
+        assert [todo['title'] for todo in todos] == ['Existing', 'Write docs', 'Ship it']
+        tutorial = todos[1]['children'][1]
+        assert tutorial['id'] == data['todo_ids'][2]
+        assert tutorial['children'][0]['title'] == 'Screenshots'
+        assert tutorial['children'][0]['depth'] == 2
+
+    def test_import_csv_upload(self, auth_client):
+        """Test importing a CSV file sent as a multipart upload."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Import Project'}).get_json()['project']['id']
+        csv_file = (io.BytesIO(b"id,parent_id,title\na,,Parent\nb,a,Child\n"), 'todos.csv')
+
+        response = auth_client.post('/api/import', data={
+            'project_id': str(project_id),
+            'format': 'csv',
+            'file': csv_file
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 201
+        todos = auth_client.get(f'/api/todos/{project_id}').get_json()['todos']
+        assert todos[0]['children'][0]['title'] == 'Child'
+
+    def test_import_parse_error_creates_nothing(self, auth_client):
+        """Test that a parse error rejects the whole import."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Import Project'}).get_json()['project']['id']
+
+        response = auth_client.post('/api/import', json={
+            'project_id': project_id,
+            'format': 'markdown',
+            'content': "- a\n  - b\n    - c\n      - d\n"
+        })
+
+        assert response.status_code == 400
+        assert auth_client.get(f'/api/todos/{project_id}').get_json()['todos'] == []
+
+    def test_import_non_string_content(self, auth_client):
+        """Test that JSON content other than a string is a 400, not a crash."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Import Project'}).get_json()['project']['id']
+
+        response = auth_client.post('/api/import', json={
+            'project_id': project_id,
+            'format': 'markdown',
+            'content': ['- a']
+        })
+
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'content must be a string'
+
+    def test_import_other_users_project(self, client):
+        """Test importing into a project owned by someone else."""
+        client.post('/api/auth/register', json={'username': 'owner', 'email': 'owner@example.com', 'password': 'password123'})
+        project_id = client.post('/api/projects', json={'name': 'Private'}).get_json()['project']['id']
+        client.post('/api/auth/logout')
+        client.post('/api/auth/register', json={'username': 'other', 'email': 'other@example.com', 'password': 'password123'})
+
+        response = client.post('/api/import', json={'project_id': project_id, 'format': 'csv', 'content': 'title\nX\n'})
+
+        assert response.status_code == 403
@@ -0,0 +1,134 @@
+"""
+Tests for the cross-process cache invalidation bus.
+"""
+import time
+
+import pytest
+
+from app import create_app
+from models import db, CacheInvalidation
+
+
+def make_worker(db_path, **config):
+    """An app standing in for one worker process on the shared database."""
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'SECRET_KEY': 'test-secret-key',
+        'SESSION_TYPE': 'memory',
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'INVALIDATION_BUS_ENABLED': True,
+        'INVALIDATION_POLL_INTERVAL': 0.01,
+        **config,
+    })
+
+
+def wait_for(predicate, timeout=2):
+    """Poll predicate until it is true or timeout seconds pass."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two apps sharing one database file, each logged in as the same user."""
+    apps = [make_worker(tmp_path / 'todos.db') for _ in range(2)]
+    apps[0].test_client().post('/api/auth/register', json={
+        'username': 'testuser', 'email': 'test@example.com', 'password': 'testpass123',
+    })
+    clients = []
+    for app in apps:
+        client = app.test_client()
+        client.post('/api/auth/login', json={'username': 'testuser', 'password': 'testpass123'})
+        clients.append(client)
+
+    yield apps, clients
+
+    for app in apps:
+        app.extensions['invalidation_bus'].stop()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+class TestInvalidationBus:
+    """Test that writes in one worker drop the other worker's caches."""
+
+    def test_disabled_by_default(self, app):
+        """Test that a single-process app does not start the bus."""
+        assert 'invalidation_bus' not in app.extensions
+
+    def test_project_change_drops_other_workers_tree(self, workers):
+        """Test that a todo created in one worker is visible through the other's cache."""
+        (_, second), (writer, reader) = workers
+        project_id = writer.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        writer.post('/api/todos', json={'project_id': project_id, 'title': 'One'})
+        assert len(reader.get(f'/api/todos/{project_id}').get_json()['todos']) == 1
+
+        writer.post('/api/todos', json={'project_id': project_id, 'title': 'Two'})
+
+        assert wait_for(lambda: len(reader.get(f'/api/todos/{project_id}').get_json()['todos']) == 2)
+        assert second.extensions['invalidation_bus'].stats()['applied'] >= 1
+
+    def test_user_change_drops_other_workers_record(self, workers):
+        """Test that a password change evicts the user from the other worker's cache."""
+        (_, second), (writer, reader) = workers
+        user_id = reader.get('/api/auth/current').get_json()['user']['id']
+        user_cache = second.extensions['user_cache']
+        assert user_id in user_cache
+
+        writer.post('/api/auth/change-password', json={
+            'current_password': 'testpass123', 'new_password': 'newpass456',
+        })
+
+        assert wait_for(lambda: user_id not in user_cache)
+
+    def test_own_invalidations_are_skipped(self, workers):
+        """Test that a worker does not re-apply the rows it published."""
+        (first, second), _ = workers
+        mine, theirs = first.extensions['invalidation_bus'], second.extensions['invalidation_bus']
+        applied = mine.stats()['applied']
+
+        mine.publish('project', [1, 2])
+
+        assert wait_for(lambda: theirs.stats()['applied'] >= 2)
+        assert mine.poll() == 0
+        assert mine.stats()['applied'] == applied
+
+    def test_publish_is_written_by_the_bus(self, tmp_path):
+        """Test that publishing only queues keys and a flush writes them in one go."""
+        app = make_worker(tmp_path / 'todos.db', INVALIDATION_POLL_INTERVAL=60)
+        bus = app.extensions['invalidation_bus']
+        try:
+            bus.publish('project', [1, 2])
+            bus.publish('project', [2])
+            with app.app_context():
+                assert db.session.query(CacheInvalidation).count() == 0
+            assert bus.stats()['pending'] == 2
+
+            assert bus.flush() == 2
+            with app.app_context():
+                assert sorted(row.key for row in db.session.query(CacheInvalidation)) == [1, 2]
+        finally:
+            bus.stop()
+
+    def test_old_rows_are_pruned(self, tmp_path):
+        """Test that publishing deletes rows older than INVALIDATION_RETENTION."""
+        app = make_worker(tmp_path / 'todos.db', INVALIDATION_RETENTION=0)
+        bus = app.extensions['invalidation_bus']
+        try:
+            bus.publish('project', [1])
+            bus.flush()
+            time.sleep(0.01)
+            bus.publish('project', [2])
+            bus.flush()
+
+            with app.app_context():
+                keys = [row.key for row in db.session.query(CacheInvalidation)]
+            assert keys == [2]
+        finally:
+            bus.stop()
@@ -0,0 +1,98 @@
+"""
+Tests for structured logging and request correlation ids.
+"""
+import json
+import logging
+import queue
+
+from logconfig import JSONFormatter, RequestQueueHandler, get_logger
+
+
+def capture(app, path='/health', headers=None, level='DEBUG'):
+    """Send one request with a private queue handler attached; return (response, records)."""
+    log_queue = queue.Queue()
+    handler = RequestQueueHandler(log_queue)
+    root = logging.getLogger('todo')
+    root.addHandler(handler)
+    root.setLevel(level)
+    try:
+        response = app.test_client().get(path, headers=headers or {})
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(app.config['LOG_LEVEL'])
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait())
+    return response, records
+
+
+class TestRequestIds:
+    """Test correlation id handling."""
+
+    def test_generated_request_id(self, client):
+        """Test that every response carries a generated X-Request-ID."""
+        response = client.get('/health')
+
+        assert len(response.headers['X-Request-ID']) == 16
+
+    def test_incoming_request_id_echoed(self, client):
+        """Test that a well-formed incoming id is reused."""
+        response = client.get('/health', headers={'X-Request-ID': 'abc-123'})
+
+        assert response.headers['X-Request-ID'] == 'abc-123'
+
+    def test_malformed_request_id_replaced(self, client):
+        """Test that an unsafe incoming id is replaced."""
+        response = client.get('/health', headers={'X-Request-ID': 'bad id; with spaces'})
+
+        assert response.headers['X-Request-ID'] != 'bad id; with spaces'
+
+    def test_records_tagged_with_request_id(self, app):
+        """Test that log records carry the request's correlation id."""
+        response, records = capture(app, headers={'X-Request-ID': 'req-42'})
+
+        assert response.status_code == 200
+        assert records
+        assert all(record.request_id == 'req-42' for record in records)
+
+
+class TestLogOutput:
+    """Test log levels and formatting."""
+
+    def test_debug_off_by_default(self, app):
+        """Test that the default level suppresses debug records."""
+        assert app.config['LOG_LEVEL'] == 'INFO'
+        assert not get_logger('auth').isEnabledFor(logging.DEBUG)
+
+    def test_auth_check_does_not_print(self, auth_client, capsys):
+        """Test that auth checks no longer write session data to stdout."""
+        auth_client.get('/api/auth/current')
+
+        assert capsys.readouterr().out == ''
+
+    def test_json_formatter(self):
+        """Test that records render as JSON with extra fields."""
+        record = logging.LogRecord('todo.test', logging.INFO, __file__, 1, 'hello %s', ('world',), None)
+        record.fields = {'user_id': 7}
+        record.request_id = 'r1'
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert entry['message'] == 'hello world'
+        assert entry['level'] == 'INFO'
+        assert entry['request_id'] == 'r1'
+        assert entry['user_id'] == 7
+
+    def test_full_queue_drops(self):
+        """Test that a full log queue drops records instead of blocking."""
+        handler = RequestQueueHandler(queue.Queue(maxsize=1))
+        logger = logging.getLogger('todo.test_full_queue')
+        logger.addHandler(handler)
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        logger.info('one')
+        logger.info('two')
+
+        assert handler.dropped == 1
+        logger.removeHandler(handler)
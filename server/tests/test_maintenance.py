@@ -0,0 +1,91 @@
+"""
+Tests for scheduled database maintenance.
+"""
+import sqlite3
+import time
+
+from sqlalchemy import event
+
+from dbrouting import sqlite_file_path
+from maintenance import MaintenanceScheduler, _run_step, maintain_database
+from models import db, TodoList, TodoItem
+
+
+def churn(user_id):
+    """Insert and delete enough todos to leave free pages behind."""
+    project = TodoList(name='Churn', user_id=user_id)
+    db.session.add(project)
+    db.session.flush()
+    db.session.add_all([
+        TodoItem(title=f'Task {i}', description='x' * 500, list_id=project.id, user_id=user_id)
+        for i in range(500)
+    ])
+    db.session.commit()
+    db.session.query(TodoItem).delete()
+    db.session.commit()
+
+
+class TestMaintenance:
+    """Test the maintenance steps and how runs are recorded."""
+
+    def test_cli_frees_pages_and_checks(self, app, runner, sample_user):
+        """Test that `flask maintenance` vacuums free pages and passes quick_check."""
+        churn(sample_user)
+
+        result = runner.invoke(args=['maintenance'])
+
+        assert result.exit_code == 0
+        assert 'quick_check ok' in result.output
+        report = app.test_client().get('/ready').get_json()['maintenance']['databases']['todos.db']
+        assert report['auto_vacuum'] == 'incremental'
+        assert report['freelist_before'] > 0
+        assert report['freelist_after'] == 0
+        assert report['page_count_after'] < report['page_count']
+
+    def test_ready_without_runs(self, client):
+        """Test that /ready reports no maintenance before the first run."""
+        assert client.get('/ready').get_json()['maintenance'] is None
+
+    def test_health_does_not_query(self, app, client):
+        """Test that the liveness check stays up whatever state the database is in."""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get('/health')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert response.get_json() == {'status': 'healthy'}
+        assert statements == []
+
+    def test_expired_budget_skips_steps(self, app):
+        """Test that nothing runs once the deadline has passed."""
+        report = maintain_database(sqlite_file_path(str(db.engine.url)), time.monotonic())
+
+        assert {report[step]['status'] for step in ('optimize', 'vacuum', 'quick_check')} == {'skipped'}
+
+    def test_long_step_is_interrupted(self):
+        """Test that a statement still running at the deadline reports a timeout."""
+        conn = sqlite3.connect(':memory:')
+        slow = 'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n'
+
+        step, rows = _run_step(conn, slow, time.monotonic() + 0.05)
+
+        assert step['status'] == 'timeout'
+        assert rows is None
+        assert step['seconds'] < 1
+
+
+class TestMaintenanceScheduler:
+    """Test the optional maintenance timer."""
+
+    def test_runs_once_per_interval(self, app):
+        """Test that a run is skipped while a recent one exists."""
+        scheduler = MaintenanceScheduler(app, interval=3600)
+
+        assert scheduler.run_if_due() is not None
+        assert scheduler.run_if_due() is None
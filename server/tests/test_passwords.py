@@ -0,0 +1,86 @@
+"""
+Tests for bounded password hashing and hash upgrades.
+"""
+from models import db, User
+from passwords import HasherBusy, PasswordHasher, canonical_method
+
+
+class TestPasswordHasher:
+    """Test the hasher directly."""
+
+    def test_canonical_method(self):
+        """Test that partial methods expand to the stored prefix."""
+        assert canonical_method('scrypt') == 'scrypt:32768:8:1'
+        assert canonical_method('scrypt:16384') == 'scrypt:16384:8:1'
+        assert canonical_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+        assert canonical_method('pbkdf2').startswith('pbkdf2:sha256:')
+
+    def test_hash_and_verify(self):
+        """Test that hashes round-trip and are counted."""
+        hasher = PasswordHasher('pbkdf2:sha256:1000', workers=2)
+        password_hash = hasher.hash('secret1')
+
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hash, 'secret1') is True
+        assert hasher.verify(password_hash, 'wrong') is False
+        assert hasher.needs_rehash(password_hash) is False
+        assert hasher.stats()['completed'] == 3
+        assert hasher.stats()['queue_depth'] == 0
+        hasher.shutdown()
+
+    def test_needs_rehash_on_cost_change(self):
+        """Test that a hash with a different cost is flagged."""
+        old = PasswordHasher('pbkdf2:sha256:1000', workers=1)
+        new = PasswordHasher('pbkdf2:sha256:2000', workers=1)
+
+        assert new.needs_rehash(old.hash('secret1')) is True
+        old.shutdown()
+        new.shutdown()
+
+    def test_full_queue_raises_busy(self):
+        """Test that HasherBusy is raised when no slot frees up in time."""
+        hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_queue=0, queue_timeout=0.01)
+        hasher._slots.acquire()
+
+        try:
+            hasher.hash('secret1')
+            assert False, 'expected HasherBusy'
+        except HasherBusy:
+            pass
+        assert hasher.stats()['rejected'] == 1
+        hasher._slots.release()
+        hasher.shutdown()
+
+
+class TestHashUpgrade:
+    """Test hash handling through the auth routes."""
+
+    def test_login_upgrades_outdated_hash(self, app, client):
+        """Test that logging in rehashes a password stored with old parameters."""
+        client.post('/api/auth/register', json={
+            'username': 'olduser', 'email': 'old@example.com', 'password': 'password123'
+        })
+        client.post('/api/auth/logout')
+
+        app.extensions['password_hasher'] = PasswordHasher('pbkdf2:sha256:2000', workers=1)
+        response = client.post('/api/auth/login', json={'username': 'olduser', 'password': 'password123'})
+
+        assert response.status_code == 200
+        user = db.session.execute(db.select(User).filter_by(username='olduser')).scalar_one()
+        db.session.refresh(user)
+        assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+        assert user.check_password('password123')
+
+    def test_busy_hasher_returns_503(self, app, client):
+        """Test that a saturated hash queue is reported as 503 with Retry-After."""
+        app.extensions['password_hasher'] = PasswordHasher(
+            'pbkdf2:sha256:1000', workers=1, max_queue=0, queue_timeout=0.01
+        )
+        app.extensions['password_hasher']._slots.acquire()
+
+        response = client.post('/api/auth/register', json={
+            'username': 'busyuser', 'email': 'busy@example.com', 'password': 'password123'
+        })
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
@@ -226,3 +226,35 @@ class TestDeleteProject:
         # Verify todos are also deleted
         todos_response = auth_client.get(f'/api/todos/{project_id}')
         assert todos_response.status_code == 404
+
+
+class TestProjectFieldsets:
+    """Test fields= and return=minimal on project endpoints."""
+
+    def test_get_projects_with_fields(self, auth_client):
+        """Test projecting the project list onto a few fields."""
+        auth_client.post('/api/projects', json={'name': 'Project'})
+
+        response = auth_client.get('/api/projects?fields=name')
+
+        assert response.status_code == 200
+        assert set(response.get_json()['projects'][0]) == {'id', 'name'}
+
+    def test_get_projects_unknown_field(self, auth_client):
+        """Test that unknown fields are rejected."""
+        response = auth_client.get('/api/projects?fields=password_hash')
+
+        assert response.status_code == 400
+
+    def test_update_project_return_minimal(self, auth_client):
+        """Test that return=minimal only echoes the changed columns."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Old'}).get_json()['project']['id']
+
+        response = auth_client.put(f'/api/projects/{project_id}?return=minimal', json={'name': 'New'})
+
+        assert response.status_code == 200
+        assert response.get_json()['project'] == {
+            'id': project_id,
+            'name': 'New',
+            'change_seq': response.get_json()['project']['change_seq']
+        }
@@ -0,0 +1,95 @@
+"""
+Tests for rate limiting and load shedding.
+"""
+from ratelimit import ConcurrencyLimiter, RateLimiter
+
+
+class TestTokenBuckets:
+    """Test the token bucket limiter directly."""
+
+    def test_burst_then_reject(self):
+        """Test that a bucket allows its burst and then asks the caller to wait."""
+        limiter = RateLimiter()
+        results = [limiter.acquire('k', 1.0, 3) for _ in range(4)]
+
+        assert [allowed for allowed, _ in results] == [True, True, True, False]
+        assert 0 < results[-1][1] <= 1.0
+        assert limiter.rejected == 1
+
+    def test_keys_are_independent(self):
+        """Test that one caller's empty bucket does not affect another."""
+        limiter = RateLimiter()
+        limiter.acquire('a', 1.0, 1)
+
+        assert limiter.acquire('a', 1.0, 1)[0] is False
+        assert limiter.acquire('b', 1.0, 1)[0] is True
+
+    def test_prune_drops_refilled_buckets(self):
+        """Test that buckets that have refilled are pruned."""
+        limiter = RateLimiter()
+        limiter.acquire('a', 1000.0, 1)
+        limiter.prune(now=float('inf'))
+
+        assert len(limiter) == 0
+
+    def test_concurrency_limiter(self):
+        """Test that the in-flight ceiling is enforced."""
+        limiter = ConcurrencyLimiter()
+
+        assert limiter.try_enter(1) is True
+        assert limiter.try_enter(1) is False
+        limiter.leave()
+        assert limiter.try_enter(1) is True
+        assert limiter.shed == 1
+
+
+class TestRateLimitedRoutes:
+    """Test rate limiting through the API."""
+
+    def test_reads_limited_per_user(self, app, auth_client):
+        """Test that exceeding the read budget returns 429 with Retry-After."""
+        app.config['RATELIMITS'] = {**app.config['RATELIMITS'], 'read': (0.001, 2)}
+
+        assert auth_client.get('/api/projects').status_code == 200
+        assert auth_client.get('/api/projects').status_code == 200
+        response = auth_client.get('/api/projects')
+
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert 'error' in response.get_json()
+
+    def test_writes_have_separate_budget(self, app, auth_client):
+        """Test that exhausting reads does not block writes."""
+        app.config['RATELIMITS'] = {**app.config['RATELIMITS'], 'read': (0.001, 1)}
+        auth_client.get('/api/projects')
+
+        assert auth_client.get('/api/projects').status_code == 429
+        assert auth_client.post('/api/projects', json={'name': 'P'}).status_code == 201
+
+    def test_health_not_limited(self, app, client):
+        """Test that non-API routes are never limited."""
+        app.config['MAX_IN_FLIGHT'] = 0
+        app.config['RATELIMITS'] = {'read': (0.001, 0), 'write': (0.001, 0), 'auth': (0.001, 0)}
+
+        assert client.get('/health').status_code == 200
+
+    def test_load_shedding(self, app, auth_client):
+        """Test that requests beyond MAX_IN_FLIGHT are shed with 503."""
+        app.config['MAX_IN_FLIGHT'] = 0
+        response = auth_client.get('/api/projects')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    def test_in_flight_released(self, app, auth_client):
+        """Test that finished requests no longer count as in flight."""
+        auth_client.get('/api/projects')
+
+        assert app.extensions['concurrency_limiter'].in_flight == 0
+
+    def test_disabled(self, app, auth_client):
+        """Test that RATELIMIT_ENABLED = False turns limiting off."""
+        app.config['RATELIMIT_ENABLED'] = False
+        app.config['MAX_IN_FLIGHT'] = 0
+
+        assert auth_client.get('/api/projects').status_code == 200
@@ -0,0 +1,53 @@
+"""
+Tests for the /ready endpoint.
+"""
+from sqlalchemy import create_engine
+
+
+class TestReadiness:
+    """Test GET /ready."""
+
+    def test_ready_report(self, app, client):
+        """Test that a healthy node reports 200 with its statistics."""
+        response = client.get('/ready')
+
+        assert response.status_code == 200
+        report = response.get_json()
+        assert report['status'] == 'ready'
+        assert set(report['database']) == {'writer', 'reader'}
+        assert report['database']['writer']['latency_ms'] >= 0
+        assert report['pools']['writer']['checkouts'] >= 1
+        assert 'todos.db' in report['wal_bytes']
+        assert set(report['caches']) == {'tree_cache', 'user_cache'}
+        assert 'ui_state_buffer' in report['queues']
+        assert report['in_flight']['limit'] == app.config['MAX_IN_FLIGHT']
+
+    def test_cache_hit_rates(self, app, auth_client):
+        """Test that cache hits from earlier requests show up in the report."""
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        auth_client.get(f'/api/todos/{project_id}')
+        auth_client.get(f'/api/todos/{project_id}')
+
+        caches = auth_client.get('/ready').get_json()['caches']
+
+        assert caches['tree_cache']['hits'] >= 1
+        assert caches['tree_cache']['hit_rate'] > 0
+
+    def test_slow_database_returns_503(self, app, client):
+        """Test that latency over READY_MAX_DB_LATENCY_MS takes the node out of rotation."""
+        app.config['READY_MAX_DB_LATENCY_MS'] = -1
+
+        response = client.get('/ready')
+
+        assert response.status_code == 503
+        assert response.get_json()['status'] == 'degraded'
+
+    def test_database_error_returns_503(self, client, monkeypatch):
+        """Test that a failing query is reported with its error."""
+        broken = create_engine('sqlite:///file:/nonexistent/todos.db?mode=ro&uri=true')
+        monkeypatch.setitem(client.application.extensions, 'read_engine', broken)
+
+        response = client.get('/ready')
+
+        assert response.status_code == 503
+        assert 'error' in response.get_json()['database']['reader']
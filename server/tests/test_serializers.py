@@ -0,0 +1,40 @@
+"""
+Tests for the ORM-free row serializers.
+"""
+from datetime import datetime
+
+from models import db, TodoItem
+from serializers import build_todo_tree, load_todo_rows, row_serializer, TODO_FIELDS
+
+
+class TestRowSerializers:
+    """Test that the row path produces the same output as the ORM path."""
+
+    def test_rows_match_to_dict(self, app, sample_todo):
+        """Test that a row serializes exactly like TodoItem.to_dict()."""
+        todo = db.session.get(TodoItem, sample_todo)
+
+        rows = load_todo_rows(TodoItem.id == sample_todo)
+
+        assert row_serializer(TODO_FIELDS)(rows[0]) == todo.to_dict()
+
+    def test_whole_second_timestamp(self, app, sample_todo):
+        """Test that a timestamp without microseconds matches isoformat()."""
+        todo = db.session.get(TodoItem, sample_todo)
+        todo.created_at = datetime(2024, 1, 2, 3, 4, 5)
+        db.session.commit()
+
+        rows = load_todo_rows(TodoItem.id == sample_todo)
+
+        assert row_serializer(TODO_FIELDS, ('created_at',))(rows[0]) == {'created_at': '2024-01-02T03:04:05'}
+
+    def test_tree_matches_nested_to_dict(self, app, sample_project, sample_user, sample_todo):
+        """Test that the row tree equals to_dict(include_children=True)."""
+        child = TodoItem(title='Child', list_id=sample_project, user_id=sample_user, parent_id=sample_todo, depth=1)
+        db.session.add(child)
+        db.session.commit()
+        parent = db.session.get(TodoItem, sample_todo)
+
+        tree = build_todo_tree(load_todo_rows(TodoItem.list_id == sample_project, order_by=(TodoItem.id,)))
+
+        assert tree == [parent.to_dict(include_children=True)]
@@ -0,0 +1,149 @@
+"""
+Tests for server-side sessions.
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+from app import create_app
+from sessions import MemorySessionStore, SQLiteSessionStore, ServerSideSessionInterface
+
+
+def session_cookie(client):
+    """Value of the session cookie held by the test client."""
+    cookie = client.get_cookie('todo_session')
+    return cookie.value if cookie else None
+
+
+class TestMemorySessions:
+    """Test sessions through the in-memory store used by the test app."""
+
+    def test_cookie_holds_only_id(self, app, auth_client):
+        """Test that the cookie is a short id and the data is stored server-side."""
+        sid = session_cookie(auth_client)
+
+        assert sid is not None
+        assert len(sid) == 32
+        assert isinstance(app.session_interface, ServerSideSessionInterface)
+        assert app.session_interface.store.get(sid) is not None
+
+    def test_logout_deletes_session(self, app, auth_client):
+        """Test that logging out removes the stored session."""
+        sid = session_cookie(auth_client)
+        auth_client.post('/api/auth/logout')
+
+        assert app.session_interface.store.get(sid) is None
+        assert auth_client.get('/api/projects').status_code == 401
+
+    def test_unknown_id_is_anonymous(self, client):
+        """Test that a forged or expired id gives an empty session."""
+        client.set_cookie('todo_session', 'not-a-real-session')
+
+        assert client.get('/api/auth/current').status_code == 401
+
+    def test_reads_do_not_rewrite_session(self, app, auth_client):
+        """Test that an unmodified, fresh session is not written again."""
+        store = app.session_interface.store
+        sid = session_cookie(auth_client)
+        expires_at = store.get(sid)[1]
+
+        auth_client.get('/api/projects')
+
+        assert store.get(sid)[1] == expires_at
+
+    def test_login_issues_new_session_id(self, app, auth_client):
+        """Test that logging in moves the session to a new id and drops the old one."""
+        store = app.session_interface.store
+        old_sid = session_cookie(auth_client)
+
+        response = auth_client.post('/api/auth/login', json={'username': 'testuser', 'password': 'testpass123'})
+
+        assert response.status_code == 200
+        assert session_cookie(auth_client) != old_sid
+        assert store.get(old_sid) is None
+        assert auth_client.get('/api/auth/current').status_code == 200
+
+    def test_planted_session_id_not_kept_on_login(self, app, client, sample_user):
+        """Test that a session id set before login is not the one that gets logged in."""
+        app.session_interface.store.set('planted-session-id', '{}', time.time() + 60)
+        client.set_cookie('todo_session', 'planted-session-id')
+
+        client.post('/api/auth/login', json={'username': 'sampleuser', 'password': 'password123'})
+
+        assert session_cookie(client) != 'planted-session-id'
+        assert app.session_interface.store.get('planted-session-id') is None
+
+    def test_sweep_removes_expired(self):
+        """Test that sweeping drops only expired sessions."""
+        store = MemorySessionStore()
+        store.set('old', '{}', time.time() - 1)
+        store.set('new', '{}', time.time() + 60)
+
+        assert store.sweep() == 1
+        assert store.get('old') is None
+        assert store.get('new') is not None
+
+
+class TestSQLiteSessions:
+    """Test the SQLite session store."""
+
+    @pytest.fixture
+    def paths(self):
+        """Temporary database and session store paths."""
+        directory = tempfile.mkdtemp()
+        yield os.path.join(directory, 'todos.db'), os.path.join(directory, 'sessions.db')
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    def test_store_round_trip_and_sweep(self, paths):
+        """Test set/get/delete and batched expiry."""
+        store = SQLiteSessionStore(paths[1])
+        store.set('a', '{"x": 1}', time.time() + 60)
+        for i in range(5):
+            store.set(f'expired-{i}', '{}', time.time() - 1)
+
+        assert store.get('a')[0] == '{"x": 1}'
+        assert store.sweep(batch_size=2) == 5
+        store.delete('a')
+        assert store.get('a') is None
+
+    def test_sessions_shared_between_apps(self, paths):
+        """Test that a session created by one app instance is valid in another."""
+        db_path, sessions_path = paths
+        config = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'SESSION_TYPE': 'sqlite',
+            'SESSION_SQLITE_PATH': sessions_path,
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        }
+        first = create_app(config).test_client()
+        first.post('/api/auth/register', json={
+            'username': 'shared', 'email': 'shared@example.com', 'password': 'password123'
+        })
+
+        second = create_app(config).test_client()
+        second.set_cookie('todo_session', session_cookie(first))
+
+        assert second.get('/api/auth/current').get_json()['user']['username'] == 'shared'
+
+    def test_sweep_command(self, paths):
+        """Test the sweep-sessions CLI command."""
+        db_path, sessions_path = paths
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'SESSION_SQLITE_PATH': sessions_path,
+        })
+        app.session_interface.store.set('old', '{}', time.time() - 1)
+
+        result = app.test_cli_runner().invoke(args=['sweep-sessions'])
+
+        assert 'Removed 1 expired session(s).' in result.output
+
+    def test_invalid_session_type(self):
+        """Test that an unknown SESSION_TYPE is rejected."""
+        with pytest.raises(ValueError):
+            create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SESSION_TYPE': 'filesystem'})
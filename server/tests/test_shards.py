@@ -0,0 +1,133 @@
+"""
+Tests for per-user sharding of project and todo data.
+"""
+import os
+import sqlite3
+
+import pytest
+
+from app import create_app
+from models import db
+from shards import HASH_SHARD_ID_SPAN, ShardRouter
+
+
+@pytest.fixture
+def sharded_app(tmp_path):
+    """An app with two hash shards under tmp_path."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "main.db"}',
+        'SECRET_KEY': 'test-secret-key',
+        'SESSION_TYPE': 'memory',
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'SHARDING_MODE': 'hash',
+        'SHARD_COUNT': 2,
+        'SHARD_DIRECTORY': str(tmp_path / 'shards'),
+    })
+    yield app
+    app.extensions['shard_router'].close()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def login(app, username):
+    """Register username and return a logged-in client."""
+    client = app.test_client()
+    client.post('/api/auth/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'testpass123',
+    })
+    return client
+
+
+def shard_projects(directory, name):
+    """Project names stored in one shard file."""
+    with sqlite3.connect(os.path.join(directory, f'{name}.db')) as conn:
+        return [row[0] for row in conn.execute('SELECT name FROM todo_lists ORDER BY id')]
+
+
+class TestSharding:
+    """Test that each user's data lives in that user's shard."""
+
+    def test_users_land_in_separate_shards(self, sharded_app):
+        """Test that two users' projects go to different files with disjoint ids."""
+        alice, bob = login(sharded_app, 'alice'), login(sharded_app, 'bob')
+
+        alice_project = alice.post('/api/projects', json={'name': 'A'}).get_json()['project']
+        bob_project = bob.post('/api/projects', json={'name': 'B'}).get_json()['project']
+
+        directory = sharded_app.config['SHARD_DIRECTORY']
+        assert shard_projects(directory, 'shard-01') == ['A']
+        assert shard_projects(directory, 'shard-00') == ['B']
+        assert alice_project['id'] == 2 * HASH_SHARD_ID_SPAN + 1
+        assert bob_project['id'] == HASH_SHARD_ID_SPAN + 1
+
+    def test_main_database_holds_no_projects(self, sharded_app):
+        """Test that sharded tables stay empty in the main database."""
+        client = login(sharded_app, 'alice')
+        client.post('/api/projects', json={'name': 'A'})
+
+        with sharded_app.app_context():
+            count = db.session.execute(db.text('SELECT COUNT(*) FROM todo_lists')).scalar()
+        assert count == 0
+
+    def test_users_stay_isolated(self, sharded_app):
+        """Test that listing, reading and todo access work per shard."""
+        alice, bob = login(sharded_app, 'alice'), login(sharded_app, 'bob')
+        project_id = alice.post('/api/projects', json={'name': 'A'}).get_json()['project']['id']
+        todo = alice.post('/api/todos', json={'project_id': project_id, 'title': 'T'}).get_json()['todo']
+
+        assert [p['name'] for p in alice.get('/api/projects').get_json()['projects']] == ['A']
+        assert bob.get('/api/projects').get_json()['projects'] == []
+        assert [t['id'] for t in alice.get(f'/api/todos/{project_id}').get_json()['todos']] == [todo['id']]
+        assert bob.get(f'/api/todos/{project_id}').status_code == 404
+
+    def test_ui_state_flush_reaches_shard(self, sharded_app):
+        """Test that buffered collapse changes are written to the owner's shard."""
+        client = login(sharded_app, 'alice')
+        project_id = client.post('/api/projects', json={'name': 'A'}).get_json()['project']['id']
+        todo_id = client.post('/api/todos', json={'project_id': project_id, 'title': 'T'}).get_json()['todo']['id']
+
+        client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': True})
+        assert sharded_app.extensions['ui_state_buffer'].flush() == 1
+
+        assert client.get(f'/api/todos/{project_id}').get_json()['todos'][0]['collapsed'] is True
+
+    def test_compact_tombstones_visits_every_shard(self, sharded_app):
+        """Test that the CLI command runs once per shard file."""
+        login(sharded_app, 'alice').post('/api/projects', json={'name': 'A'})
+        login(sharded_app, 'bob').post('/api/projects', json={'name': 'B'})
+
+        result = sharded_app.test_cli_runner().invoke(args=['compact-tombstones'])
+
+        assert result.exit_code == 0
+        assert result.output.count('Pruned') == 2
+
+
+class TestShardRouter:
+    """Test shard naming and the engine cache."""
+
+    def test_user_mode_names_and_ranges(self, tmp_path):
+        """Test that user mode gives each user a file and id range."""
+        router = ShardRouter('user', str(tmp_path))
+
+        assert router.shard_for(7)[0] == 'user-7'
+        assert router.shard_for(7)[1] < router.shard_for(8)[1]
+        assert router.shard_user('user-7') == 7
+
+    def test_engine_cache_evicts(self, tmp_path):
+        """Test that a cache of one reopens shards after eviction."""
+        router = ShardRouter('user', str(tmp_path), cache_size=1)
+
+        first = router.engine(1)
+        router.engine(2)
+
+        assert router.engine(1) is not first
+        assert router.stats()['evictions'] == 2
+        assert router.shard_names() == ['user-1', 'user-2']
+        router.close()
+
+    def test_rejects_unknown_mode(self, tmp_path):
+        """Test that an unknown SHARDING_MODE fails fast."""
+        with pytest.raises(ValueError):
+            ShardRouter('range', str(tmp_path))
@@ -0,0 +1,113 @@
+"""
+Tests for delta sync and tombstone compaction.
+"""
+from datetime import datetime, timedelta
+
+from models import db, SyncClient, Tombstone
+from sync import compact_tombstones
+
+
+class TestSync:
+    """Test GET /api/sync."""
+
+    def test_full_sync(self, auth_client):
+        """Test that since=0 returns everything."""
+        project = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']
+        todo = auth_client.post('/api/todos', json={'project_id': project['id'], 'title': 'Todo'}).get_json()['todo']
+
+        response = auth_client.get('/api/sync')
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [p['id'] for p in data['projects']] == [project['id']]
+        assert [t['id'] for t in data['todos']] == [todo['id']]
+        assert data['deleted'] == []
+        assert data['reset'] is False
+        assert data['seq'] >= todo['change_seq']
+
+    def test_incremental_sync_returns_only_changes(self, auth_client):
+        """Test that only rows written after since are returned."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']['id']
+        first = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'First'}).get_json()['todo']
+        second = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Second'}).get_json()['todo']
+        seq = auth_client.get('/api/sync').get_json()['seq']
+
+        auth_client.put(f'/api/todos/{first["id"]}', json={'completed': True})
+        third = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Third'}).get_json()['todo']
+
+        data = auth_client.get(f'/api/sync?since={seq}').get_json()
+
+        assert {t['id'] for t in data['todos']} == {first['id'], third['id']}
+        assert second['id'] not in {t['id'] for t in data['todos']}
+        assert data['projects'] == []
+        assert data['seq'] > seq
+
+    def test_delete_leaves_tombstones_for_subtree(self, auth_client):
+        """Test that deleting a todo tombstones it and its subtasks."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Parent'}).get_json()['todo']
+        child = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Child', 'parent_id': parent['id']}).get_json()['todo']
+        seq = auth_client.get('/api/sync').get_json()['seq']
+
+        auth_client.delete(f'/api/todos/{parent["id"]}')
+
+        deleted = auth_client.get(f'/api/sync?since={seq}').get_json()['deleted']
+        assert {(d['type'], d['id']) for d in deleted} == {('todo', parent['id']), ('todo', child['id'])}
+
+    def test_imported_todos_are_synced(self, auth_client):
+        """Test that bulk-imported rows carry a sequence number."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']['id']
+        seq = auth_client.get('/api/sync').get_json()['seq']
+
+        auth_client.post('/api/import', json={'project_id': project_id, 'format': 'markdown', 'content': '- a\n  - b\n'})
+
+        assert len(auth_client.get(f'/api/sync?since={seq}').get_json()['todos']) == 2
+
+    def test_invalid_since(self, auth_client):
+        """Test that a non-numeric since is rejected."""
+        assert auth_client.get('/api/sync?since=abc').status_code == 400
+
+
+class TestCompaction:
+    """Test tombstone compaction."""
+
+    def test_compaction_waits_for_registered_clients(self, app, auth_client):
+        """Test that tombstones are kept until every active client synced past them."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']['id']
+        todo = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Todo'}).get_json()['todo']
+        seq = auth_client.get('/api/sync?client_id=phone').get_json()['seq']
+
+        auth_client.delete(f'/api/todos/{todo["id"]}')
+
+        compact_tombstones()
+        assert Tombstone.query.count() == 1
+
+        latest = auth_client.get(f'/api/sync?since={seq}&client_id=phone').get_json()['seq']
+        auth_client.get(f'/api/sync?since={latest}&client_id=phone')
+
+        compact_tombstones()
+        assert Tombstone.query.count() == 0
+
+    def test_client_behind_watermark_gets_reset(self, app, auth_client):
+        """Test that a stale client is told to reload after its tombstones were pruned."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Sync'}).get_json()['project']['id']
+        todo = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Todo'}).get_json()['todo']
+        seq = auth_client.get('/api/sync?client_id=laptop').get_json()['seq']
+        auth_client.delete(f'/api/todos/{todo["id"]}')
+
+        SyncClient.query.update({'last_seen': datetime.utcnow() - timedelta(days=60)})
+        db.session.commit()
+        deleted, stale, watermark = compact_tombstones(timedelta(days=30))
+
+        assert (deleted, stale) == (1, 1)
+        data = auth_client.get(f'/api/sync?since={seq}&client_id=laptop').get_json()
+        assert data['reset'] is True
+        assert [p['id'] for p in data['projects']] == [project_id]
+        assert data['todos'] == []
+
+    def test_compact_command(self, runner):
+        """Test the compact-tombstones CLI command."""
+        result = runner.invoke(args=['compact-tombstones'])
+
+        assert result.exit_code == 0
+        assert 'Pruned 0 tombstone(s)' in result.output
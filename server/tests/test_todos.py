@@ -48,6 +48,69 @@ class TestGetTodos:
         assert response.status_code == 401
 
 
+class TestFilterTodos:
+    """Test server-side filtering and sorting of the todo tree."""
+
+    def _create_tree(self, auth_client):
+        """Create a project with a small mixed-priority tree."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Filter Project'}).get_json()['project']['id']
+
+        low = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Low', 'priority': 'low'}).get_json()['todo']
+        high = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'High', 'priority': 'high'}).get_json()['todo']
+        child = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'High child', 'priority': 'high', 'parent_id': low['id']}).get_json()['todo']
+        return project_id, low, high, child
+
+    def test_sort_by_priority(self, auth_client):
+        """Test sorting top-level todos by priority."""
+        project_id, low, high, child = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}?sort=priority')
+
+        assert response.status_code == 200
+        todos = response.get_json()['todos']
+        assert [todo['id'] for todo in todos] == [high['id'], low['id']]
+        assert todos[1]['children'][0]['id'] == child['id']
+
+    def test_filter_by_priority_surfaces_matching_subtasks(self, auth_client):
+        """Test that a matching subtask whose parent is filtered out is returned at the top level."""
+        project_id, low, high, child = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}?priority=high')
+
+        assert response.status_code == 200
+        todos = response.get_json()['todos']
+        assert {todo['id'] for todo in todos} == {high['id'], child['id']}
+
+    def test_filter_by_completed(self, auth_client):
+        """Test filtering todos by completion state."""
+        project_id, low, high, child = self._create_tree(auth_client)
+        auth_client.put(f'/api/todos/{high["id"]}', json={'completed': True})
+
+        completed = auth_client.get(f'/api/todos/{project_id}?completed=true').get_json()['todos']
+        pending = auth_client.get(f'/api/todos/{project_id}?completed=false').get_json()['todos']
+
+        assert [todo['id'] for todo in completed] == [high['id']]
+        assert [todo['id'] for todo in pending] == [low['id']]
+
+    def test_hide_completed_subtrees(self, auth_client):
+        """Test that completed todos are dropped together with their subtasks."""
+        project_id, low, high, child = self._create_tree(auth_client)
+        auth_client.put(f'/api/todos/{low["id"]}', json={'completed': True})
+
+        response = auth_client.get(f'/api/todos/{project_id}?hide_completed_subtrees=true')
+
+        todos = response.get_json()['todos']
+        assert [todo['id'] for todo in todos] == [high['id']]
+
+    def test_invalid_filter_parameters(self, auth_client):
+        """Test that unknown filter values are rejected."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Filter Project'}).get_json()['project']['id']
+
+        assert auth_client.get(f'/api/todos/{project_id}?sort=title').status_code == 400
+        assert auth_client.get(f'/api/todos/{project_id}?priority=urgent').status_code == 400
+        assert auth_client.get(f'/api/todos/{project_id}?completed=maybe').status_code == 400
+
+
 class TestCreateTodo:
     """Test creating todo items."""
 
@@ -413,3 +476,143 @@ class TestMoveTodo:
         todos_p2 = auth_client.get(f'/api/todos/{project2["id"]}').get_json()['todos']
         assert len(todos_p2) == 1
         assert todos_p2[0]['id'] == todo['id']
+
+
+class TestSparseFieldsets:
+    """Test fields=, include= and return=minimal on todo endpoints."""
+
+    def test_get_todos_with_fields(self, auth_client):
+        """Test projecting the tree onto a few fields."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Parent'}).get_json()['todo']
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Child', 'parent_id': parent['id']})
+
+        todos = auth_client.get(f'/api/todos/{project_id}?fields=title,completed').get_json()['todos']
+
+        assert set(todos[0]) == {'id', 'title', 'completed', 'children'}
+        assert set(todos[0]['children'][0]) == {'id', 'title', 'completed', 'children'}
+
+    def test_get_todos_flat(self, auth_client):
+        """Test that an empty include= returns a flat list."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Parent'}).get_json()['todo']
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Child', 'parent_id': parent['id']})
+
+        todos = auth_client.get(f'/api/todos/{project_id}?include=').get_json()['todos']
+
+        assert [todo['title'] for todo in todos] == ['Parent', 'Child']
+        assert 'children' not in todos[0]
+
+    def test_unknown_field(self, auth_client):
+        """Test that unknown fields are rejected before anything changes."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+        todo = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Todo'}).get_json()['todo']
+
+        response = auth_client.put(f'/api/todos/{todo["id"]}?fields=secret', json={'title': 'Changed'})
+
+        assert response.status_code == 400
+        assert auth_client.get(f'/api/todos/{project_id}').get_json()['todos'][0]['title'] == 'Todo'
+
+    def test_update_return_minimal(self, auth_client):
+        """Test that return=minimal only echoes the changed columns."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Parent'}).get_json()['todo']
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Child', 'parent_id': parent['id']})
+
+        response = auth_client.put(f'/api/todos/{parent["id"]}', json={'collapsed': True},
+                                   headers={'Prefer': 'return=minimal'})
+
+        assert response.status_code == 200
+        assert response.headers['Preference-Applied'] == 'return=minimal'
+        assert set(response.get_json()['todo']) == {'id', 'collapsed', 'change_seq'}
+        assert response.get_json()['todo']['collapsed'] is True
+
+    def test_reparent_return_minimal(self, auth_client):
+        """Test return=minimal on reparent reports the new position."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+        todo1 = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Todo 1'}).get_json()['todo']
+        todo2 = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Todo 2'}).get_json()['todo']
+
+        response = auth_client.post(f'/api/todos/{todo2["id"]}/reparent?return=minimal', json={
+            'new_parent_id': todo1['id'],
+            'new_order': 0
+        })
+
+        todo = response.get_json()['todo']
+        assert todo['parent_id'] == todo1['id']
+        assert todo['depth'] == 1
+        assert 'title' not in todo
+
+    def test_create_return_minimal(self, auth_client):
+        """Test return=minimal on create returns the server-assigned fields."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Test Project'}).get_json()['project']['id']
+
+        response = auth_client.post('/api/todos?return=minimal', json={'project_id': project_id, 'title': 'Todo'})
+
+        assert response.status_code == 201
+        assert set(response.get_json()['todo']) == {'id', 'depth', 'order_index', 'created_at', 'change_seq'}
+
+
+class TestResponseFormats:
+    """Test content negotiation on the todo tree endpoint."""
+
+    def _create_tree(self, auth_client):
+        """Create a project with Parent -> Child plus a second root."""
+        project_id = auth_client.post('/api/projects', json={'name': 'Format Project'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Parent'}).get_json()['todo']
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Second'})
+        auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'Child', 'parent_id': parent['id']})
+        return project_id
+
+    def test_columnar_format(self, auth_client):
+        """Test the columnar layout via the Accept header."""
+        project_id = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}',
+                                   headers={'Accept': 'application/vnd.todo.columnar+json'})
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/vnd.todo.columnar+json'
+        assert 'Accept' in response.headers['Vary']
+        data = response.get_json()
+        assert data['count'] == 3
+        assert data['list_id'] == project_id
+        assert 'list_id' not in data['columns']
+        assert data['columns']['title'] == ['Parent', 'Child', 'Second']
+        assert data['columns']['parent_index'] == [-1, 0, -1]
+
+    def test_columnar_with_fields(self, auth_client):
+        """Test that fields= limits the columns."""
+        project_id = self._create_tree(auth_client)
+
+        data = auth_client.get(f'/api/todos/{project_id}?format=columnar&fields=title').get_json()
+
+        assert set(data['columns']) == {'id', 'title', 'parent_index'}
+
+    def test_msgpack_format(self, auth_client):
+        """Test the MessagePack encoding of the tree."""
+        msgpack = pytest.importorskip('msgpack')
+        project_id = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}', headers={'Accept': 'application/x-msgpack'})
+
+        assert response.mimetype == 'application/x-msgpack'
+        assert msgpack.unpackb(response.data) == auth_client.get(f'/api/todos/{project_id}').get_json()
+
+    def test_msgpack_unavailable(self, auth_client, monkeypatch):
+        """Test that MessagePack is refused when the package is missing."""
+        import routes
+        monkeypatch.setattr(routes, 'msgpack', None)
+        project_id = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}?format=msgpack')
+
+        assert response.status_code == 406
+
+    def test_unacceptable_format(self, auth_client):
+        """Test that an unsupported Accept header gets 406."""
+        project_id = self._create_tree(auth_client)
+
+        response = auth_client.get(f'/api/todos/{project_id}', headers={'Accept': 'text/html'})
+
+        assert response.status_code == 406
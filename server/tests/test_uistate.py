@@ -0,0 +1,79 @@
+"""
+Tests for the buffered UI state endpoint.
+"""
+from events import event_broker
+from models import db, TodoItem
+
+
+def create_todo(auth_client):
+    """Create a project with one todo; returns (project_id, todo_id)."""
+    project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+    todo_id = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'T'}).get_json()['todo']['id']
+    return project_id, todo_id
+
+
+def stored_collapsed(todo_id):
+    """The collapsed value currently in the database."""
+    db.session.expire_all()
+    return db.session.get(TodoItem, todo_id).collapsed
+
+
+class TestUIState:
+    """Test PATCH /api/todos/<id>/ui-state."""
+
+    def test_write_is_deferred_until_flush(self, app, auth_client):
+        """Test that the change is accepted immediately and written on flush."""
+        _, todo_id = create_todo(auth_client)
+
+        response = auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': True})
+
+        assert response.status_code == 202
+        assert response.get_json() == {'id': todo_id, 'collapsed': True}
+        assert stored_collapsed(todo_id) is False
+
+        assert app.extensions['ui_state_buffer'].flush() == 1
+        assert stored_collapsed(todo_id) is True
+
+    def test_toggles_coalesce(self, app, auth_client):
+        """Test that toggling back and forth before a flush writes nothing."""
+        _, todo_id = create_todo(auth_client)
+        auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': True})
+        auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': False})
+
+        buffer = app.extensions['ui_state_buffer']
+        assert buffer.pending() == {todo_id: False}
+        assert buffer.flush() == 0
+
+    def test_direct_update_supersedes_buffered_value(self, app, auth_client):
+        """Test that a PUT after a PATCH is not undone by the next flush."""
+        _, todo_id = create_todo(auth_client)
+        auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': True})
+
+        auth_client.put(f'/api/todos/{todo_id}', json={'collapsed': False})
+        app.extensions['ui_state_buffer'].flush()
+
+        assert stored_collapsed(todo_id) is False
+
+    def test_flush_stamps_change_seq_and_publishes(self, app, auth_client):
+        """Test that flushed rows reach delta sync, SSE subscribers and the tree cache."""
+        project_id, todo_id = create_todo(auth_client)
+        before = auth_client.get(f'/api/todos/{project_id}').get_json()['todos'][0]
+        subscription = event_broker.subscribe(project_id)
+
+        auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': True})
+        app.extensions['ui_state_buffer'].flush()
+
+        _, event_type, payload = subscription.get(timeout=1)
+        event_broker.unsubscribe(subscription)
+        after = auth_client.get(f'/api/todos/{project_id}').get_json()['todos'][0]
+        assert event_type == 'ui_state'
+        assert payload == {'todos': [{'id': todo_id, 'collapsed': True}]}
+        assert after['collapsed'] is True
+        assert after['change_seq'] > before['change_seq']
+
+    def test_validation_and_ownership(self, auth_client):
+        """Test that bad bodies and unknown todos are rejected."""
+        _, todo_id = create_todo(auth_client)
+
+        assert auth_client.patch(f'/api/todos/{todo_id}/ui-state', json={'collapsed': 'yes'}).status_code == 400
+        assert auth_client.patch('/api/todos/9999/ui-state', json={'collapsed': True}).status_code == 404
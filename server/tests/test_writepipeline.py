@@ -0,0 +1,161 @@
+"""
+Tests for the group-commit write pipeline.
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from dbrouting import sqlite_file_path
+from models import db, TodoList
+from writepipeline import WritePipeline
+
+
+@pytest.fixture
+def pipeline(app):
+    """The test app with a started write pipeline."""
+    pipeline = WritePipeline(app, interval=0.02)
+    app.extensions['write_pipeline'] = pipeline
+    pipeline.start()
+    yield pipeline
+    pipeline.stop()
+    app.extensions.pop('write_pipeline')
+
+
+class TestWritePipeline:
+    """Test batching and per-unit results."""
+
+    def test_units_share_one_commit(self, app, pipeline, sample_user):
+        """Test that units submitted together are applied in one batch."""
+        def insert(name):
+            def unit(session):
+                project = TodoList(name=name, user_id=sample_user)
+                session.add(project)
+                session.flush()
+                return project.id
+            return unit
+
+        futures = [pipeline.submit(insert(f'P{i}')) for i in range(5)]
+        ids = [future.result(timeout=5) for future in futures]
+
+        assert len(set(ids)) == 5
+        assert pipeline.stats()['batches'] == 1
+        assert db.session.query(TodoList).count() == 5
+
+    def test_batch_invisible_until_commit(self, app, pipeline, sample_user):
+        """Test that released savepoints are not committed before the batch's final commit."""
+        path = sqlite_file_path(app.config['SQLALCHEMY_DATABASE_URI'])
+
+        def insert(session):
+            session.add(TodoList(name='Batched', user_id=sample_user))
+            session.flush()
+
+        def count_from_outside(session):
+            outside = sqlite3.connect(path)
+            try:
+                return outside.execute('SELECT COUNT(*) FROM todo_lists').fetchone()[0]
+            finally:
+                outside.close()
+
+        futures = [pipeline.submit(insert), pipeline.submit(insert), pipeline.submit(count_from_outside)]
+
+        assert futures[2].result(timeout=5) == 0
+        assert pipeline.stats()['batches'] == 1
+        assert db.session.query(TodoList).count() == 2
+
+    def test_failing_unit_isolated(self, app, pipeline, sample_user):
+        """Test that one failing unit does not roll back the others."""
+        def good(session):
+            session.add(TodoList(name='Kept', user_id=sample_user))
+            session.flush()
+
+        def bad(session):
+            session.add(TodoList(name=None, user_id=sample_user))
+            session.flush()
+
+        futures = [pipeline.submit(good), pipeline.submit(bad), pipeline.submit(good)]
+
+        assert futures[0].result(timeout=5) is None
+        with pytest.raises(Exception):
+            futures[1].result(timeout=5)
+        assert futures[2].result(timeout=5) is None
+        assert pipeline.stats()['failed_units'] == 1
+        assert [p.name for p in db.session.query(TodoList)] == ['Kept', 'Kept']
+
+
+class TestPipelinedRoutes:
+    """Test the mutation routes with the pipeline enabled."""
+
+    def test_todo_lifecycle(self, pipeline, auth_client):
+        """Test create, update and delete through the writer thread."""
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        todo = auth_client.post('/api/todos', json={'project_id': project_id, 'title': 'T'}).get_json()['todo']
+
+        response = auth_client.put(f'/api/todos/{todo["id"]}', json={'title': 'Renamed', 'completed': True})
+        assert response.status_code == 200
+        assert response.get_json()['todo']['title'] == 'Renamed'
+        assert response.get_json()['todo']['completed'] is True
+
+        assert auth_client.delete(f'/api/todos/{todo["id"]}').status_code == 200
+        assert auth_client.get(f'/api/todos/{project_id}').get_json()['todos'] == []
+        assert pipeline.stats()['units'] == 4
+
+    def test_move_reparent_and_import(self, pipeline, auth_client):
+        """Test that the remaining mutations also go through the writer thread."""
+        source = auth_client.post('/api/projects', json={'name': 'Source'}).get_json()['project']['id']
+        target = auth_client.post('/api/projects', json={'name': 'Target'}).get_json()['project']['id']
+        parent = auth_client.post('/api/todos', json={'project_id': source, 'title': 'Parent'}).get_json()['todo']
+        child = auth_client.post('/api/todos', json={'project_id': source, 'title': 'Child'}).get_json()['todo']
+        units = pipeline.stats()['units']
+
+        response = auth_client.post(f'/api/todos/{child["id"]}/reparent', json={'new_parent_id': parent['id']})
+        assert response.status_code == 200
+        assert response.get_json()['todo']['depth'] == 1
+
+        response = auth_client.post(f'/api/todos/{parent["id"]}/move', json={'target_project_id': target})
+        assert response.status_code == 200
+        assert response.get_json()['todo']['children'][0]['list_id'] == target
+
+        response = auth_client.post('/api/import', json={'project_id': source, 'format': 'markdown', 'content': '- a\n  - b\n'})
+        assert response.status_code == 201
+
+        assert pipeline.stats()['units'] == units + 3
+        assert [todo['title'] for todo in auth_client.get(f'/api/todos/{source}').get_json()['todos']] == ['a']
+
+    def test_project_deleted_after_check(self, app, pipeline, auth_client, monkeypatch):
+        """Test that a unit whose row vanished after the ownership check answers 404."""
+        import routes
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        get_owned = routes.get_owned
+
+        def get_owned_then_delete(model, object_id, label=None):
+            obj = get_owned(model, object_id, label)
+            pipeline.run(lambda session: session.execute(db.delete(TodoList).where(TodoList.id == project_id)))
+            return obj
+
+        monkeypatch.setattr(routes, 'get_owned', get_owned_then_delete)
+        response = auth_client.delete(f'/api/projects/{project_id}')
+
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Project not found'
+
+    def test_concurrent_creates(self, app, pipeline, auth_client):
+        """Test that concurrent requests all succeed and are grouped."""
+        project_id = auth_client.post('/api/projects', json={'name': 'P'}).get_json()['project']['id']
+        cookie = auth_client.get_cookie('todo_session').value
+        statuses = []
+
+        def create(i):
+            client = app.test_client()
+            client.set_cookie('todo_session', cookie)
+            statuses.append(client.post('/api/todos', json={'project_id': project_id, 'title': f'T{i}'}).status_code)
+
+        threads = [threading.Thread(target=create, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [201] * 8
+        assert len(auth_client.get(f'/api/todos/{project_id}').get_json()['todos']) == 8
+        assert pipeline.stats()['batches'] < pipeline.stats()['units']
@@ -0,0 +1,175 @@
+"""
+Write-behind buffer for per-todo UI state (expanded/collapsed).
+
+PATCH /api/todos/<id>/ui-state only checks ownership and records the new
+value here; repeated toggles of the same todo overwrite each other. A
+background thread flushes the buffer every UI_STATE_FLUSH_INTERVAL
+seconds (sooner once UI_STATE_MAX_PENDING todos are waiting, and once
+more at shutdown) with one bulk UPDATE per value in a single transaction.
+Rows whose stored value already matches are skipped; the rest get a new
+change sequence number so delta sync picks them up, and each affected
+project gets a 'ui_state' event (which also drops its cached tree).
+"""
+import atexit
+import threading
+
+from sqlalchemy import update
+
+from events import event_broker
+from logconfig import get_logger
+from models import db, TodoItem
+from shards import current_shard_user, use_shard_user
+from sync import next_change_seq
+
+logger = get_logger('uistate')
+
+
+class UIStateBuffer:
+    """Coalescing buffer of pending collapsed values, keyed by todo id."""
+
+    def __init__(self, app, interval=1.0, max_pending=10000):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.recorded = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    def record(self, todo_id, collapsed):
+        """Buffer a todo's new collapsed value (the latest value wins)."""
+        # Remember whose todo it is, so the flush can find its shard
+        owner = current_shard_user()
+        with self._lock:
+            self._pending[todo_id] = (owner, collapsed)
+            self.recorded += 1
+            pending = len(self._pending)
+            if self._thread is None:
+                self._start()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def discard(self, todo_id):
+        """Drop a todo's buffered value; call when a direct write sets collapsed."""
+        with self._lock:
+            self._pending.pop(todo_id, None)
+
+    def pending(self):
+        """Snapshot of values not yet written."""
+        with self._lock:
+            return {todo_id: collapsed for todo_id, (_, collapsed) in self._pending.items()}
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='ui-state-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('UI state flush failed')
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def flush(self):
+        """
+        Write buffered values in one transaction.
+
+        Returns:
+            Number of rows whose value actually changed
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            with self.app.app_context():
+                try:
+                    changed = []
+                    for owner, values in self._by_shard(batch).items():
+                        with use_shard_user(owner):
+                            changed += self._write(values)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    # Put the values back unless a newer toggle arrived meanwhile
+                    with self._lock:
+                        for todo_id, entry in batch.items():
+                            self._pending.setdefault(todo_id, entry)
+                    raise
+
+                # Inside the app context so listeners find this app's caches
+                by_project = {}
+                for todo_id, list_id, collapsed in changed:
+                    by_project.setdefault(list_id, []).append({'id': todo_id, 'collapsed': collapsed})
+                for list_id, todos in by_project.items():
+                    event_broker.publish(list_id, 'ui_state', {'todos': todos})
+
+            self.flushes += 1
+            self.flushed_rows += len(changed)
+            return len(changed)
+
+    def _by_shard(self, batch):
+        """Split a batch into {owner: {todo_id: collapsed}}; one group unless sharding is on."""
+        sharded = 'shard_router' in self.app.extensions
+        groups = {}
+        for todo_id, (owner, collapsed) in batch.items():
+            groups.setdefault(owner if sharded else None, {})[todo_id] = collapsed
+        return groups
+
+    def _write(self, batch):
+        """One UPDATE per target value; returns (id, list_id, collapsed) of changed rows."""
+        seq = None
+        changed = []
+        for value in (True, False):
+            ids = [todo_id for todo_id, collapsed in batch.items() if collapsed is value]
+            if not ids:
+                continue
+            if seq is None:
+                seq = next_change_seq(db.session)
+            rows = db.session.execute(
+                update(TodoItem)
+                .where(TodoItem.id.in_(ids), TodoItem.collapsed.is_not(value))
+                .values(collapsed=value, change_seq=seq)
+                .returning(TodoItem.id, TodoItem.list_id)
+            ).all()
+            changed += [(todo_id, list_id, value) for todo_id, list_id in rows]
+        return changed
+
+    def stats(self):
+        """Counters for monitoring."""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'recorded': self.recorded,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows,
+        }
+
+
+def init_ui_state_buffer(app):
+    """Create the app's UI state buffer (the flush thread starts on first use)."""
+    app.config.setdefault('UI_STATE_FLUSH_INTERVAL', 1.0)
+    app.config.setdefault('UI_STATE_MAX_PENDING', 10000)
+    app.extensions['ui_state_buffer'] = UIStateBuffer(
+        app,
+        interval=app.config['UI_STATE_FLUSH_INTERVAL'],
+        max_pending=app.config['UI_STATE_MAX_PENDING'],
+    )
@@ -0,0 +1,183 @@
+"""
+Optional group-commit write pipeline.
+
+SQLite serializes writers and every commit pays for a sync, so many small
+concurrent mutations spend most of their time waiting on each other.
+With WRITE_PIPELINE_ENABLED, mutation handlers hand their write as a
+unit (a function of a session) to one writer thread. The thread collects
+whatever units arrive within WRITE_PIPELINE_INTERVAL seconds (up to
+WRITE_PIPELINE_MAX_BATCH), runs each inside its own SAVEPOINT and commits
+them all in one transaction. Each request's future then resolves with its
+own unit's result, or its own exception; a failing unit is rolled back to
+its savepoint without affecting the rest of the batch.
+
+Units must only use the session they are given and return plain values
+(ids, column names), never ORM objects.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from dbrouting import explicit_transactions
+from models import db
+from shards import current_shard_user, use_shard_user
+
+_STOP = object()
+
+
+class WritePipeline:
+    """Single writer thread that applies submitted units with group commit."""
+
+    def __init__(self, app, interval=0.002, max_batch=128, timeout=30.0):
+        self.app = app
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='write-pipeline', daemon=True)
+        self.batches = 0
+        self.units = 0
+        self.failed_units = 0
+        self.failed_batches = 0
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Apply everything already queued, then stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, unit):
+        """Queue unit(session) and return a Future for its result."""
+        future = Future()
+        # The writer thread has no g.user_id; carry the caller's shard along
+        self._queue.put((unit, future, current_shard_user()))
+        return future
+
+    def run(self, unit):
+        """Submit unit and wait for its result (re-raising its exception)."""
+        return self.submit(unit).result(timeout=self.timeout)
+
+    def _collect(self):
+        """Block for the first unit, then gather more for up to `interval` seconds."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch):
+        """Run a batch of units in one transaction, one savepoint per unit."""
+        # One real transaction per batch; see dbrouting.begin_sqlite_transaction
+        with self.app.app_context(), explicit_transactions():
+            session = db.session
+            applied = []
+            for unit, future, shard_user in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with use_shard_user(shard_user), session.begin_nested():
+                        result = unit(session)
+                    applied.append((future, result))
+                except Exception as e:
+                    self.failed_units += 1
+                    future.set_exception(e)
+
+            try:
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                self.failed_batches += 1
+                for future, _ in applied:
+                    future.set_exception(e)
+            else:
+                for future, result in applied:
+                    future.set_result(result)
+            self.batches += 1
+            self.units += len(batch)
+
+    def stats(self):
+        """Counters for monitoring; units / batches is the average group size."""
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'units': self.units,
+            'failed_units': self.failed_units,
+            'failed_batches': self.failed_batches,
+        }
+
+
+def run_write(unit):
+    """
+    Apply unit(session) and commit, through the pipeline when it is enabled.
+
+    Without the pipeline the unit runs on the request's own session (so the
+    objects it touches are the ones already loaded). With it, the unit runs
+    on the writer thread; the request session's transaction is ended first,
+    so objects the handler already holds reload the committed state.
+
+    Returns:
+        Whatever unit returned
+
+    Raises:
+        Whatever unit (or the commit) raised
+    """
+    pipeline = current_app.extensions.get('write_pipeline')
+    if pipeline is None:
+        try:
+            result = unit(db.session)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+
+    # End the request's read transaction first: it returns the connection to
+    # the pool the writer thread draws from, and expires loaded objects so
+    # they reload the committed state afterwards
+    db.session.rollback()
+    return pipeline.run(unit)
+
+
+def init_write_pipeline(app):
+    """Start the writer thread if WRITE_PIPELINE_ENABLED is set."""
+    app.config.setdefault('WRITE_PIPELINE_ENABLED', False)
+    app.config.setdefault('WRITE_PIPELINE_INTERVAL', 0.002)
+    app.config.setdefault('WRITE_PIPELINE_MAX_BATCH', 128)
+    app.config.setdefault('WRITE_PIPELINE_TIMEOUT', 30.0)
+
+    if not app.config['WRITE_PIPELINE_ENABLED']:
+        return
+    pipeline = WritePipeline(
+        app,
+        interval=app.config['WRITE_PIPELINE_INTERVAL'],
+        max_batch=app.config['WRITE_PIPELINE_MAX_BATCH'],
+        timeout=app.config['WRITE_PIPELINE_TIMEOUT'],
+    )
+    app.extensions['write_pipeline'] = pipeline
+    pipeline.start()